@@ -6,11 +6,13 @@ import base64
 import io
 import random
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, abort
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, abort, g, Response
 from flask_session import Session
 import threading
 import logging
 
+import metrics
+
 # Tentar importar bibliotecas de processamento de imagem
 try:
     from PIL import Image
@@ -28,19 +30,63 @@ except ImportError:
     CORS_AVAILABLE = False
     print("Flask-CORS não disponível, continuando sem CORS")
 
+# Tentar importar suporte a WebSocket (reconhecimento contínuo)
+try:
+    from flask_sock import Sock
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+    print("Flask-Sock não disponível, continuando sem reconhecimento por WebSocket")
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Importar módulos locais
 try:
-    from database import LibrasDatabase
+    from database import get_database
+    from write_behind import WriteBehindBuffer
     DATABASE_AVAILABLE = True
     logger.info("Módulo database importado com sucesso")
 except ImportError as e:
     DATABASE_AVAILABLE = False
     print(f"Aviso: Sistema de banco não disponível: {e}")
 
+# Letras do Soletrando gravadas em lote (ativado com SOLETRANDO_WRITE_BEHIND=1)
+soletrando_buffer = None
+if DATABASE_AVAILABLE:
+    soletrando_buffer = WriteBehindBuffer.from_env(lambda events: get_database().save_soletrando_letters(events))
+    if soletrando_buffer:
+        logger.info("Buffer write-behind do Soletrando ativado")
+
+def flush_soletrando_buffer():
+    """Grava as letras pendentes antes de ler estatísticas do Soletrando"""
+    if soletrando_buffer:
+        soletrando_buffer.flush()
+
+def current_user_id(create=False):
+    """
+    Id do usuário logado
+    
+    Resolvido no login e guardado na sessão. O id da sessão é conferido com o
+    cache LRU de ids (uma consulta ao banco só quando o nome não está no
+    cache): se o usuário foi removido ou a tabela recriada, a sessão é
+    corrigida em vez de gravar estatísticas com um id antigo ou de outro
+    usuário. Com create=True o usuário é criado se ainda não existir.
+    """
+    if 'username' not in session or not DATABASE_AVAILABLE:
+        return None
+    
+    db = get_database()
+    username = session['username']
+    user_id = db.get_or_create_user(username) if create else db.get_user_id(username)
+    
+    if user_id is None:
+        session.pop('user_id', None)
+    elif session.get('user_id') != user_id:
+        session['user_id'] = user_id
+    return user_id
+
 try:
     from palavras import palavras, palavras_iniciante, palavras_avancado, palavras_expert
     WORDS_AVAILABLE = True
@@ -55,9 +101,10 @@ except ImportError as e:
     palavras_expert = ["INTELIGENCIA", "PROGRAMACAO"]
 
 try:
-    from gesture_manager import GestureManager
+    from gesture_manager import GestureManager, DETAIL_NONE, DETAIL_FULL, DETAIL_LEVELS
     GESTURE_MANAGER_AVAILABLE = True
     logger.info("Módulo gesture_manager importado com sucesso")
+    from recognition_stream import RecognitionSession
     gesture_manager = GestureManager()
     
     # Garantir que os gestos estejam carregados
@@ -96,6 +143,24 @@ app.config['SESSION_FILE_THRESHOLD'] = 100
 Session(app)
 if CORS_AVAILABLE:
     CORS(app)
+sock = Sock(app) if WEBSOCKET_AVAILABLE else None
+
+# ===== MÉTRICAS (/metrics) =====
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Rota como template (/api/get_challenge_ranking/<level>) para não explodir a cardinalidade
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('libras_http_request_duration_seconds', time.perf_counter() - started,
+                        method=request.method, route=route)
+        metrics.inc('libras_http_requests_total', method=request.method, route=route,
+                    status=response.status_code)
+    return response
 
 # ===== CONFIGURAÇÃO GLOBAL =====
 # Sistema de reconhecimento desabilitado para deploy
@@ -129,6 +194,12 @@ def login():
         if username:
             session['username'] = username
             session['login_time'] = datetime.now().isoformat()
+            session.pop('user_id', None)
+            if DATABASE_AVAILABLE:
+                try:
+                    session['user_id'] = get_database().get_or_create_user(username)
+                except Exception as e:
+                    logger.warning(f"Erro ao obter user_id no login: {e}")
             logger.info(f"Usuário logado: {username}")
             
             # Se for requisição AJAX, retornar JSON
@@ -180,15 +251,15 @@ def statistics():
     
     if DATABASE_AVAILABLE:
         try:
-            db = LibrasDatabase()
+            db = get_database()
             
             # Estatísticas gerais existentes
             stats = db.get_user_statistics(session['username'])
             
             # Estatísticas específicas do Soletrando
-            user_result = db.get_user(session['username'])
-            if user_result:
-                user_id = user_result[0]
+            user_id = current_user_id()
+            if user_id:
+                flush_soletrando_buffer()
                 soletrando_stats = db.get_soletrando_stats(user_id)
             
         except Exception as e:
@@ -278,17 +349,19 @@ def save_soletrando_letter():
             return jsonify({"success": False, "error": "Sistema de estatísticas não disponível"})
         
         # Salvar no banco
-        db = LibrasDatabase()
-        username = session['username']
+        db = get_database()
+        user_id = current_user_id(create=True)
         
-        # Buscar ou criar usuário
-        user_result = db.get_user(username)
-        if not user_result:
-            user_id = db.create_user(username)
-        else:
-            user_id = user_result[0]
-        
-        if user_id:
+        if user_id and soletrando_buffer:
+            # Gravação em lote pela thread do buffer
+            soletrando_buffer.submit((user_id, letter, word, word_position, completion_time, similarity_score,
+                                      datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')))
+            return jsonify({
+                "success": True,
+                "message": f"Letra {letter} registrada",
+                "queued": True
+            })
+        elif user_id:
             # Salvar estatística da letra
             stat_id = db.save_soletrando_letter(
                 user_id=user_id,
@@ -325,15 +398,13 @@ def get_soletrando_stats():
         if not DATABASE_AVAILABLE:
             return jsonify({"success": False, "error": "Sistema de estatísticas não disponível"})
         
-        db = LibrasDatabase()
-        username = session['username']
+        db = get_database()
         
         # Buscar usuário
-        user_result = db.get_user(username)
-        if not user_result:
+        user_id = current_user_id()
+        if not user_id:
             return jsonify({"success": False, "error": "Usuário não encontrado"})
-        
-        user_id = user_result[0]
+        flush_soletrando_buffer()
         stats = db.get_soletrando_stats(user_id)
         
         return jsonify({
@@ -345,6 +416,18 @@ def get_soletrando_stats():
         logger.error(f"Erro ao recuperar estatísticas Soletrando: {e}")
         return jsonify({"success": False, "error": f"Erro interno: {str(e)}"})
 
+@app.route('/api/soletrando/write_behind')
+def soletrando_write_behind_status():
+    """API com a profundidade da fila e a latência das gravações em lote do Soletrando"""
+    if not soletrando_buffer:
+        return jsonify({"success": True, "enabled": False})
+    
+    return jsonify({
+        "success": True,
+        "enabled": True,
+        "status": soletrando_buffer.get_status()
+    })
+
 # ===== MODO DESAFIO =====
 @app.route('/desafio')
 def desafio():
@@ -425,16 +508,13 @@ def save_challenge_result():
         if not all([level, isinstance(words_completed, int), isinstance(score, int)]):
             return jsonify({"success": False, "error": "Dados inválidos fornecidos"})
         
-        db = LibrasDatabase()
-        username = session['username']
+        db = get_database()
         
         # Buscar usuário
-        user_result = db.get_user(username)
-        if not user_result:
+        user_id = current_user_id()
+        if not user_id:
             return jsonify({"success": False, "error": "Usuário não encontrado"})
         
-        user_id = user_result[0]
-        
         # Salvar resultado do desafio
         success = db.save_challenge_result(user_id, level, words_completed, score, time_taken)
         
@@ -464,15 +544,12 @@ def get_challenge_stats():
         if not DATABASE_AVAILABLE:
             return jsonify({"success": False, "error": "Sistema de estatísticas não disponível"})
         
-        db = LibrasDatabase()
-        username = session['username']
+        db = get_database()
         
         # Buscar usuário
-        user_result = db.get_user(username)
-        if not user_result:
+        user_id = current_user_id()
+        if not user_id:
             return jsonify({"success": False, "error": "Usuário não encontrado"})
-        
-        user_id = user_result[0]
         stats = db.get_challenge_stats(user_id)
         
         return jsonify({
@@ -491,15 +568,23 @@ def get_challenge_ranking(level):
         if not DATABASE_AVAILABLE:
             return jsonify({"success": False, "error": "Sistema de ranking não disponível"})
         
-        db = LibrasDatabase()
-        ranking = db.get_challenge_ranking(level, limit=10)
+        scope = request.args.get('scope', 'all')
+        period = request.args.get('period', 'all')
+        
+        db = get_database()
+        ranking = db.get_challenge_ranking(level, limit=request.args.get('limit', 10, type=int),
+                                           scope=scope, period=period)
         
         return jsonify({
             "success": True,
             "ranking": ranking,
-            "level": level
+            "level": level,
+            "scope": scope,
+            "period": period
         })
     
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)})
     except Exception as e:
         logger.error(f"Erro ao recuperar ranking do desafio: {e}")
         return jsonify({"success": False, "error": f"Erro interno: {str(e)}"})
@@ -524,14 +609,10 @@ def collect_ml_example():
         
         # Obter user_id se logado
         user_id = None
-        if 'username' in session and DATABASE_AVAILABLE:
-            try:
-                db = LibrasDatabase()
-                user_result = db.get_user(session['username'])
-                if user_result:
-                    user_id = user_result[0]
-            except:
-                pass
+        try:
+            user_id = current_user_id()
+        except Exception:
+            pass
         
         # Coletar exemplo
         example_id = ml_system.collect_gesture_example(
@@ -610,14 +691,10 @@ def ml_feedback():
         
         # Obter user_id se logado
         user_id = None
-        if 'username' in session and DATABASE_AVAILABLE:
-            try:
-                db = LibrasDatabase()
-                user_result = db.get_user(session['username'])
-                if user_result:
-                    user_id = user_result[0]
-            except:
-                pass
+        try:
+            user_id = current_user_id()
+        except Exception:
+            pass
         
         predicted_letter = data.get('predicted_letter', '').upper()
         actual_letter = data.get('actual_letter', '').upper()
@@ -695,6 +772,64 @@ def train_all_models():
         logger.error(f"Erro ao treinar todos os modelos: {e}")
         return jsonify({"success": False, "error": f"Erro interno: {str(e)}"})
 
+@app.route('/api/ml/migrate_multiclass', methods=['POST'])
+def migrate_multiclass():
+    """API para migrar os modelos por letra para um único modelo multiclasse"""
+    try:
+        if not ML_SYSTEM_AVAILABLE:
+            return jsonify({"success": False, "error": "Sistema de ML não disponível"})
+        
+        data = request.get_json() or {}
+        min_examples = data.get('min_examples', 5)
+        
+        result = ml_system.migrate_to_multiclass(min_examples=min_examples)
+        return jsonify(result)
+    
+    except Exception as e:
+        logger.error(f"Erro ao migrar para o modelo multiclasse: {e}")
+        return jsonify({"success": False, "error": f"Erro interno: {str(e)}"})
+
+@app.route('/api/ml/models')
+def ml_model_versions():
+    """API para listar as versões de modelo do registro"""
+    try:
+        if not ML_SYSTEM_AVAILABLE:
+            return jsonify({"success": False, "error": "Sistema de ML não disponível"})
+        
+        return jsonify({
+            "success": True,
+            "current": ml_system.model_version,
+            "versions": ml_system.get_model_versions()
+        })
+    
+    except Exception as e:
+        logger.error(f"Erro ao listar versões de modelo: {e}")
+        return jsonify({"success": False, "error": f"Erro interno: {str(e)}"})
+
+@app.route('/api/ml/models/rollback', methods=['POST'])
+def ml_model_rollback():
+    """API para voltar à versão de modelo anterior (ou a uma versão específica)"""
+    try:
+        if not ML_SYSTEM_AVAILABLE:
+            return jsonify({"success": False, "error": "Sistema de ML não disponível"})
+        
+        data = request.get_json() or {}
+        
+        try:
+            version = ml_system.rollback_models(data.get('version'))
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)})
+        
+        return jsonify({
+            "success": True,
+            "message": f"Modelos revertidos para a versão {version}",
+            "current": version
+        })
+    
+    except Exception as e:
+        logger.error(f"Erro no rollback de modelos: {e}")
+        return jsonify({"success": False, "error": f"Erro interno: {str(e)}"})
+
 @app.route('/api/ml/stats')
 def ml_stats():
     """API para estatísticas dos modelos ML"""
@@ -706,7 +841,10 @@ def ml_stats():
         
         return jsonify({
             "success": True,
-            "stats": stats
+            "stats": stats,
+            "model_mode": ml_system.model_mode,
+            "model_version": ml_system.model_version,
+            "training_queue": ml_system.get_training_status()
         })
     
     except Exception as e:
@@ -762,12 +900,13 @@ def simulate_letter_recognition(image_data):
     return letters[timestamp]
 
 # ===== FUNÇÕES DE RECONHECIMENTO =====
-def recognize_landmarks_against_saved_gestures(landmarks):
+def recognize_landmarks_against_saved_gestures(landmarks, detail='none'):
     """
     Reconhece landmarks comparando com gestos salvos
     
     Args:
         landmarks: Lista de 21 pontos com coordenadas x, y, z
+        detail: 'full' inclui a análise ponto a ponto de cada comparação
         
     Returns:
         Dict com letra e similaridade ou None se não reconhecido
@@ -787,27 +926,29 @@ def recognize_landmarks_against_saved_gestures(landmarks):
         
         for letter, gesture_data in saved_gestures.items():
             saved_landmarks = gesture_data['landmarks']
-            analysis_result = calculate_landmark_similarity(landmarks, saved_landmarks)
-            
-            # Extrair similaridade do resultado detalhado
-            similarity = analysis_result["similarity"] if isinstance(analysis_result, dict) else analysis_result
+            analysis_result = calculate_landmark_similarity(landmarks, saved_landmarks, detail)
+            similarity = analysis_result["similarity"]
             
             # Salvar resultado detalhado para debug
-            detailed_results.append({
-                'letter': letter,
-                'similarity': similarity,
-                'analysis': analysis_result if isinstance(analysis_result, dict) else None
-            })
+            if detail != 'none':
+                detailed_results.append({
+                    'letter': letter,
+                    'similarity': similarity,
+                    'analysis': analysis_result if detail == 'full' else None
+                })
             
             if similarity > highest_similarity and similarity > similarity_threshold:
                 highest_similarity = similarity
                 best_match = {
                     'letter': letter,
                     'similarity': similarity,
-                    'quality': gesture_data['quality'],
-                    'detailed_analysis': analysis_result if isinstance(analysis_result, dict) else None,
-                    'all_comparisons': detailed_results  # Para debug completo
+                    'quality': gesture_data['quality']
                 }
+                if detail == 'full':
+                    best_match['detailed_analysis'] = analysis_result
+        
+        if best_match and detail != 'none':
+            best_match['all_comparisons'] = detailed_results  # Para debug completo
         
         return best_match
         
@@ -815,13 +956,14 @@ def recognize_landmarks_against_saved_gestures(landmarks):
         logger.error(f"Erro no reconhecimento: {e}")
         return None
 
-def calculate_landmark_similarity(landmarks1, landmarks2):
+def calculate_landmark_similarity(landmarks1, landmarks2, detail='full'):
     """
     Calcula similaridade detalhada entre dois conjuntos de landmarks
     
     Args:
         landmarks1: Primeiro conjunto de landmarks
         landmarks2: Segundo conjunto de landmarks
+        detail: 'full' monta a análise por pontos; outros níveis só a similaridade
         
     Returns:
         dict: Resultado detalhado com similaridade e análise por pontos
@@ -830,6 +972,7 @@ def calculate_landmark_similarity(landmarks1, landmarks2):
         if len(landmarks1) != 21 or len(landmarks2) != 21:
             return {"similarity": 0.0, "point_analysis": [], "total_distance": float('inf')}
         
+        full = detail == 'full'
         point_analysis = []
         total_distance = 0.0
         weighted_distance = 0.0
@@ -869,6 +1012,11 @@ def calculate_landmark_similarity(landmarks1, landmarks2):
             
             # Usar a menor distância (mais tolerante)
             distance = min(distance_3d, distance_2d * 1.1)  # Leve penalidade para 2D
+            total_distance += distance
+            weighted_distance += distance * weight
+            
+            if not full:
+                continue
             
             # Classificar qualidade do match do ponto
             point_quality = "excelente" if distance < 0.05 else \
@@ -886,9 +1034,6 @@ def calculate_landmark_similarity(landmarks1, landmarks2):
                 "coordinates_saved": {"x": p2['x'], "y": p2['y'], "z": p2['z']},
                 "coordinates_current": {"x": p1['x'], "y": p1['y'], "z": p1['z']}
             })
-            
-            total_distance += distance
-            weighted_distance += distance * weight
         
         # Calcular similaridades
         avg_distance = total_distance / 21
@@ -898,6 +1043,9 @@ def calculate_landmark_similarity(landmarks1, landmarks2):
         max_distance = 0.8  # Distância máxima considerada (ajustado empiricamente)
         similarity = max(0.0, 1.0 - (weighted_avg_distance / max_distance))
         
+        if not full:
+            return {"similarity": similarity, "total_distance": total_distance, "avg_distance": avg_distance}
+        
         # Análise estatística dos pontos
         excellent_points = sum(1 for p in point_analysis if p["quality"] == "excelente")
         good_points = sum(1 for p in point_analysis if p["quality"] == "bom")
@@ -971,6 +1119,66 @@ def save_gesture():
         logger.error(f"Erro ao salvar gesto: {e}")
         return jsonify({"success": False, "error": f"Erro interno: {e}"}), 500
 
+@app.route('/api/save_gesture_exemplar', methods=['POST'])
+def save_gesture_exemplar():
+    """Salva mais uma captura de uma letra (modo multi-exemplar)"""
+    try:
+        if not GESTURE_MANAGER_AVAILABLE or not gesture_manager:
+            return jsonify({"success": False, "error": "Sistema de gestos não disponível"}), 500
+
+        data = request.get_json()
+        if not data:
+            return jsonify({"success": False, "error": "Dados não fornecidos"}), 400
+
+        letter = data.get('letter', '').upper()
+        landmarks = data.get('landmarks', [])
+        quality = data.get('quality', 0)
+
+        if not letter or len(letter) != 1:
+            return jsonify({"success": False, "error": "Letra inválida"}), 400
+
+        if not landmarks or len(landmarks) != 21:
+            return jsonify({"success": False, "error": "Landmarks inválidos - deve ter 21 pontos"}), 400
+
+        # Obter user_id se logado (exemplares por sinalizador)
+        user_id = None
+        try:
+            user_id = current_user_id()
+        except Exception:
+            pass
+
+        exemplar_id = gesture_manager.save_exemplar(letter, landmarks, quality, user_id=user_id)
+
+        if exemplar_id:
+            return jsonify({
+                "success": True,
+                "message": f"Exemplar da letra {letter} salvo com sucesso",
+                "exemplar_id": exemplar_id
+            })
+        else:
+            return jsonify({"success": False, "error": "Erro ao salvar exemplar"}), 500
+
+    except Exception as e:
+        logger.error(f"Erro ao salvar exemplar: {e}")
+        return jsonify({"success": False, "error": f"Erro interno: {e}"}), 500
+
+@app.route('/api/gesture_exemplars', methods=['GET'])
+def gesture_exemplars():
+    """Retorna o número de exemplares por letra"""
+    try:
+        if not GESTURE_MANAGER_AVAILABLE or not gesture_manager:
+            return jsonify({"success": False, "error": "Sistema de gestos não disponível"}), 500
+
+        return jsonify({
+            "success": True,
+            "multi_exemplar": gesture_manager.multi_exemplar,
+            "counts": gesture_manager.get_exemplar_counts()
+        })
+
+    except Exception as e:
+        logger.error(f"Erro ao contar exemplares: {e}")
+        return jsonify({"success": False, "error": f"Erro interno: {e}"}), 500
+
 @app.route('/api/get_gestures', methods=['GET'])
 def get_gestures():
     """Recupera todos os gestos salvos"""
@@ -979,7 +1187,7 @@ def get_gestures():
             return jsonify({})
         
         gestures = gesture_manager.get_all_gestures()
-        return jsonify(gestures)
+        return jsonify(dict(gestures))
         
     except Exception as e:
         logger.error(f"Erro ao recuperar gestos: {e}")
@@ -1022,6 +1230,26 @@ def delete_gesture(letter):
         logger.error(f"Erro ao remover gesto da letra {letter}: {e}")
         return jsonify({"success": False, "error": f"Erro interno: {e}"}), 500
 
+def get_detail_level(data):
+    """
+    Nível de detalhe pedido pelo cliente ("detail" no JSON ou ?detail=)
+    
+    none (padrão) devolve só letra e similaridade; summary inclui a
+    similaridade de cada letra; full inclui também a análise ponto a ponto,
+    usada pelas páginas de debug
+    """
+    detail = (data or {}).get('detail') or request.args.get('detail') or DETAIL_NONE
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"Nível de detalhe inválido: {detail} (use {', '.join(DETAIL_LEVELS)})")
+    return detail
+
+def point_analysis_for(landmarks, letter):
+    """Análise ponto a ponto dos landmarks contra o template salvo da letra"""
+    gesture = gesture_manager.get_gesture(letter)
+    if not gesture:
+        return None
+    return calculate_landmark_similarity(landmarks, gesture['landmarks'])
+
 @app.route('/api/recognize_gesture', methods=['POST'])
 def recognize_gesture():
     """Reconhece um gesto usando sistema híbrido (tradicional + ML)"""
@@ -1037,6 +1265,10 @@ def recognize_gesture():
         
         landmarks = data.get('landmarks', [])
         collect_for_ml = data.get('collect_for_ml', True)  # Coletar para ML por padrão
+        try:
+            detail = get_detail_level(data)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
         if not landmarks or len(landmarks) != 21:
             logger.error(f"Landmarks inválidos: {len(landmarks) if landmarks else 0} pontos")
@@ -1046,10 +1278,10 @@ def recognize_gesture():
         
         # Reconhecimento híbrido
         if ML_SYSTEM_AVAILABLE and ml_system:
-            result = gesture_manager.recognize_gesture_hybrid(landmarks, ml_system)
+            result = gesture_manager.recognize_gesture_hybrid(landmarks, ml_system, detail)
         else:
             # Fallback para reconhecimento tradicional usando método híbrido sem ML
-            result = gesture_manager.recognize_gesture_hybrid(landmarks, None)
+            result = gesture_manager.recognize_gesture_hybrid(landmarks, None, detail)
             if not result:
                 result = {
                     'traditional': None,
@@ -1070,14 +1302,10 @@ def recognize_gesture():
                 try:
                     # Obter user_id se logado
                     user_id = None
-                    if 'username' in session and DATABASE_AVAILABLE:
-                        try:
-                            db = LibrasDatabase()
-                            user_result = db.get_user(session['username'])
-                            if user_result:
-                                user_id = user_result[0]
-                        except Exception as db_e:
-                            logger.warning(f"Erro ao obter user_id: {db_e}")
+                    try:
+                        user_id = current_user_id()
+                    except Exception as db_e:
+                        logger.warning(f"Erro ao obter user_id: {db_e}")
                     
                     ml_system.collect_gesture_example(
                         letter=result['final'],
@@ -1091,26 +1319,27 @@ def recognize_gesture():
                     logger.warning(f"Erro ao coletar exemplo ML: {ml_e}")
             
             logger.info(f"Gesto reconhecido: {result['final']} com confiança {result['confidence']:.3f}")
-            return jsonify({
-                "success": True, 
-                "result": {
-                    "letter": result['final'],
-                    "similarity": result['confidence'],
-                    "method": result['method'],
-                    "detailed_analysis": result.get('detailed_analysis', {})
-                }
-            })
+            recognized = {
+                "letter": result['final'],
+                "similarity": result['confidence'],
+                "method": result['method']
+            }
+            if detail != DETAIL_NONE:
+                recognized["traditional"] = result.get('traditional')
+                recognized["ml"] = result.get('ml')
+            if detail == DETAIL_FULL:
+                recognized["detailed_analysis"] = point_analysis_for(landmarks, result['final'])
+            return jsonify({"success": True, "result": recognized})
         else:
             logger.info("Nenhuma letra reconhecida")
-            return jsonify({
-                "success": False, 
-                "message": "Nenhuma letra reconhecida",
-                "debug_info": {
+            response = {"success": False, "message": "Nenhuma letra reconhecida"}
+            if detail != DETAIL_NONE:
+                response["debug_info"] = {
                     "traditional_result": result.get('traditional'),
                     "ml_result": result.get('ml'),
                     "method": result.get('method', 'none')
                 }
-            })
+            return jsonify(response)
             
     except Exception as e:
         logger.error(f"Erro ao reconhecer gesto: {e}")
@@ -1118,6 +1347,226 @@ def recognize_gesture():
         traceback.print_exc()
         return jsonify({"success": False, "error": f"Erro interno: {e}"}), 500
 
+MAX_BATCH_FRAMES = 64  # Limite de frames por requisição em lote
+
+def is_valid_hand(hand):
+    """Uma mão é uma lista de 21 pontos {x, y, z}"""
+    return isinstance(hand, list) and len(hand) == 21 and all(isinstance(point, dict) for point in hand)
+
+@app.route('/api/recognize_gesture_batch', methods=['POST'])
+def recognize_gesture_batch():
+    """Reconhece vários frames (e opcionalmente várias mãos) em uma única requisição"""
+    try:
+        if not GESTURE_MANAGER_AVAILABLE or not gesture_manager:
+            return jsonify({"success": False, "error": "Sistema de gestos não disponível"}), 500
+
+        data = request.get_json()
+        if not data or not isinstance(data.get('frames'), list) or not data['frames']:
+            return jsonify({"success": False, "error": "Frames não fornecidos"}), 400
+
+        frames = data['frames']
+        collect_for_ml = data.get('collect_for_ml', True)
+        try:
+            detail = get_detail_level(data)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        if len(frames) > MAX_BATCH_FRAMES:
+            return jsonify({"success": False, "error": f"Máximo de {MAX_BATCH_FRAMES} frames por requisição"}), 400
+
+        # Cada frame pode ser uma lista de 21 pontos ou {"hands": [mão, ...]}
+        hands_per_frame = []
+        for frame in frames:
+            hands = frame.get('hands') if isinstance(frame, dict) else [frame]
+            if not isinstance(hands, list) or not hands or not all(is_valid_hand(hand) for hand in hands):
+                return jsonify({"success": False, "error": "Landmarks inválidos - cada mão deve ter 21 pontos"}), 400
+            hands_per_frame.append(hands)
+
+        # Todas as mãos de todos os frames em uma única passada
+        all_hands = [hand for hands in hands_per_frame for hand in hands]
+        logger.info(f"Reconhecendo lote com {len(frames)} frames ({len(all_hands)} mãos)")
+
+        hand_results = gesture_manager.recognize_gesture_batch(
+            all_hands, ml_system if ML_SYSTEM_AVAILABLE and ml_system else None, detail
+        )
+
+        def summarize(result):
+            if not result['final']:
+                return None
+            summary = {"letter": result['final'], "similarity": result['confidence'], "method": result['method']}
+            if detail != DETAIL_NONE and result.get('traditional'):
+                summary["all_similarities"] = result['traditional'].get('all_similarities')
+            return summary
+
+        frame_results = []
+        primary_results = []  # Primeira mão de cada frame, usada na decisão agregada
+        position = 0
+        for hands in hands_per_frame:
+            results = hand_results[position:position + len(hands)]
+            position += len(hands)
+            primary_results.append(results[0])
+            frame_results.append({"hands": [summarize(r) for r in results]} if len(hands) > 1 else summarize(results[0]))
+
+        aggregated = gesture_manager.aggregate_batch_results(primary_results)
+
+        best_index = None
+        if aggregated['final']:
+            gesture_manager.update_recognition_stats(aggregated['final'])
+            best_index = max(
+                (i for i, r in enumerate(primary_results) if r['final'] == aggregated['final']),
+                key=lambda i: primary_results[i]['confidence']
+            )
+
+            # Coletar para ML apenas o melhor frame da letra agregada
+            if collect_for_ml and ML_SYSTEM_AVAILABLE and ml_system and aggregated['confidence'] > 0.7:
+                try:
+                    user_id = None
+                    try:
+                        user_id = current_user_id()
+                    except Exception as db_e:
+                        logger.warning(f"Erro ao obter user_id: {db_e}")
+
+                    ml_system.collect_gesture_example(
+                        letter=aggregated['final'],
+                        landmarks=hands_per_frame[best_index][0],
+                        user_id=user_id,
+                        confidence=primary_results[best_index]['confidence'],
+                        source='recognition'
+                    )
+                except Exception as ml_e:
+                    logger.warning(f"Erro ao coletar exemplo ML: {ml_e}")
+
+        response = {
+            "success": aggregated['final'] is not None,
+            "frames": frame_results
+        }
+        if aggregated['final']:
+            response["result"] = {
+                "letter": aggregated['final'],
+                "similarity": aggregated['confidence'],
+                "method": aggregated['method'],
+                "frames_agreeing": aggregated['frames_agreeing'],
+                "total_frames": aggregated['total_frames']
+            }
+            if detail == DETAIL_FULL:
+                # Análise ponto a ponto apenas do melhor frame da letra agregada
+                response["result"]["best_frame"] = best_index
+                response["result"]["detailed_analysis"] = point_analysis_for(
+                    hands_per_frame[best_index][0], aggregated['final']
+                )
+        else:
+            response["message"] = "Nenhuma letra reconhecida"
+
+        return jsonify(response)
+
+    except Exception as e:
+        logger.error(f"Erro ao reconhecer lote de gestos: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": f"Erro interno: {e}"}), 500
+
+@app.route('/api/recognition_cache')
+def recognition_cache_status():
+    """API com a taxa de acerto do cache de resultados de reconhecimento"""
+    if not GESTURE_MANAGER_AVAILABLE or not gesture_manager or not gesture_manager.result_cache:
+        return jsonify({"success": True, "enabled": False})
+    
+    return jsonify({
+        "success": True,
+        "enabled": True,
+        "status": gesture_manager.result_cache.get_status()
+    })
+
+# Janela de suavização das sessões de streaming
+STREAM_WINDOW = int(os.environ.get('STREAM_WINDOW', 5))
+STREAM_MIN_VOTES = int(os.environ.get('STREAM_MIN_VOTES', 3))
+# Cada sessão WebSocket ocupa uma thread do worker enquanto está conectada;
+# o limite por processo deixa threads livres para as requisições HTTP (0 = sem limite)
+STREAM_MAX_SESSIONS = int(os.environ.get('STREAM_MAX_SESSIONS', 0))
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_SESSIONS) if STREAM_MAX_SESSIONS > 0 else None
+
+def recognize_stream(ws):
+    """
+    Sessão de reconhecimento contínuo via WebSocket
+    
+    O cliente envia {"landmarks": [...]} ou {"frames": [...]} (null = frame sem mão)
+    e recebe apenas eventos {"type": "letter", ...} quando uma letra se estabiliza.
+    Mensagens de controle: {"type": "reset"} e {"type": "stats"}.
+    """
+    if not GESTURE_MANAGER_AVAILABLE or not gesture_manager:
+        ws.send(json.dumps({"type": "error", "error": "Sistema de gestos não disponível"}))
+        return
+    
+    if stream_slots is not None and not stream_slots.acquire(blocking=False):
+        logger.warning(f"Limite de {STREAM_MAX_SESSIONS} sessões de streaming atingido neste worker")
+        ws.send(json.dumps({"type": "error", "error": "Servidor ocupado - use /api/recognize_gesture_batch"}))
+        return
+    
+    try:
+        run_stream_session(ws)
+    finally:
+        if stream_slots is not None:
+            stream_slots.release()
+
+def run_stream_session(ws):
+    """Laço de mensagens de uma sessão de reconhecimento contínuo"""
+    stream_session = RecognitionSession(
+        gesture_manager,
+        ml_system if ML_SYSTEM_AVAILABLE and ml_system else None,
+        window=STREAM_WINDOW,
+        min_votes=STREAM_MIN_VOTES
+    )
+    logger.info(f"Sessão de streaming iniciada ({session.get('username', 'anônimo')})")
+    ws.send(json.dumps({"type": "ready", "window": stream_session.window, "min_votes": stream_session.min_votes}))
+    
+    while True:
+        raw_message = ws.receive()
+        if raw_message is None:
+            break
+        
+        try:
+            message = json.loads(raw_message)
+        except ValueError:
+            ws.send(json.dumps({"type": "error", "error": "Mensagem JSON inválida"}))
+            continue
+        if not isinstance(message, dict):
+            ws.send(json.dumps({"type": "error", "error": "A mensagem deve ser um objeto JSON"}))
+            continue
+        
+        message_type = message.get('type', 'frames')
+        if message_type == 'reset':
+            stream_session.reset()
+            continue
+        if message_type == 'stats':
+            ws.send(json.dumps(dict(stream_session.get_stats(), type="stats")))
+            continue
+        
+        frames = message['frames'] if 'frames' in message else [message.get('landmarks')]
+        if not isinstance(frames, list) or len(frames) > MAX_BATCH_FRAMES:
+            ws.send(json.dumps({"type": "error", "error": f"Envie até {MAX_BATCH_FRAMES} frames por mensagem"}))
+            continue
+        # Cada frame é null (sem mão) ou uma lista de 21 pontos {x, y, z}
+        if any(frame is not None and not is_valid_hand(frame) for frame in frames):
+            ws.send(json.dumps({"type": "error", "error": "Landmarks inválidos - deve ter 21 pontos"}))
+            continue
+        
+        # Um frame problemático não encerra a sessão: o cliente recebe o erro e segue enviando
+        try:
+            events = stream_session.push_frames(frames)
+        except Exception as e:
+            logger.error(f"Erro no reconhecimento em streaming: {e}")
+            ws.send(json.dumps({"type": "error", "error": "Erro ao processar frames"}))
+            continue
+        
+        for event in events:
+            gesture_manager.update_recognition_stats(event['letter'])
+            ws.send(json.dumps(event))
+    
+    logger.info(f"Sessão de streaming encerrada: {stream_session.get_stats()}")
+
+if WEBSOCKET_AVAILABLE:
+    sock.route('/ws/recognize')(recognize_stream)
+
 @app.route('/api/export_gestures', methods=['GET'])
 def export_gestures():
     """Exporta todos os gestos para backup"""
@@ -1243,6 +1692,11 @@ def serve_csv():
         logger.error(f"Erro ao servir CSV: {e}")
         abort(404)
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas de latência no formato texto do Prometheus"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/health')
 def health_check():
     """Health check para monitoramento"""
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos modos de normalização de landmarks (legacy, palm, procrustes)
+Mede acurácia, falsos positivos e latência da comparação contra os templates
+com a mão girada em ângulos crescentes
+
+Templates: mãos sintéticas (26 letras com flexões de dedos diferentes) ou os
+gestos salvos em um banco (--db gestures.db). Consultas: cada template girado,
+escalado, deslocado e com ruído de captura; poses desconhecidas (fora do
+conjunto de templates) medem os falsos positivos no threshold do reconhecimento
+
+Uso:
+    python benchmark_normalization.py [--queries 20] [--angles 0,15,30,45] [--db gestures.db]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from gesture_matcher import NORMALIZATION_MODES, TemplateMatcher, landmarks_to_array, normalize_array, normalize_batch
+
+THRESHOLD = 0.4  # Mesmo threshold de GestureManager._build_recognition_result
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Base de cada dedo na palma (mão direita, palma para a câmera, dedos para cima)
+FINGER_BASES = [(-0.35, -0.25), (-0.25, -0.95), (0.0, -1.0), (0.22, -0.95), (0.42, -0.85)]
+FINGER_SEGMENTS = [(0.45, 0.35, 0.3), (0.45, 0.28, 0.22), (0.5, 0.32, 0.24), (0.47, 0.3, 0.22), (0.36, 0.24, 0.2)]
+FINGER_SPREAD = [-0.9, -0.1, 0.0, 0.1, 0.25]  # Direção de cada dedo (radianos a partir do eixo -y)
+
+
+def synthetic_hand(flexion: np.ndarray) -> np.ndarray:
+    """Mão (21, 3) com o pulso na origem; ``flexion`` (5, 3) em radianos por articulação"""
+    points = [np.zeros(3)]
+    for finger, (base_x, base_y) in enumerate(FINGER_BASES):
+        spread = FINGER_SPREAD[finger]
+        direction = np.array([np.sin(spread), -np.cos(spread), 0.0])
+        position = np.array([base_x, base_y, 0.0]) if finger else np.array([base_x, base_y, 0.0]) * 0.5
+        angle = 0.0
+        if finger:
+            points.append(position.copy())  # MCP; no polegar o primeiro ponto é o CMC
+        else:
+            points.append(position.copy())
+        for joint, length in enumerate(FINGER_SEGMENTS[finger]):
+            angle += flexion[finger, joint]
+            # Flexão dobra o dedo em direção à câmera (-z no MediaPipe)
+            step = direction * np.cos(angle) + np.array([0.0, 0.0, -np.sin(angle)])
+            position = position + step * length
+            points.append(position.copy())
+    return np.array(points[:21])
+
+
+def rotation(roll: float, pitch: float, yaw: float) -> np.ndarray:
+    cr, sr, cp, sp, cy, sy = np.cos(roll), np.sin(roll), np.cos(pitch), np.sin(pitch), np.cos(yaw), np.sin(yaw)
+    rz = np.array([[cr, -sr, 0], [sr, cr, 0], [0, 0, 1]])
+    rx = np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]])
+    ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    return rz @ rx @ ry
+
+
+def capture(hand: np.ndarray, rng: np.random.Generator, max_angle: float, jitter: float = 0.004) -> np.ndarray:
+    """Simula uma captura: rotação de até ``max_angle`` graus, escala, posição na imagem e ruído"""
+    limit = np.radians(max_angle)
+    roll = rng.uniform(-limit, limit)
+    tilt = rng.uniform(-limit, limit, size=2) * 0.5  # Inclinações para fora do plano são menores
+    points = hand @ rotation(roll, tilt[0], tilt[1]).T
+    points = points * rng.uniform(0.12, 0.25) + np.array([rng.uniform(0.35, 0.65), rng.uniform(0.45, 0.7), 0.0])
+    return points + rng.normal(0.0, jitter, size=points.shape)
+
+
+def load_templates(db_path):
+    """Templates salvos em um banco de gestos (coordenadas da imagem, como capturadas)"""
+    from gesture_manager import GestureManager
+
+    gestures = GestureManager(db_path=db_path).get_all_gestures()
+    letters = sorted(gestures)
+    return letters, np.stack([landmarks_to_array(gestures[letter]['landmarks'], dtype=np.float64) for letter in letters])
+
+
+def synthetic_templates(rng):
+    """26 letras sintéticas, mais 26 poses desconhecidas para medir falsos positivos"""
+    flexions = rng.uniform(0.0, 1.4, size=(52, 5, 3))
+    hands = np.stack([synthetic_hand(flexion) for flexion in flexions])
+    # Templates capturados de frente, como no /admin
+    captured = np.stack([capture(hand, rng, max_angle=0) for hand in hands])
+    return list(LETTERS), captured[:26], hands[:26], hands[26:]
+
+
+def best_time(fn, repeats=3):
+    """Menor tempo (segundos) entre algumas execuções, após um aquecimento"""
+    fn()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run_mode(mode, letters, templates, queries, expected, unknown):
+    matcher = TemplateMatcher(letters, normalize_batch(templates, mode), mode)
+
+    # Latência de uma consulta isolada (caminho de /api/recognize_gesture)
+    def single():
+        for query in queries:
+            matcher.best_match(normalize_array(query, mode), with_all=False)
+    single_us = best_time(single) / len(queries) * 1e6
+
+    # Latência por frame em lote (caminho de /api/recognize_gesture_batch)
+    batch_us = best_time(lambda: matcher.score_batch(normalize_batch(queries, mode))) / len(queries) * 1e6
+    scores = matcher.score_batch(normalize_batch(queries, mode))
+
+    best = np.argmax(scores, axis=1)
+    best_scores = scores[np.arange(len(queries)), best]
+    predicted = np.array(letters)[best]
+    accepted = best_scores > THRESHOLD
+    correct = (predicted == np.array(expected)) & accepted
+
+    unknown_scores = matcher.score_batch(normalize_batch(unknown, mode)).max(axis=1)
+
+    # Separação: threshold que mantém 95% dos acertos e quantas poses desconhecidas passam nele
+    right_letter = predicted == np.array(expected)
+    strict = np.percentile(best_scores[right_letter], 5) if right_letter.any() else 1.0
+    return {
+        'accuracy': correct.mean(),
+        'wrong_accepted': (accepted & ~correct).mean(),
+        'unknown_accepted': (unknown_scores > THRESHOLD).mean(),
+        'strict_threshold': strict,
+        'unknown_strict': (unknown_scores > strict).mean(),
+        'margin': float(np.median(best_scores[correct])) if correct.any() else 0.0,
+        'single_us': single_us,
+        'batch_us': batch_us,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos modos de normalização de landmarks")
+    parser.add_argument('--queries', type=int, default=20, help="Capturas por letra em cada ângulo")
+    parser.add_argument('--angles', default='0,15,30,45', help="Rotação máxima (graus) de cada rodada")
+    parser.add_argument('--db', help="Usar os gestos salvos neste banco como templates")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    letters, templates, shapes, unknown_shapes = synthetic_templates(rng)
+    if args.db:
+        letters, templates = load_templates(args.db)
+        # Forma de cada letra recuperada do template: pulso na origem, tamanho unitário
+        shapes = templates - templates[:, :1]
+        shapes /= np.linalg.norm(shapes[:, 12], axis=1)[:, None, None] * 0.6
+    if len(letters) == 0:
+        print("❌ Nenhum template para comparar")
+        return
+
+    print(f"📊 {len(letters)} templates, {args.queries} capturas por letra, threshold {THRESHOLD}")
+    print("desconhecida: poses fora do conjunto aceitas no threshold; @95%: no threshold que mantém 95% dos acertos")
+    print(f"{'rotação':>8} {'modo':>11} {'acerto':>8} {'erro aceito':>12} {'desconhecida':>13} "
+          f"{'@95% (thr)':>15} {'similaridade':>13} {'µs/consulta':>12} {'µs/frame lote':>14}")
+
+    for max_angle in (float(a) for a in args.angles.split(',')):
+        queries = np.stack([capture(shapes[i], rng, max_angle) for i in range(len(letters)) for _ in range(args.queries)])
+        expected = [letter for letter in letters for _ in range(args.queries)]
+        unknown = np.stack([capture(shape, rng, max_angle) for shape in unknown_shapes for _ in range(4)])
+
+        for mode in NORMALIZATION_MODES:
+            r = run_mode(mode, letters, templates, queries, expected, unknown)
+            print(f"{max_angle:>7.0f}° {mode:>11} {r['accuracy']:>8.1%} {r['wrong_accepted']:>12.1%} "
+                  f"{r['unknown_accepted']:>13.1%} {r['unknown_strict']:>7.1%} ({r['strict_threshold']:.2f}) "
+                  f"{r['margin']:>13.3f} {r['single_us']:>12.1f} {r['batch_us']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
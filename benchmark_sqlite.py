@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark de leitura/escrita concorrente no SQLite
+Compara o perfil padrão do SQLite (legacy) com o perfil do projeto (tuned)
+
+Uso:
+    python benchmark_sqlite.py [--seconds 5] [--writers 4] [--readers 4]
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+
+def run_profile(profile, seconds, writers, readers):
+    os.environ['SQLITE_PROFILE'] = profile
+
+    # Importar depois de definir o perfil
+    from database import LibrasDatabase
+
+    workdir = tempfile.mkdtemp(prefix=f"bench-{profile}-")
+    try:
+        db = LibrasDatabase(os.path.join(workdir, "libras_stats.db"))
+        user_ids = [db.create_user(f"aluno{i}") for i in range(20)]
+        for user_id in user_ids:
+            db.save_challenge_result(user_id, 'iniciante', random.randint(1, 10), random.randint(10, 100), 60)
+
+        stop = threading.Event()
+        results = {'write': [], 'read': []}
+        lock = threading.Lock()
+
+        def writer():
+            latencies = []
+            while not stop.is_set():
+                start = time.perf_counter()
+                db.save_soletrando_letter(random.choice(user_ids), random.choice("ABCDE"), "CASA", 1,
+                                          random.uniform(0.5, 3.0), random.uniform(0.5, 1.0))
+                latencies.append(time.perf_counter() - start)
+            with lock:
+                results['write'].extend(latencies)
+
+        def reader():
+            latencies = []
+            while not stop.is_set():
+                start = time.perf_counter()
+                db.get_soletrando_stats(random.choice(user_ids))
+                db.get_challenge_ranking('iniciante')
+                latencies.append(time.perf_counter() - start)
+            with lock:
+                results['read'].extend(latencies)
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        summary = {}
+        for kind, latencies in results.items():
+            latencies.sort()
+            summary[kind] = {
+                'ops_per_second': len(latencies) / seconds,
+                'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+            }
+        return summary
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concorrência do SQLite")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"📊 {args.writers} escritores + {args.readers} leitores por {args.seconds:.0f}s\n")
+    for profile in ('legacy', 'tuned'):
+        # Silenciar os prints de cada operação do LibrasDatabase
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            summary = run_profile(profile, args.seconds, args.writers, args.readers)
+        print(f"Perfil {profile}:")
+        for kind in ('write', 'read'):
+            print(f"  {kind:5s}: {summary[kind]['ops_per_second']:8.1f} ops/s   p95 {summary[kind]['p95_ms']:7.2f} ms")
+        print()
+
+
+if __name__ == '__main__':
+    main()
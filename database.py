@@ -1,16 +1,310 @@
 import sqlite3
 import json
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 import os
+import threading
+
+from leaderboard import LEADERBOARD_SCHEMA_SQL, Leaderboard, rebuild_statements, record_result, validate_board
+from metrics import instrument_methods
+from schema_migrations import apply_migrations
+from sqlite_factory import connect as connect_sqlite
+
+# Tabelas de agregados por usuário, mantidas na mesma transação dos saves
+AGGREGATE_TABLES_SQL = [
+    """CREATE TABLE IF NOT EXISTS soletrando_user_totals (
+        user_id INTEGER PRIMARY KEY,
+        total_letters INTEGER NOT NULL DEFAULT 0,
+        total_words INTEGER NOT NULL DEFAULT 0,
+        time_sum REAL NOT NULL DEFAULT 0,
+        best_time REAL,
+        worst_time REAL,
+        similarity_sum REAL NOT NULL DEFAULT 0,
+        similarity_count INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS soletrando_user_letters (
+        user_id INTEGER NOT NULL,
+        letter CHARACTER(1) NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        time_sum REAL NOT NULL DEFAULT 0,
+        best_time REAL,
+        similarity_sum REAL NOT NULL DEFAULT 0,
+        similarity_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, letter)
+    )""",
+    """CREATE TABLE IF NOT EXISTS soletrando_user_words (
+        user_id INTEGER NOT NULL,
+        word TEXT NOT NULL,
+        letters_count INTEGER NOT NULL DEFAULT 0,
+        time_sum REAL NOT NULL DEFAULT 0,
+        similarity_sum REAL NOT NULL DEFAULT 0,
+        similarity_count INTEGER NOT NULL DEFAULT 0,
+        started_at TIMESTAMP,
+        completed_at TIMESTAMP,
+        PRIMARY KEY (user_id, word)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_soletrando_user_words_completed ON soletrando_user_words (user_id, completed_at)",
+    """CREATE TABLE IF NOT EXISTS soletrando_user_daily (
+        user_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        letters_completed INTEGER NOT NULL DEFAULT 0,
+        words_worked INTEGER NOT NULL DEFAULT 0,
+        time_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    )""",
+    """CREATE TABLE IF NOT EXISTS soletrando_user_day_words (
+        user_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        word TEXT NOT NULL,
+        PRIMARY KEY (user_id, day, word)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS challenge_user_totals (
+        user_id INTEGER PRIMARY KEY,
+        games INTEGER NOT NULL DEFAULT 0,
+        words_sum INTEGER NOT NULL DEFAULT 0,
+        score_sum INTEGER NOT NULL DEFAULT 0,
+        best_score INTEGER,
+        best_words INTEGER,
+        wpm_sum REAL NOT NULL DEFAULT 0,
+        best_wpm REAL
+    )""",
+    """CREATE TABLE IF NOT EXISTS challenge_user_levels (
+        user_id INTEGER NOT NULL,
+        level TEXT NOT NULL,
+        games INTEGER NOT NULL DEFAULT 0,
+        words_sum INTEGER NOT NULL DEFAULT 0,
+        score_sum INTEGER NOT NULL DEFAULT 0,
+        best_score INTEGER,
+        best_words INTEGER,
+        wpm_sum REAL NOT NULL DEFAULT 0,
+        best_wpm REAL,
+        PRIMARY KEY (user_id, level)
+    )""",
+    """CREATE TABLE IF NOT EXISTS challenge_user_daily (
+        user_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        games INTEGER NOT NULL DEFAULT 0,
+        words_sum INTEGER NOT NULL DEFAULT 0,
+        best_score INTEGER,
+        wpm_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    )""",
+]
+
+# Recalcula todos os agregados a partir das tabelas de eventos (backfill)
+AGGREGATE_REBUILD_SQL = [
+    "DELETE FROM soletrando_user_totals",
+    "DELETE FROM soletrando_user_letters",
+    "DELETE FROM soletrando_user_words",
+    "DELETE FROM soletrando_user_daily",
+    "DELETE FROM soletrando_user_day_words",
+    "DELETE FROM challenge_user_totals",
+    "DELETE FROM challenge_user_levels",
+    "DELETE FROM challenge_user_daily",
+    """INSERT INTO soletrando_user_totals
+        SELECT user_id, COUNT(*), COUNT(DISTINCT word), SUM(completion_time), MIN(completion_time),
+               MAX(completion_time), COALESCE(SUM(similarity_score), 0), COUNT(similarity_score)
+        FROM soletrando_stats WHERE user_id IS NOT NULL GROUP BY user_id""",
+    """INSERT INTO soletrando_user_letters
+        SELECT user_id, letter, COUNT(*), SUM(completion_time), MIN(completion_time),
+               COALESCE(SUM(similarity_score), 0), COUNT(similarity_score)
+        FROM soletrando_stats WHERE user_id IS NOT NULL GROUP BY user_id, letter""",
+    """INSERT INTO soletrando_user_words
+        SELECT user_id, word, COUNT(*), SUM(completion_time), COALESCE(SUM(similarity_score), 0),
+               COUNT(similarity_score), MIN(created_at), MAX(created_at)
+        FROM soletrando_stats WHERE user_id IS NOT NULL GROUP BY user_id, word""",
+    """INSERT INTO soletrando_user_daily
+        SELECT user_id, DATE(created_at), COUNT(*), COUNT(DISTINCT word), SUM(completion_time)
+        FROM soletrando_stats WHERE user_id IS NOT NULL GROUP BY user_id, DATE(created_at)""",
+    """INSERT INTO soletrando_user_day_words
+        SELECT DISTINCT user_id, DATE(created_at), word
+        FROM soletrando_stats WHERE user_id IS NOT NULL""",
+    """INSERT INTO challenge_user_totals
+        SELECT user_id, COUNT(*), SUM(words_completed), SUM(score), MAX(score), MAX(words_completed),
+               SUM(words_per_minute), MAX(words_per_minute)
+        FROM challenge_results WHERE user_id IS NOT NULL GROUP BY user_id""",
+    """INSERT INTO challenge_user_levels
+        SELECT user_id, level, COUNT(*), SUM(words_completed), SUM(score), MAX(score), MAX(words_completed),
+               SUM(words_per_minute), MAX(words_per_minute)
+        FROM challenge_results WHERE user_id IS NOT NULL GROUP BY user_id, level""",
+    """INSERT INTO challenge_user_daily
+        SELECT user_id, DATE(created_at), COUNT(*), SUM(words_completed), MAX(score), SUM(words_per_minute)
+        FROM challenge_results WHERE user_id IS NOT NULL GROUP BY user_id, DATE(created_at)""",
+]
+
+# Média móvel, melhor e pior tempo calculados pelo próprio SQLite (sem SELECT antes)
+LETTER_STATS_UPSERT_SQL = '''
+    INSERT INTO letter_stats
+    (user_id, letter, total_attempts, correct_attempts, avg_time, best_time, worst_time, updated_at)
+    VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, letter) DO UPDATE SET
+        total_attempts = letter_stats.total_attempts + 1,
+        correct_attempts = letter_stats.correct_attempts + excluded.correct_attempts,
+        avg_time = (letter_stats.avg_time * letter_stats.total_attempts + excluded.avg_time)
+                   / (letter_stats.total_attempts + 1),
+        best_time = CASE WHEN letter_stats.best_time > 0
+                         THEN MIN(letter_stats.best_time, excluded.best_time)
+                         ELSE excluded.best_time END,
+        worst_time = MAX(letter_stats.worst_time, excluded.worst_time),
+        updated_at = excluded.updated_at
+'''
+
+# Migrações versionadas do banco de estatísticas (ver schema_migrations.py)
+STATS_MIGRATIONS = [
+    (1, "Índices das consultas de estatísticas e ranking", [
+        # get_soletrando_stats: por letra, por palavra e progresso diário do usuário
+        "CREATE INDEX IF NOT EXISTS idx_soletrando_user_letter ON soletrando_stats (user_id, letter)",
+        "CREATE INDEX IF NOT EXISTS idx_soletrando_user_word ON soletrando_stats (user_id, word)",
+        "CREATE INDEX IF NOT EXISTS idx_soletrando_user_created ON soletrando_stats (user_id, created_at)",
+        # get_challenge_ranking: ordem do ranking dentro de um nível
+        "CREATE INDEX IF NOT EXISTS idx_challenge_ranking "
+        "ON challenge_results (level, score DESC, words_completed DESC, time_taken)",
+        # get_challenge_stats: por nível, últimos jogos e progresso diário do usuário
+        "CREATE INDEX IF NOT EXISTS idx_challenge_user_level ON challenge_results (user_id, level)",
+        "CREATE INDEX IF NOT EXISTS idx_challenge_user_created ON challenge_results (user_id, created_at)",
+        # get_user_stats / get_user_statistics / get_letter_progress
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_start ON game_sessions (user_id, start_time)",
+        "CREATE INDEX IF NOT EXISTS idx_letter_times_session_letter ON letter_times (session_id, letter)",
+        "CREATE INDEX IF NOT EXISTS idx_practiced_words_session ON practiced_words (session_id)",
+        "ANALYZE",
+    ]),
+    (2, "Tabelas de agregados por usuário (Soletrando e Desafio)", AGGREGATE_TABLES_SQL + AGGREGATE_REBUILD_SQL),
+    (3, "Ranking top-K do Desafio por nível, escopo e período", LEADERBOARD_SCHEMA_SQL + rebuild_statements()),
+]
+
+
+USER_ID_CACHE_SIZE = int(os.environ.get('USER_ID_CACHE_SIZE', 1024))
+
+
+class _UserIdCache:
+    """Cache LRU limitado de nome de usuário -> id (invalidado por LibrasDatabase.delete_user)"""
+    
+    def __init__(self, max_size=USER_ID_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, username):
+        with self._lock:
+            user_id = self._ids.get(username)
+            if user_id is None:
+                self.misses += 1
+                return None
+            self._ids.move_to_end(username)
+            self.hits += 1
+            return user_id
+    
+    def put(self, username, user_id):
+        with self._lock:
+            self._ids[username] = user_id
+            self._ids.move_to_end(username)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+    
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None:
+                self._ids.clear()
+            else:
+                self._ids.pop(username, None)
+
+
+class _PooledConnection(sqlite3.Connection):
+    """
+    Conexão reaproveitada pela thread que a criou
+    
+    Os métodos do LibrasDatabase continuam chamando commit()/close() como
+    antes: close() apenas devolve a conexão (desfazendo o que ficou sem
+    commit) e, dentro de LibrasDatabase.transaction(), commit() e rollback()
+    ficam a cargo do bloco externo.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.owner_pid = os.getpid()
+        self.transaction_depth = 0
+    
+    def commit(self):
+        if self.transaction_depth == 0:
+            super().commit()
+    
+    def rollback(self):
+        if self.transaction_depth == 0:
+            super().rollback()
+    
+    def close(self):
+        if self.transaction_depth == 0 and self.in_transaction:
+            super().rollback()
+    
+    def really_close(self):
+        super().close()
+
 
 class LibrasDatabase:
+    # Caminhos cujo schema já foi criado neste processo
+    _schema_ready = set()
+    _schema_lock = threading.Lock()
+    
     def __init__(self, db_path="libras_stats.db"):
         self.db_path = db_path
-        self.init_database()
+        self._local = threading.local()
+        self.leaderboard = Leaderboard()
+        self.user_ids = _UserIdCache()
+        
+        with LibrasDatabase._schema_lock:
+            if os.path.abspath(db_path) not in LibrasDatabase._schema_ready:
+                self.init_database()
+                LibrasDatabase._schema_ready.add(os.path.abspath(db_path))
+    
+    def _connect(self):
+        """Conexão da thread atual (criada na primeira chamada e reaproveitada)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or conn.owner_pid != os.getpid():
+            # Conexões herdadas de outro processo (fork) não podem ser reutilizadas
+            conn = connect_sqlite(self.db_path, factory=_PooledConnection)
+            self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Executa várias operações em uma única transação
+        
+        Exemplo:
+            with db.transaction() as conn:
+                db.save_soletrando_letter(...)
+                db.update_letter_stats(...)
+        
+        Commit ao final do bloco; rollback se ocorrer uma exceção.
+        Blocos aninhados fazem parte da transação mais externa.
+        """
+        conn = self._connect()
+        conn.transaction_depth += 1
+        try:
+            yield conn
+        except BaseException:
+            conn.transaction_depth -= 1
+            if conn.transaction_depth == 0:
+                conn.rollback()
+            raise
+        else:
+            conn.transaction_depth -= 1
+            if conn.transaction_depth == 0:
+                conn.commit()
+    
+    def close(self):
+        """Fecha a conexão da thread atual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.owner_pid == os.getpid():
+            conn.really_close()
+        self._local.conn = None
     
     def init_database(self):
         """Cria as tabelas se não existirem"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Tabela de usuários
@@ -121,18 +415,21 @@ class LibrasDatabase:
         ''')
         
         conn.commit()
+        
+        apply_migrations(conn, STATS_MIGRATIONS)
         conn.close()
         print(f"Banco de dados inicializado: {self.db_path}")
     
     def create_user(self, username):
         """Cria um novo usuário"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
             cursor.execute('INSERT INTO users (username) VALUES (?)', (username,))
             user_id = cursor.lastrowid
             conn.commit()
+            self.user_ids.put(username, user_id)
             print(f"Usuário criado: {username} (ID: {user_id})")
             return user_id
         except sqlite3.IntegrityError:
@@ -143,7 +440,7 @@ class LibrasDatabase:
     
     def get_user(self, username):
         """Busca um usuário pelo nome"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT id, username FROM users WHERE username = ?', (username,))
@@ -155,9 +452,52 @@ class LibrasDatabase:
         
         return result
     
+    def get_user_id(self, username):
+        """Id do usuário pelo nome, usando o cache LRU (None se não existir)"""
+        user_id = self.user_ids.get(username)
+        if user_id is None:
+            conn = self._connect()
+            try:
+                row = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+            finally:
+                conn.close()
+            if row:
+                user_id = row[0]
+                self.user_ids.put(username, user_id)
+        return user_id
+    
+    def get_or_create_user(self, username):
+        """Id do usuário pelo nome, criando o usuário se ainda não existir"""
+        user_id = self.get_user_id(username)
+        if user_id is None:
+            with self.transaction() as conn:
+                conn.execute('INSERT OR IGNORE INTO users (username) VALUES (?)', (username,))
+                user_id = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()[0]
+            self.user_ids.put(username, user_id)
+        return user_id
+    
+    def invalidate_user_cache(self, username=None):
+        """Remove um usuário (ou todos) do cache de ids"""
+        self.user_ids.invalidate(username)
+    
+    def delete_user(self, username):
+        """
+        Remove um usuário e o tira do cache de ids
+        
+        As estatísticas antigas continuam com o id removido; um novo cadastro
+        com o mesmo nome recebe outro id (AUTOINCREMENT nunca reaproveita ids).
+        
+        Returns:
+            True se o usuário existia
+        """
+        with self.transaction() as conn:
+            deleted = conn.execute('DELETE FROM users WHERE username = ?', (username,)).rowcount
+        self.invalidate_user_cache(username)
+        return deleted > 0
+    
     def start_session(self, user_id, game_mode, difficulty):
         """Inicia uma nova sessão de jogo"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         start_time = datetime.now()
@@ -176,7 +516,7 @@ class LibrasDatabase:
     
     def end_session(self, session_id, stats):
         """Finaliza uma sessão com estatísticas"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         end_time = datetime.now()
@@ -204,7 +544,7 @@ class LibrasDatabase:
     
     def save_word_practice(self, session_id, word, completion_time, letter_count, correct_letters):
         """Salva dados de uma palavra praticada"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -222,7 +562,7 @@ class LibrasDatabase:
     
     def save_letter_times(self, session_id, word_id, letter_times_data):
         """Salva tempos individuais das letras"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         for i, (letter, time_seconds) in enumerate(letter_times_data):
@@ -239,44 +579,30 @@ class LibrasDatabase:
     
     def update_letter_stats(self, user_id, letter, time_seconds, was_correct):
         """Atualiza estatísticas por letra"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Buscar estatísticas atuais
-        cursor.execute('''
-            SELECT total_attempts, correct_attempts, avg_time, best_time, worst_time 
-            FROM letter_stats WHERE user_id = ? AND letter = ?
-        ''', (user_id, letter))
-        
-        result = cursor.fetchone()
-        
-        if result:
-            total_attempts, correct_attempts, avg_time, best_time, worst_time = result
-            new_total = total_attempts + 1
-            new_correct = correct_attempts + (1 if was_correct else 0)
-            new_avg = ((avg_time * total_attempts) + time_seconds) / new_total
-            new_best = min(best_time, time_seconds) if best_time > 0 else time_seconds
-            new_worst = max(worst_time, time_seconds)
-            
-            cursor.execute('''
-                UPDATE letter_stats 
-                SET total_attempts = ?, correct_attempts = ?, avg_time = ?, 
-                    best_time = ?, worst_time = ?, updated_at = ?
-                WHERE user_id = ? AND letter = ?
-            ''', (new_total, new_correct, new_avg, new_best, new_worst, datetime.now(), user_id, letter))
-        else:
-            cursor.execute('''
-                INSERT INTO letter_stats 
-                (user_id, letter, total_attempts, correct_attempts, avg_time, best_time, worst_time)
-                VALUES (?, ?, 1, ?, ?, ?, ?)
-            ''', (user_id, letter, 1 if was_correct else 0, time_seconds, time_seconds, time_seconds))
-        
-        conn.commit()
-        conn.close()
+        self.update_letter_stats_batch(user_id, [(letter, time_seconds, was_correct)])
+    
+    def update_letter_stats_batch(self, user_id, results):
+        """
+        Atualiza as estatísticas de várias letras (ex.: uma palavra inteira) em uma transação
+        
+        Args:
+            user_id: ID do usuário
+            results: Sequência de (letra, tempo_em_segundos, acertou)
+        """
+        now = datetime.now()
+        rows = [
+            (user_id, letter, 1 if was_correct else 0, time_seconds, time_seconds, time_seconds, now)
+            for letter, time_seconds, was_correct in results
+        ]
+        if not rows:
+            return
+        
+        with self.transaction() as conn:
+            conn.executemany(LETTER_STATS_UPSERT_SQL, rows)
     
     def get_user_stats(self, user_id, days=30):
         """Busca estatísticas do usuário"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Estatísticas gerais
@@ -321,7 +647,7 @@ class LibrasDatabase:
     
     def get_letter_progress(self, user_id, letter):
         """Busca progresso específico de uma letra"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -340,7 +666,7 @@ class LibrasDatabase:
     
     def cleanup_old_data(self, days=90):
         """Remove dados antigos para economizar espaço"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Remover sessões antigas
@@ -358,19 +684,26 @@ class LibrasDatabase:
     
     def save_soletrando_letter(self, user_id, letter, word, word_position, completion_time, similarity_score=None):
         """Salva estatísticas de uma letra completada no Soletrando"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
+            # Mesmo timestamp (UTC, como CURRENT_TIMESTAMP) no evento e nos agregados
+            created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
             cursor.execute('''
                 INSERT INTO soletrando_stats 
-                (user_id, letter, word, word_position, completion_time, similarity_score)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (user_id, letter, word, word_position, completion_time, similarity_score))
+                (user_id, letter, word, word_position, completion_time, similarity_score, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, letter, word, word_position, completion_time, similarity_score, created_at))
+            row_id = cursor.lastrowid
+            
+            if user_id is not None:
+                self._update_soletrando_aggregates(cursor, user_id, letter, word, completion_time,
+                                                   similarity_score, created_at)
             
             conn.commit()
             print(f"Letra Soletrando salva: {letter} em '{word}' - Tempo: {completion_time:.2f}s")
-            return cursor.lastrowid
+            return row_id
         
         except Exception as e:
             print(f"Erro ao salvar letra Soletrando: {e}")
@@ -378,37 +711,128 @@ class LibrasDatabase:
         finally:
             conn.close()
     
+    def save_soletrando_letters(self, events):
+        """
+        Salva várias letras do Soletrando em uma única transação (usado pelo buffer write-behind)
+        
+        Args:
+            events: Sequência de (user_id, letter, word, word_position, completion_time,
+                    similarity_score, created_at); created_at em UTC 'YYYY-MM-DD HH:MM:SS'
+        
+        Returns:
+            Quantidade de letras gravadas
+        """
+        events = list(events)
+        if not events:
+            return 0
+        
+        with self.transaction() as conn:
+            conn.executemany('''
+                INSERT INTO soletrando_stats 
+                (user_id, letter, word, word_position, completion_time, similarity_score, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', events)
+            
+            cursor = conn.cursor()
+            for user_id, letter, word, _, completion_time, similarity_score, created_at in events:
+                if user_id is not None:
+                    self._update_soletrando_aggregates(cursor, user_id, letter, word, completion_time,
+                                                       similarity_score, created_at)
+        
+        print(f"Lote Soletrando salvo: {len(events)} letras")
+        return len(events)
+    
+    def _update_soletrando_aggregates(self, cursor, user_id, letter, word, completion_time, similarity_score, created_at):
+        """Atualiza os agregados do Soletrando na transação do save"""
+        day = created_at[:10]
+        similarity = similarity_score if similarity_score is not None else 0
+        has_similarity = 1 if similarity_score is not None else 0
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO soletrando_user_words (user_id, word, started_at, completed_at)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, word, created_at, created_at))
+        new_word = cursor.rowcount == 1
+        
+        cursor.execute('''
+            UPDATE soletrando_user_words
+            SET letters_count = letters_count + 1, time_sum = time_sum + ?,
+                similarity_sum = similarity_sum + ?, similarity_count = similarity_count + ?,
+                completed_at = MAX(completed_at, ?)
+            WHERE user_id = ? AND word = ?
+        ''', (completion_time, similarity, has_similarity, created_at, user_id, word))
+        
+        cursor.execute('''
+            INSERT INTO soletrando_user_totals
+            (user_id, total_letters, total_words, time_sum, best_time, worst_time, similarity_sum, similarity_count)
+            VALUES (?, 1, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                total_letters = total_letters + 1,
+                total_words = total_words + excluded.total_words,
+                time_sum = time_sum + excluded.time_sum,
+                best_time = MIN(COALESCE(best_time, excluded.best_time), excluded.best_time),
+                worst_time = MAX(COALESCE(worst_time, excluded.worst_time), excluded.worst_time),
+                similarity_sum = similarity_sum + excluded.similarity_sum,
+                similarity_count = similarity_count + excluded.similarity_count
+        ''', (user_id, 1 if new_word else 0, completion_time, completion_time, completion_time,
+              similarity, has_similarity))
+        
+        cursor.execute('''
+            INSERT INTO soletrando_user_letters
+            (user_id, letter, attempts, time_sum, best_time, similarity_sum, similarity_count)
+            VALUES (?, ?, 1, ?, ?, ?, ?)
+            ON CONFLICT(user_id, letter) DO UPDATE SET
+                attempts = attempts + 1,
+                time_sum = time_sum + excluded.time_sum,
+                best_time = MIN(COALESCE(best_time, excluded.best_time), excluded.best_time),
+                similarity_sum = similarity_sum + excluded.similarity_sum,
+                similarity_count = similarity_count + excluded.similarity_count
+        ''', (user_id, letter, completion_time, completion_time, similarity, has_similarity))
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO soletrando_user_day_words (user_id, day, word) VALUES (?, ?, ?)
+        ''', (user_id, day, word))
+        new_day_word = cursor.rowcount == 1
+        
+        cursor.execute('''
+            INSERT INTO soletrando_user_daily (user_id, day, letters_completed, words_worked, time_sum)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT(user_id, day) DO UPDATE SET
+                letters_completed = letters_completed + 1,
+                words_worked = words_worked + excluded.words_worked,
+                time_sum = time_sum + excluded.time_sum
+        ''', (user_id, day, 1 if new_day_word else 0, completion_time))
+    
     def get_soletrando_stats(self, user_id):
         """Recupera estatísticas completas do Soletrando para um usuário"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        # Estatísticas gerais
+        # Estatísticas gerais (agregados mantidos a cada save)
         cursor.execute('''
             SELECT 
-                COUNT(*) as total_letters,
-                COUNT(DISTINCT word) as total_words,
-                AVG(completion_time) as avg_time,
-                MIN(completion_time) as best_time,
-                MAX(completion_time) as worst_time,
-                AVG(similarity_score) as avg_similarity
-            FROM soletrando_stats 
+                total_letters,
+                total_words,
+                time_sum / total_letters as avg_time,
+                best_time,
+                worst_time,
+                CASE WHEN similarity_count > 0 THEN similarity_sum / similarity_count END as avg_similarity
+            FROM soletrando_user_totals 
             WHERE user_id = ?
         ''', (user_id,))
         
-        general_stats = cursor.fetchone()
+        general_stats = cursor.fetchone() or (0, 0, None, None, None, None)
         
         # Estatísticas por letra
         cursor.execute('''
             SELECT 
                 letter,
-                COUNT(*) as attempts,
-                AVG(completion_time) as avg_time,
-                MIN(completion_time) as best_time,
-                AVG(similarity_score) as avg_similarity
-            FROM soletrando_stats 
+                attempts,
+                time_sum / attempts as avg_time,
+                best_time,
+                CASE WHEN similarity_count > 0 THEN similarity_sum / similarity_count END as avg_similarity
+            FROM soletrando_user_letters 
             WHERE user_id = ?
-            GROUP BY letter
             ORDER BY letter
         ''', (user_id,))
         
@@ -418,15 +842,14 @@ class LibrasDatabase:
         cursor.execute('''
             SELECT 
                 word,
-                COUNT(*) as letters_count,
-                SUM(completion_time) as total_time,
-                AVG(similarity_score) as avg_similarity,
-                MIN(created_at) as started_at,
-                MAX(created_at) as completed_at
-            FROM soletrando_stats 
+                letters_count,
+                time_sum as total_time,
+                CASE WHEN similarity_count > 0 THEN similarity_sum / similarity_count END as avg_similarity,
+                started_at,
+                completed_at
+            FROM soletrando_user_words 
             WHERE user_id = ?
-            GROUP BY word
-            ORDER BY MAX(created_at) DESC
+            ORDER BY completed_at DESC
             LIMIT 10
         ''', (user_id,))
         
@@ -435,13 +858,12 @@ class LibrasDatabase:
         # Progresso diário (últimos 7 dias)
         cursor.execute('''
             SELECT 
-                DATE(created_at) as day,
-                COUNT(*) as letters_completed,
-                COUNT(DISTINCT word) as words_worked,
-                AVG(completion_time) as avg_time
-            FROM soletrando_stats 
-            WHERE user_id = ? AND created_at >= datetime('now', '-7 days')
-            GROUP BY DATE(created_at)
+                day,
+                letters_completed,
+                words_worked,
+                time_sum / letters_completed as avg_time
+            FROM soletrando_user_daily 
+            WHERE user_id = ? AND day >= DATE('now', '-7 days')
             ORDER BY day DESC
         ''', (user_id,))
         
@@ -470,7 +892,7 @@ class LibrasDatabase:
             return {"error": "Usuário não encontrado"}
         
         user_id = user_result[0]
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -535,7 +957,7 @@ class LibrasDatabase:
     # ===== MÉTODOS PARA MODO DESAFIO =====
     def save_challenge_result(self, user_id, level, words_completed, score, time_taken):
         """Salva resultado de uma partida do modo Desafio"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -551,13 +973,21 @@ class LibrasDatabase:
             accuracy = (words_completed / max(words_completed + 1, 1)) * 100  # Simples cálculo
             words_per_minute = (words_completed / max(time_taken / 60, 1)) if time_taken > 0 else 0
             
+            created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
             cursor.execute('''
                 INSERT INTO challenge_results 
-                (user_id, level, words_completed, score, time_taken, total_time, accuracy, words_per_minute)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, level, words_completed, score, time_taken, total_time, accuracy, words_per_minute))
+                (user_id, level, words_completed, score, time_taken, total_time, accuracy, words_per_minute, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, level, words_completed, score, time_taken, total_time, accuracy, words_per_minute, created_at))
             
             result_id = cursor.lastrowid
+            
+            if user_id is not None:
+                self._update_challenge_aggregates(cursor, user_id, level, words_completed, score,
+                                                  words_per_minute, created_at)
+                record_result(cursor, level, (result_id, user_id, words_completed, score,
+                                              words_per_minute, time_taken, created_at))
+            
             conn.commit()
             
             print(f"Resultado do Desafio salvo - ID: {result_id}, Usuário: {user_id}, Nível: {level}")
@@ -570,44 +1000,78 @@ class LibrasDatabase:
         finally:
             conn.close()
     
+    def _update_challenge_aggregates(self, cursor, user_id, level, words_completed, score, words_per_minute, created_at):
+        """Atualiza os agregados do Desafio na transação do save"""
+        values = (words_completed, score, score, words_completed, words_per_minute, words_per_minute)
+        best_of = '''
+                games = games + 1,
+                words_sum = words_sum + excluded.words_sum,
+                score_sum = score_sum + excluded.score_sum,
+                best_score = MAX(COALESCE(best_score, excluded.best_score), excluded.best_score),
+                best_words = MAX(COALESCE(best_words, excluded.best_words), excluded.best_words),
+                wpm_sum = wpm_sum + excluded.wpm_sum,
+                best_wpm = MAX(COALESCE(best_wpm, excluded.best_wpm), excluded.best_wpm)
+        '''
+        
+        cursor.execute('''
+            INSERT INTO challenge_user_totals
+            (user_id, games, words_sum, score_sum, best_score, best_words, wpm_sum, best_wpm)
+            VALUES (?, 1, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET''' + best_of, (user_id,) + values)
+        
+        cursor.execute('''
+            INSERT INTO challenge_user_levels
+            (user_id, level, games, words_sum, score_sum, best_score, best_words, wpm_sum, best_wpm)
+            VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, level) DO UPDATE SET''' + best_of, (user_id, level) + values)
+        
+        cursor.execute('''
+            INSERT INTO challenge_user_daily (user_id, day, games, words_sum, best_score, wpm_sum)
+            VALUES (?, ?, 1, ?, ?, ?)
+            ON CONFLICT(user_id, day) DO UPDATE SET
+                games = games + 1,
+                words_sum = words_sum + excluded.words_sum,
+                best_score = MAX(COALESCE(best_score, excluded.best_score), excluded.best_score),
+                wpm_sum = wpm_sum + excluded.wpm_sum
+        ''', (user_id, created_at[:10], words_completed, score, words_per_minute))
+    
     def get_challenge_stats(self, user_id):
         """Recupera estatísticas completas do Desafio para um usuário"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
-            # Estatísticas gerais
+            # Estatísticas gerais (agregados mantidos a cada save)
             cursor.execute('''
                 SELECT 
-                    COUNT(*) as total_games,
-                    SUM(words_completed) as total_words,
-                    SUM(score) as total_score,
-                    AVG(score) as avg_score,
-                    MAX(score) as best_score,
-                    AVG(words_completed) as avg_words,
-                    MAX(words_completed) as best_words,
-                    AVG(words_per_minute) as avg_wpm,
-                    MAX(words_per_minute) as best_wpm
-                FROM challenge_results 
+                    games as total_games,
+                    words_sum as total_words,
+                    score_sum as total_score,
+                    CAST(score_sum AS REAL) / games as avg_score,
+                    best_score,
+                    CAST(words_sum AS REAL) / games as avg_words,
+                    best_words,
+                    wpm_sum / games as avg_wpm,
+                    best_wpm
+                FROM challenge_user_totals 
                 WHERE user_id = ?
             ''', (user_id,))
             
-            general_stats = cursor.fetchone()
+            general_stats = cursor.fetchone() or (0, None, None, None, None, None, None, None, None)
             
             # Estatísticas por nível
             cursor.execute('''
                 SELECT 
                     level,
-                    COUNT(*) as games_played,
-                    AVG(words_completed) as avg_words,
-                    MAX(words_completed) as best_words,
-                    AVG(score) as avg_score,
-                    MAX(score) as best_score,
-                    AVG(words_per_minute) as avg_wpm,
-                    MAX(words_per_minute) as best_wpm
-                FROM challenge_results 
+                    games as games_played,
+                    CAST(words_sum AS REAL) / games as avg_words,
+                    best_words,
+                    CAST(score_sum AS REAL) / games as avg_score,
+                    best_score,
+                    wpm_sum / games as avg_wpm,
+                    best_wpm
+                FROM challenge_user_levels 
                 WHERE user_id = ?
-                GROUP BY level
                 ORDER BY 
                     CASE level 
                         WHEN 'iniciante' THEN 1
@@ -639,14 +1103,13 @@ class LibrasDatabase:
             # Progresso diário (últimos 30 dias)
             cursor.execute('''
                 SELECT 
-                    DATE(created_at) as day,
-                    COUNT(*) as games_played,
-                    SUM(words_completed) as total_words,
-                    MAX(score) as best_score,
-                    AVG(words_per_minute) as avg_wpm
-                FROM challenge_results 
-                WHERE user_id = ? AND created_at >= datetime('now', '-30 days')
-                GROUP BY DATE(created_at)
+                    day,
+                    games as games_played,
+                    words_sum as total_words,
+                    best_score,
+                    wpm_sum / games as avg_wpm
+                FROM challenge_user_daily 
+                WHERE user_id = ? AND day >= DATE('now', '-30 days')
                 ORDER BY day DESC
             ''', (user_id,))
             
@@ -675,42 +1138,26 @@ class LibrasDatabase:
         finally:
             conn.close()
     
-    def get_challenge_ranking(self, level, limit=10):
-        """Obtém ranking do Desafio por nível"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def rebuild_aggregates(self):
+        """Recalcula todas as tabelas de agregados a partir do histórico (backfill)"""
+        with self.transaction() as conn:
+            for statement in AGGREGATE_REBUILD_SQL + rebuild_statements(self.leaderboard.size):
+                conn.execute(statement)
+        print("✅ Agregados do Soletrando e do Desafio reconstruídos")
+    
+    def get_challenge_ranking(self, level, limit=10, scope='all', period='all'):
+        """
+        Obtém ranking do Desafio por nível
+        
+        Lido do top-K mantido por save_challenge_result (ver leaderboard.py);
+        scope='best' mostra só a melhor partida de cada usuário e period
+        ('all', 'daily', 'weekly') restringe ao dia ou à semana atual.
+        """
+        validate_board(scope, period)
+        conn = self._connect()
         
         try:
-            cursor.execute('''
-                SELECT 
-                    u.username,
-                    cr.words_completed,
-                    cr.score,
-                    cr.words_per_minute,
-                    cr.time_taken,
-                    cr.created_at
-                FROM challenge_results cr
-                JOIN users u ON cr.user_id = u.id
-                WHERE cr.level = ?
-                ORDER BY cr.score DESC, cr.words_completed DESC, cr.time_taken ASC
-                LIMIT ?
-            ''', (level, limit))
-            
-            ranking_data = cursor.fetchall()
-            
-            ranking = []
-            for i, row in enumerate(ranking_data, 1):
-                ranking.append({
-                    'position': i,
-                    'username': row[0],
-                    'words_completed': row[1],
-                    'score': row[2],
-                    'words_per_minute': round(row[3], 1),
-                    'time_taken': row[4],
-                    'date': row[5][:10]  # Apenas data, sem hora
-                })
-            
-            return ranking
+            return self.leaderboard.top(conn, level, limit, scope, period)
             
         except Exception as e:
             print(f"Erro ao buscar ranking do Desafio: {e}")
@@ -718,10 +1165,30 @@ class LibrasDatabase:
         finally:
             conn.close()
 
+# Latência de cada chamada pública (histograma libras_db_call_seconds em /metrics)
+instrument_methods(LibrasDatabase, 'libras_db_call_seconds',
+                   exclude=('transaction', 'close', 'init_database', 'invalidate_user_cache'))
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_database(db_path="libras_stats.db"):
+    """Instância compartilhada do LibrasDatabase para o processo (uma por arquivo)"""
+    db = _instances.get(db_path)
+    if db is None:
+        with _instances_lock:
+            db = _instances.get(db_path)
+            if db is None:
+                db = LibrasDatabase(db_path)
+                _instances[db_path] = db
+    return db
+
+
 def save_game_session(username, mode, difficulty, word, completed, time_spent, total_time, letters_completed, total_letters, accuracy):
     """Função helper para salvar resultado de uma sessão de jogo"""
     try:
-        db = LibrasDatabase()
+        db = get_database()
         
         # Obter ou criar usuário
         user_id = db.get_or_create_user(username)
@@ -742,4 +1209,14 @@ def save_game_session(username, mode, difficulty, word, completed, time_spent, t
         
     except Exception as e:
         print(f"Erro ao salvar sessão de jogo: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+if __name__ == '__main__':
+    import sys
+    
+    if len(sys.argv) >= 2 and sys.argv[1] == 'rebuild-aggregates':
+        get_database(sys.argv[2] if len(sys.argv) > 2 else "libras_stats.db").rebuild_aggregates()
+    else:
+        print("Uso: python database.py rebuild-aggregates [arquivo.db]")
+        sys.exit(1)
@@ -5,6 +5,23 @@ from datetime import datetime
 import os
 from urllib.parse import urlparse
 
+# Mesma atualização atômica do LETTER_STATS_UPSERT_SQL do SQLite (LEAST/GREATEST no lugar de MIN/MAX)
+LETTER_STATS_UPSERT_SQL = '''
+    INSERT INTO letter_stats
+    (user_id, letter, total_attempts, correct_attempts, avg_time, best_time, worst_time, updated_at)
+    VALUES (%s, %s, 1, %s, %s, %s, %s, %s)
+    ON CONFLICT (user_id, letter) DO UPDATE SET
+        total_attempts = letter_stats.total_attempts + 1,
+        correct_attempts = letter_stats.correct_attempts + EXCLUDED.correct_attempts,
+        avg_time = (letter_stats.avg_time * letter_stats.total_attempts + EXCLUDED.avg_time)
+                   / (letter_stats.total_attempts + 1),
+        best_time = CASE WHEN letter_stats.best_time > 0
+                         THEN LEAST(letter_stats.best_time, EXCLUDED.best_time)
+                         ELSE EXCLUDED.best_time END,
+        worst_time = GREATEST(letter_stats.worst_time, EXCLUDED.worst_time),
+        updated_at = EXCLUDED.updated_at
+'''
+
 class LibrasPostgresDatabase:
     def __init__(self):
         # URL do PostgreSQL do Railway (será fornecida como variável de ambiente)
@@ -131,6 +148,22 @@ class LibrasPostgresDatabase:
                 )
             ''')
             
+            # Tabela de estatísticas por letra
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS letter_stats (
+                    id SERIAL PRIMARY KEY,
+                    user_id INTEGER REFERENCES users(id),
+                    letter VARCHAR(1) NOT NULL,
+                    total_attempts INTEGER DEFAULT 0,
+                    correct_attempts INTEGER DEFAULT 0,
+                    avg_time REAL DEFAULT 0,
+                    best_time REAL DEFAULT 0,
+                    worst_time REAL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (user_id, letter)
+                )
+            ''')
+            
             conn.commit()
             print("Tabelas PostgreSQL criadas com sucesso!")
             return True
@@ -259,4 +292,35 @@ class LibrasPostgresDatabase:
             conn.rollback()
             return False
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+    
+    def update_letter_stats(self, user_id: int, letter: str, time_seconds: float, was_correct: bool):
+        """Atualiza estatísticas por letra"""
+        return self.update_letter_stats_batch(user_id, [(letter, time_seconds, was_correct)])
+    
+    def update_letter_stats_batch(self, user_id: int, results):
+        """Atualiza as estatísticas de várias letras (ex.: uma palavra inteira) em uma transação"""
+        now = datetime.now()
+        rows = [
+            (user_id, letter, 1 if was_correct else 0, time_seconds, time_seconds, time_seconds, now)
+            for letter, time_seconds, was_correct in results
+        ]
+        if not rows:
+            return True
+        
+        conn = self.get_connection()
+        if not conn:
+            return False
+            
+        try:
+            cursor = conn.cursor()
+            psycopg2.extras.execute_batch(cursor, LETTER_STATS_UPSERT_SQL, rows)
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            print(f"Erro ao atualizar estatísticas das letras: {e}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
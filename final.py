@@ -964,16 +964,14 @@ class MainWindow(QWidget):
                     for char in self.palavra:
                         if char.isalpha() and letter_count < len(self.letter_times):
                             letter_times_data.append((char.upper(), self.letter_times[letter_count]))
-                            
-                            # Atualizar estatísticas da letra
-                            self.db.update_letter_stats(
-                                self.current_user_id,
-                                char.upper(),
-                                self.letter_times[letter_count],
-                                True  # Assumindo que completou a palavra
-                            )
                             letter_count += 1
                     
+                    # Atualizar estatísticas das letras da palavra em uma única transação
+                    self.db.update_letter_stats_batch(
+                        self.current_user_id,
+                        [(letter, seconds, True) for letter, seconds in letter_times_data]  # Assumindo que completou a palavra
+                    )
+                    
                     if letter_times_data:
                         self.db.save_letter_times(self.current_session_id, self.current_word_id, letter_times_data)
                 
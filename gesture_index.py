@@ -0,0 +1,169 @@
+"""
+Índice k-NN de exemplares de gestos Libras
+Permite guardar várias capturas por letra (por exemplo, uma por sinalizador)
+e reconhecer por votação entre os k vizinhos mais próximos
+"""
+
+import threading
+from collections import defaultdict, namedtuple
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from gesture_matcher import (NORMALIZATION_LEGACY, NORMALIZATION_PROCRUSTES, WEIGHT_VECTOR, mode_similarity_scores,
+                             to_palm_frame)
+
+# Tentar importar BallTree do sklearn, mas continuar com busca exaustiva se não disponível
+try:
+    from sklearn.neighbors import BallTree
+    BALLTREE_AVAILABLE = True
+except ImportError:
+    BALLTREE_AVAILABLE = False
+
+# Raiz dos pesos por coordenada: a distância euclidiana no vetor de 63
+# dimensões passa a aproximar a distância ponderada da similaridade
+_FEATURE_SCALE = np.repeat(np.sqrt(WEIGHT_VECTOR), 3).astype(np.float32)
+
+# Conteúdo publicado do índice: trocado por inteiro a cada mudança, nunca alterado
+# no lugar - uma consulta usa sempre letras, templates e árvore da mesma versão
+_IndexState = namedtuple('_IndexState', ['letters', 'templates', 'tree', 'indexed_count'])
+_EMPTY_STATE = _IndexState(np.empty(0, dtype='<U1'), np.empty((0, 21, 3), dtype=np.float32), None, 0)
+
+
+class ExemplarIndex:
+    """
+    Índice de vizinhos mais próximos sobre os exemplares normalizados
+
+    Os exemplares já indexados ficam em uma BallTree (sklearn); os adicionados
+    depois ficam em um buffer pequeno percorrido por força bruta até que o
+    buffer passe de ``rebuild_threshold``, quando a árvore é reconstruída.
+
+    Escritas (build/add) são serializadas por um lock e publicam um novo
+    estado em uma única atribuição; consultas não usam lock. As matrizes
+    crescem por dobra de capacidade: um exemplar novo é gravado depois do
+    fim das visões já publicadas, sem copiar a matriz a cada inserção.
+
+    No modo 'procrustes' a busca de candidatos usa as mãos no referencial da
+    palma (aproximadamente invariante à rotação) e a reordenação alinha a mão
+    sobre cada candidato, como o TemplateMatcher no mesmo modo.
+
+    Args:
+        k: Número de vizinhos considerados na votação
+        rebuild_threshold: Tamanho mínimo do buffer para reconstruir a árvore
+        normalization: Modo de normalização dos exemplares (gesture_matcher)
+    """
+
+    def __init__(self, k: int = 5, rebuild_threshold: int = 64, normalization: str = NORMALIZATION_LEGACY):
+        self.k = max(1, int(k))
+        self.rebuild_threshold = rebuild_threshold
+        self.normalization = normalization
+
+        self._lock = threading.Lock()
+        self._state = _EMPTY_STATE
+        # Matrizes com folga no fim; o estado publicado são visões [:n] delas
+        self._letter_buffer = _EMPTY_STATE.letters
+        self._template_buffer = _EMPTY_STATE.templates
+
+    def __len__(self) -> int:
+        return len(self._state.letters)
+
+    @property
+    def pending_count(self) -> int:
+        """Exemplares ainda fora da árvore (busca por força bruta)"""
+        state = self._state
+        return len(state.letters) - state.indexed_count
+
+    def build(self, letters: List[str], templates: np.ndarray):
+        """Substitui todo o conteúdo do índice"""
+        letters = np.asarray(letters, dtype='<U1')
+        templates = np.ascontiguousarray(templates, dtype=np.float32).reshape(-1, 21, 3)
+        with self._lock:
+            self._letter_buffer, self._template_buffer = letters, templates
+            self._state = self._with_tree(letters, templates)
+
+    def add(self, letter: str, normalized: np.ndarray):
+        """Adiciona um exemplar normalizado (21, 3) sem reconstruir a árvore a cada inserção"""
+        with self._lock:
+            state = self._state
+            count = len(state.letters)
+            if count == len(self._letter_buffer):
+                capacity = max(16, count * 2)
+                letter_buffer = np.empty(capacity, dtype='<U1')
+                template_buffer = np.empty((capacity, 21, 3), dtype=np.float32)
+                letter_buffer[:count] = state.letters
+                template_buffer[:count] = state.templates
+                self._letter_buffer, self._template_buffer = letter_buffer, template_buffer
+
+            # Posição após o fim do estado publicado: nenhuma consulta em andamento a enxerga
+            self._letter_buffer[count] = letter
+            self._template_buffer[count] = np.asarray(normalized, dtype=np.float32).reshape(21, 3)
+            letters, templates = self._letter_buffer[:count + 1], self._template_buffer[:count + 1]
+
+            pending = count + 1 - state.indexed_count
+            if pending >= max(self.rebuild_threshold, state.indexed_count // 10):
+                self._state = self._with_tree(letters, templates)
+            else:
+                self._state = _IndexState(letters, templates, state.tree, state.indexed_count)
+
+    def _with_tree(self, letters: np.ndarray, templates: np.ndarray) -> _IndexState:
+        """Estado com a árvore cobrindo todos os exemplares"""
+        if BALLTREE_AVAILABLE and len(letters) > 0:
+            return _IndexState(letters, templates, BallTree(self._features(templates)), len(letters))
+        return _IndexState(letters, templates, None, 0)
+
+    def _features(self, templates: np.ndarray) -> np.ndarray:
+        if self.normalization == NORMALIZATION_PROCRUSTES:
+            templates = to_palm_frame(templates.astype(np.float64)).astype(np.float32)
+        return templates.reshape(len(templates), 63) * _FEATURE_SCALE
+
+    def _candidates(self, state: _IndexState, query: np.ndarray, count: int) -> np.ndarray:
+        """Índices dos ``count`` exemplares mais próximos (árvore + buffer)"""
+        query_features = self._features(query.reshape(1, 21, 3).astype(np.float32))
+        candidates = []
+
+        if state.tree is not None:
+            _, indices = state.tree.query(query_features, k=min(count, state.indexed_count))
+            candidates.append(indices[0])
+
+        if len(state.letters) > state.indexed_count:
+            pending = np.arange(state.indexed_count, len(state.letters))
+            distances = np.linalg.norm(self._features(state.templates[pending]) - query_features, axis=1)
+            candidates.append(pending[np.argsort(distances)[:count]])
+
+        return np.concatenate(candidates) if candidates else np.empty(0, dtype=int)
+
+    def query(self, normalized_input: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Reconhece a mão por votação entre os k exemplares mais próximos
+
+        Returns:
+            Dict com letra vencedora, similaridade de votação, melhor similaridade
+            por letra e votos, ou None se o índice estiver vazio
+        """
+        state = self._state
+        if len(state.letters) == 0:
+            return None
+
+        query = np.asarray(normalized_input, dtype=np.float64).reshape(21, 3)
+
+        # Buscar mais candidatos que k e reordenar pela similaridade exata
+        candidates = self._candidates(state, query, self.k * 3)
+        scores = mode_similarity_scores(state.templates[candidates], query, self.normalization)
+        order = np.argsort(-scores, kind='stable')[:self.k]
+
+        votes = defaultdict(float)
+        all_similarities = {}
+        for index in order:
+            letter = str(state.letters[candidates[index]])
+            score = float(scores[index])
+            votes[letter] += score
+            all_similarities[letter] = max(all_similarities.get(letter, 0.0), score)
+
+        best_letter = max(votes, key=votes.get)
+        return {
+            'letter': best_letter,
+            'similarity': votes[best_letter] / len(order),
+            'all_similarities': all_similarities,
+            'votes': dict(votes),
+            'neighbors': len(order)
+        }
@@ -6,18 +6,104 @@ Armazena e gerencia gestos capturados pelo administrador
 import json
 import os
 import math
+import struct
+import time
+from collections import namedtuple
 from datetime import datetime
 import sqlite3
-from typing import Dict, List, Optional, Any
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any
+
+import metrics
+from sqlite_factory import connect as connect_sqlite
+
+# Motor vetorizado de comparação (opcional - requer numpy)
+try:
+    from gesture_matcher import (NORMALIZATION_MODES, TemplateMatcher, normalize_array, normalize_batch,
+                                 landmarks_to_array)
+    from gesture_index import ExemplarIndex
+    from landmark_codec import LANDMARK_COLUMNS, decode_many, decode_to_dicts, migrate_column, to_db_value
+    from recognition_cache import RecognitionCache
+    from shared_templates import SharedTemplateStore
+    import numpy as np
+    VECTORIZED_MATCHING_AVAILABLE = True
+except ImportError:
+    VECTORIZED_MATCHING_AVAILABLE = False
+    print("Aviso: numpy não disponível - usando comparação escalar de gestos")
+
+def _landmarks_to_db(landmarks: List[Dict]):
+    """Landmarks no formato de gravação: BLOB float32 versionado (ver landmark_codec)"""
+    if VECTORIZED_MATCHING_AVAILABLE:
+        return to_db_value(landmarks)
+    return json.dumps(landmarks)
+
+
+def _landmarks_from_db(value) -> Optional[List[Dict]]:
+    """Lê landmarks gravados em BLOB ou no JSON legado"""
+    if isinstance(value, str):
+        return json.loads(value)
+    if VECTORIZED_MATCHING_AVAILABLE:
+        return decode_to_dicts(value)
+    # Sem numpy: 1 byte de versão + 63 float32 little-endian
+    values = struct.unpack('<63f', bytes(value)[1:])
+    return [{'x': values[i], 'y': values[i + 1], 'z': values[i + 2]} for i in range(0, 63, 3)]
+
+# Nível de detalhe dos resultados de reconhecimento:
+#   none    - só letra e similaridade (caminho quente)
+#   summary - inclui a similaridade de cada letra (all_similarities)
+#   full    - como summary; a análise ponto a ponto é montada pela rota da API
+DETAIL_NONE = 'none'
+DETAIL_SUMMARY = 'summary'
+DETAIL_FULL = 'full'
+DETAIL_LEVELS = (DETAIL_NONE, DETAIL_SUMMARY, DETAIL_FULL)
+
+# Cache de gestos publicado em uma única troca de referência: gestos, visão somente
+# leitura, templates normalizados, matriz de comparação e versão dos dados
+# (gesture_data_version) sempre correspondem entre si
+TemplateState = namedtuple('TemplateState', ['gestures', 'snapshot', 'normalized', 'matcher', 'version'])
+EMPTY_TEMPLATES = TemplateState({}, MappingProxyType({}), {}, None, None)
 
 class GestureManager:
-    def __init__(self, db_path: str = "gestures.db"):
+    def __init__(self, db_path: str = "gestures.db", multi_exemplar: Optional[bool] = None, knn_k: Optional[int] = None,
+                 normalization: Optional[str] = None):
         self.db_path = db_path
-        self._cache = {}  # Cache em memória para gestos
+        # Cache em memória para gestos: um TemplateState nunca alterado no lugar. Cada
+        # mudança publica um novo; leitores pegam a referência uma vez por consulta
+        self._templates = EMPTY_TEMPLATES
         self._cache_timestamp = 0  # Timestamp do último carregamento
-        self._cache_timeout = 300  # Cache válido por 5 minutos
+        self._version_checked_at = 0.0
+        self.version_poll_interval = float(os.environ.get('GESTURE_VERSION_POLL_INTERVAL', 1))
+        self._template_version = 0  # Incrementada a cada mudança de templates/exemplares
+        
+        # Resultados híbridos de poses repetidas (mão parada em frames seguidos)
+        self.result_cache = RecognitionCache.from_env() if VECTORIZED_MATCHING_AVAILABLE else None
+        self._cache_model_version = None  # Última versão de modelo vista (ver _result_cache_version)
+        self.shared_templates = None  # Configurado após criar o banco (ver init_database)
+        
+        # Modo multi-exemplar: várias capturas por letra + votação k-NN
+        if multi_exemplar is None:
+            multi_exemplar = os.environ.get('GESTURE_MULTI_EXEMPLAR', '').lower() in ('1', 'true', 'yes')
+        self.multi_exemplar = multi_exemplar and VECTORIZED_MATCHING_AVAILABLE
+        self.knn_k = knn_k or int(os.environ.get('GESTURE_KNN_K', 5))
+        self._exemplar_index = None  # Carregado sob demanda
+        
+        # Normalização dos landmarks (ver gesture_matcher); sem numpy apenas 'legacy'
+        normalization = (normalization or os.environ.get('GESTURE_NORMALIZATION', 'legacy')).lower()
+        if not VECTORIZED_MATCHING_AVAILABLE or normalization not in NORMALIZATION_MODES:
+            if normalization != 'legacy':
+                print(f"⚠️ Normalização '{normalization}' indisponível - usando 'legacy'")
+            normalization = 'legacy'
+        self.normalization = normalization
         
         self.init_database()
+        
+        # Matriz de templates em arquivo mapeado, compartilhada entre workers (opcional).
+        # A origem inclui o inode do banco: um arquivo deixado por outro banco no mesmo
+        # caminho (ex.: banco recriado) é ignorado
+        if VECTORIZED_MATCHING_AVAILABLE:
+            source = f"{os.path.abspath(db_path)}:{os.stat(db_path).st_ino}:{self.normalization}"
+            self.shared_templates = SharedTemplateStore.from_env(source=source)
+        
         self.preload_gestures()  # Pré-carregar gestos na inicialização
         
     def preload_gestures(self):
@@ -28,44 +114,175 @@ class GestureManager:
         except Exception as e:
             print(f"⚠️ Erro no pré-carregamento: {e}")
     
+    def warm_up(self):
+        """
+        Carrega templates, matriz de comparação e índice k-NN de uma vez
+        
+        Usado pelo wsgi.py no processo mestre do gunicorn: os workers criados
+        depois do fork compartilham essa memória (copy-on-write).
+        """
+        gestures = self.get_all_gestures()
+        if self.multi_exemplar:
+            self._get_exemplar_index()
+        return len(gestures)
+    
     def _refresh_cache_if_needed(self):
-        """Atualiza o cache se necessário"""
-        import time
-        current_time = time.time()
+        """
+        Descarta o cache se outro processo alterou os gestos
+        
+        A versão dos dados é conferida no máximo a cada version_poll_interval
+        segundos; sem mudanças o cache continua valendo indefinidamente.
+        """
+        loaded_version = self._templates.version
+        if loaded_version is None:
+            return
+        
+        # Templates mais novos publicados por outro processo: basta um os.stat
+        if self.shared_templates is not None:
+            shared = self.shared_templates.load()
+            if shared is not None and shared.data_version > loaded_version:
+                print(f"🔄 Templates compartilhados na versão {shared.data_version}, recarregando...")
+                self._clear_templates()
+                return
+        
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_poll_interval:
+            return
+        self._version_checked_at = now
+        
+        with connect_sqlite(self.db_path) as conn:
+            version = self._read_data_version(conn)
+        if version != loaded_version:
+            print(f"🔄 Gestos alterados (versão {loaded_version} -> {version}), recarregando...")
+            self._clear_templates()
+    
+    @staticmethod
+    def _read_data_version(conn: sqlite3.Connection) -> int:
+        """Contador incrementado por triggers a cada escrita em gestures/gesture_exemplars"""
+        return conn.execute("SELECT version FROM gesture_data_version WHERE id = 1").fetchone()[0]
+    
+    def _begin_write(self, conn: sqlite3.Connection) -> int:
+        """Abre a transação de escrita e retorna a versão dos dados antes dela"""
+        conn.execute("BEGIN IMMEDIATE")
+        return self._read_data_version(conn)
+    
+    def _finish_write(self, conn: sqlite3.Connection, version_before: int) -> Optional[int]:
+        """
+        Confirma a transação aberta por _begin_write
+        
+        Returns:
+            Versão dos dados após a escrita, se o cache estava em dia antes dela e
+            pode ser atualizado incrementalmente (publicando essa versão); None se
+            o cache foi descartado e será recarregado por inteiro na próxima leitura
+        """
+        version_after = self._read_data_version(conn)
+        conn.commit()
         
-        if (current_time - self._cache_timestamp) > self._cache_timeout:
-            self._cache.clear()
-            self._cache_timestamp = current_time
-            print("🔄 Cache de gestos expirado, recarregando...")
+        if self._templates.version is not None and self._templates.version == version_before:
+            return version_after
+        self._clear_templates()
+        return None
     
     def invalidate_cache(self):
         """Força a invalidação do cache"""
-        self._cache.clear()
+        self._clear_templates()
         self._cache_timestamp = 0
         print("🗑️ Cache de gestos invalidado")
     
-    def _update_cache_with_gesture(self, letter: str, landmarks: List[Dict], quality: int):
-        """Atualiza o cache com um gesto específico"""
+    def _clear_templates(self):
+        """Limpa o cache de gestos; a próxima leitura recarrega tudo do banco"""
+        self._templates = EMPTY_TEMPLATES
+        self._exemplar_index = None
+        self._templates_changed()
+    
+    def _publish_templates(self, cache: Dict[str, Dict[str, Any]], normalized: Dict[str, Any],
+                           version: int) -> TemplateState:
+        """
+        Monta a matriz de comparação e publica o novo estado em uma única atribuição
+        
+        Quem já pegou o estado anterior continua com ele inteiro; nenhum leitor
+        vê gestos novos com a matriz antiga (ou sem matriz).
+        """
+        matcher = self._build_matcher(normalized, version) if VECTORIZED_MATCHING_AVAILABLE else None
+        state = TemplateState(cache, MappingProxyType(cache), normalized, matcher, version)
+        self._templates = state
+        self._templates_changed()
+        return state
+    
+    def _set_data_version(self, version: int):
+        """Escrita que não muda os templates (exemplares): só avança a versão do estado atual"""
+        state = self._templates
+        if state.version is not None:
+            self._templates = state._replace(version=version)
+    
+    def _templates_changed(self):
+        """Nova versão de templates: resultados guardados no cache de reconhecimento deixam de valer"""
+        self._template_version += 1
+    
+    def _normalize_template(self, landmarks: List[Dict]):
+        """Normaliza um template salvo (matriz NumPy se disponível, senão lista de dicts)"""
+        if VECTORIZED_MATCHING_AVAILABLE:
+            return normalize_array(landmarks, self.normalization)
+        return self._normalize_landmarks(landmarks)
+    
+    def _store_template(self, gesture_data: Dict[str, Any], cache: Dict[str, Dict[str, Any]], normalized: Dict[str, Any]):
+        """Guarda um gesto em ``cache`` e sua versão normalizada em ``normalized``"""
+        letter = gesture_data['letter']
+        cache[letter] = gesture_data
+        
+        normalized_landmarks = self._normalize_template(gesture_data['landmarks'])
+        if normalized_landmarks is not None:
+            normalized[letter] = normalized_landmarks
+        else:
+            normalized.pop(letter, None)
+    
+    def _build_matcher(self, normalized: Dict[str, Any], version: int):
+        """
+        Matriz de templates; apoiada no arquivo compartilhado quando configurado
+        
+        Se o arquivo já tem a versão dos dados, apenas o mapeia (sem cópia da
+        matriz); senão publica a matriz deste processo para os demais.
+        """
+        if self.shared_templates is None:
+            return TemplateMatcher.from_landmarks(normalized, self.normalization)
+        
+        shared = self.shared_templates.load()
+        if shared is None or shared.data_version != version:
+            built = TemplateMatcher.from_landmarks(normalized, self.normalization)
+            shared = self.shared_templates.publish(built.letters, built.templates, version)
+            if shared is None or shared.data_version != version:
+                return built
+        return TemplateMatcher(shared.letters, shared.templates, self.normalization)
+    
+    def _update_cache_with_gestures(self, updates: List[tuple], version: int):
+        """Atualiza o cache com os gestos (letra, landmarks, qualidade) gravados na ``version``"""
         try:
-            import time
-            gesture_data = {
-                'letter': letter,
-                'landmarks': landmarks,
-                'quality': quality,
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
+            # Se o cache ainda não foi carregado, o próximo get_all_gestures carrega tudo
+            state = self._templates
+            if state.version is None:
+                return
+            
+            cache, normalized = dict(state.gestures), dict(state.normalized)
+            for letter, landmarks, quality in updates:
+                gesture_data = {
+                    'letter': letter,
+                    'landmarks': landmarks,
+                    'quality': quality,
+                    'created_at': cache.get(letter, {}).get('created_at', datetime.now().isoformat()),
+                    'updated_at': datetime.now().isoformat()
+                }
+                self._store_template(gesture_data, cache, normalized)
             
-            self._cache[letter] = gesture_data
-            self._cache_timestamp = time.time()
-            print(f"📝 Cache atualizado com gesto da letra {letter}")
+            self._publish_templates(cache, normalized, version)
+            print(f"📝 Cache atualizado com {len(updates)} gesto(s): {', '.join(u[0] for u in updates)}")
             
         except Exception as e:
             print(f"⚠️ Erro ao atualizar cache: {e}")
+            self._clear_templates()
         
     def init_database(self):
         """Inicializa o banco de dados de gestos"""
-        with sqlite3.connect(self.db_path) as conn:
+        with connect_sqlite(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS gestures (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -86,8 +303,66 @@ class GestureManager:
                     FOREIGN KEY (letter) REFERENCES gestures (letter)
                 )
             """)
+            
+            # Várias capturas por letra para o modo multi-exemplar
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS gesture_exemplars (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    letter TEXT NOT NULL,
+                    landmarks_json TEXT NOT NULL,
+                    quality INTEGER NOT NULL,
+                    user_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_gesture_exemplars_letter ON gesture_exemplars (letter)")
+            
+            # Versão dos dados: qualquer escrita em templates ou exemplares, de qualquer
+            # processo, incrementa o contador e os outros processos recarregam o cache
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS gesture_data_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO gesture_data_version (id, version) VALUES (1, 0)")
+            for table in ('gestures', 'gesture_exemplars'):
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_data_version
+                        AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE gesture_data_version SET version = version + 1 WHERE id = 1;
+                        END
+                    """)
             conn.commit()
     
+    def _validate_gesture(self, letter: str, landmarks: List[Dict], quality: int):
+        """Valida os dados de um gesto antes de salvar"""
+        if not letter or len(letter) != 1 or not letter.isalpha():
+            raise ValueError("Letra deve ser um único caractere alfabético")
+        
+        if not landmarks or len(landmarks) != 21:
+            raise ValueError("Landmarks deve conter exatamente 21 pontos")
+        
+        if not 0 <= quality <= 100:
+            raise ValueError("Qualidade deve estar entre 0 e 100")
+    
+    def _write_gesture(self, conn: sqlite3.Connection, letter: str, landmarks: List[Dict], quality: int):
+        """Grava um gesto (e suas analytics) usando a conexão informada"""
+        # Usar INSERT OR REPLACE para atualizar se já existir
+        conn.execute("""
+            INSERT OR REPLACE INTO gestures 
+            (letter, landmarks_json, quality, updated_at) 
+            VALUES (?, ?, ?, ?)
+        """, (letter, _landmarks_to_db(landmarks), quality, datetime.now().isoformat()))
+        
+        # Inicializar analytics se não existir
+        conn.execute("""
+            INSERT OR IGNORE INTO gesture_analytics (letter, recognition_count) 
+            VALUES (?, 0)
+        """, (letter,))
+    
     def save_gesture(self, letter: str, landmarks: List[Dict], quality: int) -> bool:
         """
         Salva um gesto no banco de dados
@@ -101,42 +376,23 @@ class GestureManager:
             bool: True se salvou com sucesso
         """
         try:
-            # Validar entrada
-            if not letter or len(letter) != 1 or not letter.isalpha():
-                raise ValueError("Letra deve ser um único caractere alfabético")
-            
-            if not landmarks or len(landmarks) != 21:
-                raise ValueError("Landmarks deve conter exatamente 21 pontos")
-            
-            if not 0 <= quality <= 100:
-                raise ValueError("Qualidade deve estar entre 0 e 100")
-            
+            self._validate_gesture(letter, landmarks, quality)
             letter = letter.upper()
-            landmarks_json = json.dumps(landmarks)
             
-            with sqlite3.connect(self.db_path) as conn:
-                # Usar INSERT OR REPLACE para atualizar se já existir
-                conn.execute("""
-                    INSERT OR REPLACE INTO gestures 
-                    (letter, landmarks_json, quality, updated_at) 
-                    VALUES (?, ?, ?, ?)
-                """, (letter, landmarks_json, quality, datetime.now().isoformat()))
-                
-                # Inicializar analytics se não existir
-                conn.execute("""
-                    INSERT OR IGNORE INTO gesture_analytics (letter, recognition_count) 
-                    VALUES (?, 0)
-                """, (letter,))
-                
-                conn.commit()
+            with connect_sqlite(self.db_path) as conn:
+                version_before = self._begin_write(conn)
+                self._write_gesture(conn, letter, landmarks, quality)
+                synced_version = self._finish_write(conn, version_before)
                 
             print(f"✅ Gesto da letra {letter} salvo com sucesso (qualidade: {quality}%)")
             
-            # Invalidar cache para forçar recarregamento
-            self.invalidate_cache()
+            # Atualizar cache imediatamente com o novo gesto (já normalizado)
+            if synced_version is not None:
+                self._update_cache_with_gestures([(letter, landmarks, quality)], synced_version)
             
-            # Atualizar cache imediatamente com o novo gesto
-            self._update_cache_with_gesture(letter, landmarks, quality)
+            # O template principal também é um exemplar - reconstruir o índice sob demanda
+            self._exemplar_index = None
+            self._templates_changed()
             
             return True
             
@@ -157,7 +413,7 @@ class GestureManager:
         try:
             letter = letter.upper()
             
-            with sqlite3.connect(self.db_path) as conn:
+            with connect_sqlite(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute("""
                     SELECT letter, landmarks_json, quality, created_at, updated_at
@@ -169,7 +425,7 @@ class GestureManager:
                 if row:
                     return {
                         'letter': row['letter'],
-                        'landmarks': json.loads(row['landmarks_json']),
+                        'landmarks': _landmarks_from_db(row['landmarks_json']),
                         'quality': row['quality'],
                         'created_at': row['created_at'],
                         'updated_at': row['updated_at']
@@ -180,26 +436,34 @@ class GestureManager:
             print(f"Erro ao recuperar gesto da letra {letter}: {e}")
             return None
     
-    def get_all_gestures(self) -> Dict[str, Dict[str, Any]]:
+    def get_all_gestures(self) -> Mapping[str, Dict[str, Any]]:
         """
         Recupera todos os gestos salvos (com cache)
         
         Returns:
-            Dict com letra como chave e dados do gesto como valor
+            Visão somente leitura do cache (sem cópia), com letra como chave e
+            dados do gesto como valor; continua a mesma mesmo que o cache mude
         """
+        return self._load_templates().snapshot
+    
+    def _load_templates(self) -> TemplateState:
+        """Estado atual dos templates, recarregado do banco se outro processo os alterou"""
         try:
-            # Verificar se precisa atualizar o cache
+            # Verificar se outro processo alterou os gestos
             self._refresh_cache_if_needed()
             
             # Se cache está válido, usar ele
-            if self._cache:
-                return self._cache.copy()
+            state = self._templates
+            if state.version is not None:
+                return state
             
             # Carregar do banco de dados
             gestures = {}
             
-            with sqlite3.connect(self.db_path) as conn:
+            with connect_sqlite(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
+                # Lida antes das linhas: uma escrita concorrente só causa um recarregamento extra
+                version = self._read_data_version(conn)
                 cursor = conn.execute("""
                     SELECT letter, landmarks_json, quality, created_at, updated_at
                     FROM gestures 
@@ -209,23 +473,28 @@ class GestureManager:
                 for row in cursor.fetchall():
                     gestures[row['letter']] = {
                         'letter': row['letter'],
-                        'landmarks': json.loads(row['landmarks_json']),
+                        'landmarks': _landmarks_from_db(row['landmarks_json']),
                         'quality': row['quality'],
                         'created_at': row['created_at'],
                         'updated_at': row['updated_at']
                     }
             
-            # Atualizar cache
-            self._cache = gestures.copy()
-            import time
+            # Normalizar cada template uma única vez; gestos, templates, matriz e
+            # versão são publicados juntos só depois de tudo pronto
+            normalized = {}
+            for gesture_data in list(gestures.values()):
+                self._store_template(gesture_data, gestures, normalized)
+            self._exemplar_index = None
+            state = self._publish_templates(gestures, normalized, version)
+            self._version_checked_at = time.monotonic()
             self._cache_timestamp = time.time()
             
-            print(f"📦 Carregados {len(gestures)} gestos do banco de dados (cache atualizado)")
-            return gestures
+            print(f"📦 Carregados {len(gestures)} gestos do banco de dados (cache atualizado, versão {version})")
+            return state
             
         except Exception as e:
             print(f"❌ Erro ao carregar gestos: {e}")
-            return {}
+            return EMPTY_TEMPLATES
     
     def delete_gesture(self, letter: str) -> bool:
         """
@@ -240,18 +509,24 @@ class GestureManager:
         try:
             letter = letter.upper()
             
-            with sqlite3.connect(self.db_path) as conn:
+            with connect_sqlite(self.db_path) as conn:
+                version_before = self._begin_write(conn)
                 cursor = conn.execute("DELETE FROM gestures WHERE letter = ?", (letter,))
                 conn.execute("DELETE FROM gesture_analytics WHERE letter = ?", (letter,))
-                conn.commit()
+                synced_version = self._finish_write(conn, version_before)
                 
                 if cursor.rowcount > 0:
                     print(f"✅ Gesto da letra {letter} removido com sucesso")
                     
-                    # Invalidar cache e remover do cache local
-                    self.invalidate_cache()
-                    if letter in self._cache:
-                        del self._cache[letter]
+                    # Remover do cache local junto com o template normalizado
+                    state = self._templates
+                    if synced_version is not None and state.version is not None:
+                        cache, normalized = dict(state.gestures), dict(state.normalized)
+                        cache.pop(letter, None)
+                        normalized.pop(letter, None)
+                        self._publish_templates(cache, normalized, synced_version)
+                    self._exemplar_index = None
+                    self._templates_changed()
                     
                     return True
                 else:
@@ -262,17 +537,145 @@ class GestureManager:
             print(f"Erro ao remover gesto da letra {letter}: {e}")
             return False
     
-    def recognize_gesture_hybrid(self, landmarks: List[Dict], ml_system=None) -> Dict[str, Any]:
+    def save_exemplar(self, letter: str, landmarks: List[Dict], quality: int, user_id: Optional[int] = None) -> Optional[int]:
+        """
+        Salva mais uma captura de uma letra (modo multi-exemplar)
+        
+        Args:
+            letter: Letra do alfabeto (A-Z)
+            landmarks: Lista de 21 pontos com coordenadas x, y, z
+            quality: Qualidade da captura (0-100)
+            user_id: Sinalizador que fez a captura (opcional)
+            
+        Returns:
+            int: ID do exemplar ou None em caso de erro
+        """
+        try:
+            self._validate_gesture(letter, landmarks, quality)
+            letter = letter.upper()
+            
+            with connect_sqlite(self.db_path) as conn:
+                version_before = self._begin_write(conn)
+                cursor = conn.execute("""
+                    INSERT INTO gesture_exemplars (letter, landmarks_json, quality, user_id)
+                    VALUES (?, ?, ?, ?)
+                """, (letter, _landmarks_to_db(landmarks), quality, user_id))
+                synced_version = self._finish_write(conn, version_before)
+                exemplar_id = cursor.lastrowid
+            
+            # Atualizar o índice incrementalmente se já estiver carregado
+            if synced_version is not None:
+                self._set_data_version(synced_version)
+            if synced_version is not None and self._exemplar_index is not None:
+                normalized = normalize_array(landmarks, self.normalization)
+                if normalized is not None:
+                    self._exemplar_index.add(letter, normalized)
+            self._templates_changed()
+            
+            print(f"✅ Exemplar da letra {letter} salvo (ID: {exemplar_id})")
+            return exemplar_id
+            
+        except Exception as e:
+            print(f"Erro ao salvar exemplar da letra {letter}: {e}")
+            return None
+    
+    def delete_exemplars(self, letter: str) -> int:
+        """Remove todas as capturas extras de uma letra e retorna quantas foram removidas"""
+        try:
+            letter = letter.upper()
+            with connect_sqlite(self.db_path) as conn:
+                version_before = self._begin_write(conn)
+                cursor = conn.execute("DELETE FROM gesture_exemplars WHERE letter = ?", (letter,))
+                synced_version = self._finish_write(conn, version_before)
+            
+            if synced_version is not None:
+                self._set_data_version(synced_version)            
+            self._exemplar_index = None
+            self._templates_changed()
+            return cursor.rowcount
+            
+        except Exception as e:
+            print(f"Erro ao remover exemplares da letra {letter}: {e}")
+            return 0
+    
+    def get_exemplar_counts(self) -> Dict[str, int]:
+        """Número de exemplares por letra (templates principais incluídos)"""
+        try:
+            with connect_sqlite(self.db_path) as conn:
+                cursor = conn.execute("""
+                    SELECT letter, COUNT(*) FROM (
+                        SELECT letter FROM gestures
+                        UNION ALL
+                        SELECT letter FROM gesture_exemplars
+                    )
+                    GROUP BY letter
+                    ORDER BY letter
+                """)
+                return {letter: count for letter, count in cursor.fetchall()}
+        except Exception as e:
+            print(f"Erro ao contar exemplares: {e}")
+            return {}
+    
+    def migrate_landmark_storage(self) -> Dict[str, int]:
+        """Converte os landmarks em JSON de gestures e gesture_exemplars para BLOB float32"""
+        if not VECTORIZED_MATCHING_AVAILABLE:
+            print("⚠️ Migração de landmarks requer numpy")
+            return {}
+        
+        with connect_sqlite(self.db_path) as conn:
+            result = {
+                f"{table}.{column}": migrate_column(conn, table, column)
+                for table, column in LANDMARK_COLUMNS
+                if table in ('gestures', 'gesture_exemplars')
+            }
+        
+        self.invalidate_cache()
+        return result
+    
+    def _get_exemplar_index(self):
+        """Carrega (uma vez) o índice k-NN com templates principais + exemplares"""
+        if self._exemplar_index is not None:
+            return self._exemplar_index
+        
+        with connect_sqlite(self.db_path) as conn:
+            cursor = conn.execute("""
+                SELECT letter, landmarks_json FROM gestures
+                UNION ALL
+                SELECT letter, landmarks_json FROM gesture_exemplars
+            """)
+            rows = cursor.fetchall()
+        
+        points, valid = decode_many((row[1] for row in rows), with_index=True)
+        letters = [rows[i][0] for i in valid]
+        
+        index = ExemplarIndex(k=self.knn_k, normalization=self.normalization)
+        if letters:
+            index.build(letters, normalize_batch(points, self.normalization))
+        
+        self._exemplar_index = index
+        print(f"📚 Índice k-NN carregado com {len(index)} exemplares")
+        return index
+    
+    def recognize_gesture_hybrid(self, landmarks: List[Dict], ml_system=None, detail: str = DETAIL_SUMMARY) -> Dict[str, Any]:
         """
         Reconhecimento híbrido usando sistema tradicional + ML
         
         Args:
             landmarks: Lista de 21 pontos com coordenadas
             ml_system: Sistema de ML opcional
+            detail: Nível de detalhe do resultado tradicional (DETAIL_LEVELS)
             
         Returns:
             Dict com resultado do reconhecimento
         """
+        cache_key = self._result_cache_key(landmarks)
+        if cache_key is not None:
+            cache_version = self._result_cache_version(ml_system)
+            cache_variant = (detail, ml_system is not None)
+            cached = self.result_cache.get(cache_key, cache_version, cache_variant)
+            if cached is not None:
+                return cached
+        
         result = {
             'traditional': None,
             'ml': None,
@@ -286,7 +689,8 @@ class GestureManager:
         
         # Reconhecimento tradicional
         try:
-            traditional_result = self.recognize_gesture(landmarks)
+            with metrics.timer('libras_recognition_stage_seconds', stage='traditional'):
+                traditional_result = self.recognize_gesture(landmarks, detail)
             if traditional_result:
                 result['traditional'] = traditional_result
                 print(f"✅ Reconhecimento tradicional: {traditional_result['letter']} ({traditional_result['similarity']:.3f})")
@@ -299,7 +703,8 @@ class GestureManager:
         if ml_system:
             try:
                 print("🤖 Tentando reconhecimento ML...")
-                ml_letter, ml_confidence = ml_system.predict_letter(landmarks)
+                with metrics.timer('libras_recognition_stage_seconds', stage='ml'):
+                    ml_letter, ml_confidence = ml_system.predict_letter(landmarks)
                 if ml_letter and ml_confidence > 0.1:  # Threshold mínimo para ML
                     result['ml'] = {
                         'letter': ml_letter,
@@ -311,6 +716,36 @@ class GestureManager:
             except Exception as e:
                 print(f"❌ Erro no reconhecimento ML: {e}")
         
+        result = self._decide_hybrid(result)
+        if cache_key is not None:
+            self.result_cache.put(cache_key, cache_version, result, cache_variant)
+        return result
+    
+    def _result_cache_key(self, landmarks: List[Dict]):
+        """Mão normalizada usada como chave do cache (None sem cache ou com landmarks inválidos)"""
+        if self.result_cache is None:
+            return None
+        try:
+            return normalize_array(landmarks, self.normalization)
+        except (KeyError, TypeError, ValueError):
+            return None
+    
+    def _result_cache_version(self, ml_system):
+        """
+        Versão dos dados que decidem o resultado: templates e modelos de ML
+        
+        Consultas sem ml_system reutilizam a última versão de modelo vista, para
+        não esvaziar o cache quando chamadas com e sem ML se alternam. Os
+        templates são carregados (e conferidos contra o banco) antes: um acerto
+        no cache não passa pelo reconhecimento, que faria essa conferência.
+        """
+        self.get_all_gestures()
+        if ml_system is not None:
+            self._cache_model_version = ml_system.active_model_version()
+        return (self._template_version, self._cache_model_version)
+    
+    def _decide_hybrid(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Escolhe o resultado final entre tradicional e ML (preenche final/confidence/method)"""
         # Decidir resultado final com lógica melhorada
         traditional_conf = result['traditional'].get('similarity', 0) if result['traditional'] else 0
         ml_conf = result['ml']['confidence'] if result['ml'] else 0
@@ -351,13 +786,162 @@ class GestureManager:
             print("❌ Nenhum método de reconhecimento atingiu threshold mínimo")
         
         return result
+    
+    def recognize_gesture_batch(self, landmarks_list: List[List[Dict]], ml_system=None,
+                                detail: str = DETAIL_SUMMARY) -> List[Dict[str, Any]]:
+        """
+        Reconhecimento híbrido de vários frames em uma única passada vetorizada
+        
+        Args:
+            landmarks_list: Lista de mãos, cada uma com 21 pontos
+            ml_system: Sistema de ML opcional
+            detail: Nível de detalhe dos resultados tradicionais (DETAIL_LEVELS)
+            
+        Returns:
+            Lista de resultados no mesmo formato de recognize_gesture_hybrid
+        """
+        if self.result_cache is None or not landmarks_list:
+            return self._recognize_batch_uncached(landmarks_list, ml_system, detail)
+        
+        # Frames já vistos saem do cache; só os demais passam pelo lote vetorizado
+        cache_version = self._result_cache_version(ml_system)
+        cache_variant = (detail, ml_system is not None)
+        keys = [self._result_cache_key(landmarks) for landmarks in landmarks_list]
+        results = [self.result_cache.get(key, cache_version, cache_variant) if key is not None else None
+                   for key in keys]
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            computed = self._recognize_batch_uncached([landmarks_list[i] for i in missing], ml_system, detail)
+            for i, result in zip(missing, computed):
+                results[i] = result
+                if keys[i] is not None:
+                    self.result_cache.put(keys[i], cache_version, result, cache_variant)
+        
+        return results
+    
+    def _recognize_batch_uncached(self, landmarks_list: List[List[Dict]], ml_system=None,
+                                  detail: str = DETAIL_SUMMARY) -> List[Dict[str, Any]]:
+        """Reconhecimento híbrido em lote sem passar pelo cache de resultados"""
+        results = [{
+            'traditional': None,
+            'ml': None,
+            'final': None,
+            'confidence': 0.0,
+            'method': 'none',
+            'detailed_analysis': None
+        } for _ in landmarks_list]
+        
+        if not landmarks_list:
+            return results
+        
+        print(f"🔄 Iniciando reconhecimento híbrido em lote ({len(landmarks_list)} frames)...")
+        
+        # Reconhecimento tradicional
+        try:
+            with metrics.timer('libras_recognition_stage_seconds', stage='traditional_batch'):
+                traditional_results = self._recognize_traditional_batch(landmarks_list, detail)
+            for result, traditional_result in zip(results, traditional_results):
+                result['traditional'] = traditional_result
+        except Exception as e:
+            print(f"❌ Erro no reconhecimento tradicional em lote: {e}")
+        
+        # Reconhecimento ML - uma chamada por modelo para todos os frames
+        if ml_system:
+            try:
+                with metrics.timer('libras_recognition_stage_seconds', stage='ml_batch'):
+                    predictions = ml_system.predict_letters_batch(landmarks_list)
+                for result, (ml_letter, ml_confidence) in zip(results, predictions):
+                    if ml_letter and ml_confidence > 0.1:  # Threshold mínimo para ML
+                        result['ml'] = {
+                            'letter': ml_letter,
+                            'confidence': ml_confidence
+                        }
+            except Exception as e:
+                print(f"❌ Erro no reconhecimento ML em lote: {e}")
+        
+        return [self._decide_hybrid(result) for result in results]
+    
+    @staticmethod
+    def aggregate_batch_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Decisão agregada de um lote: votação ponderada pela confiança de cada frame
+        
+        Returns:
+            Dict com letra vencedora, confiança média sobre todos os frames,
+            quantos frames concordam e o método mais frequente entre eles
+        """
+        votes = {}
+        methods = {}
+        for result in results:
+            letter = result.get('final')
+            if not letter:
+                continue
+            votes[letter] = votes.get(letter, 0.0) + result['confidence']
+            methods.setdefault(letter, []).append(result['method'])
+        
+        if not votes:
+            return {'final': None, 'confidence': 0.0, 'method': 'none', 'frames_agreeing': 0, 'total_frames': len(results)}
+        
+        best_letter = max(votes, key=votes.get)
+        letter_methods = methods[best_letter]
+        return {
+            'final': best_letter,
+            'confidence': votes[best_letter] / len(results),
+            'method': max(set(letter_methods), key=letter_methods.count),
+            'frames_agreeing': len(letter_methods),
+            'total_frames': len(results)
+        }
+    
+    def _recognize_traditional_batch(self, landmarks_list: List[List[Dict]],
+                                     detail: str = DETAIL_SUMMARY) -> List[Optional[Dict[str, Any]]]:
+        """Reconhecimento tradicional de vários frames contra a matriz de templates"""
+        # Sem numpy ou no modo multi-exemplar, cada frame é reconhecido individualmente
+        if not VECTORIZED_MATCHING_AVAILABLE or self.multi_exemplar:
+            return [self.recognize_gesture(landmarks, detail) for landmarks in landmarks_list]
+        
+        matcher = self._load_templates().matcher
+        if matcher is None or len(matcher) == 0:
+            print("⚠️ Nenhum gesto salvo encontrado para comparação")
+            return [None] * len(landmarks_list)
+        
+        valid = []
+        rows = []
+        for i, landmarks in enumerate(landmarks_list):
+            points = None
+            if landmarks and len(landmarks) == 21:
+                try:
+                    points = landmarks_to_array(landmarks, dtype=np.float64)
+                except (TypeError, ValueError, KeyError, IndexError):
+                    points = None
+            if points is not None:
+                valid.append(i)
+                rows.append(points)
+        
+        traditional = [None] * len(landmarks_list)
+        if not rows:
+            return traditional
+        
+        # Matriz (frames, templates) calculada de uma só vez
+        scores = matcher.score_batch(normalize_batch(np.stack(rows), self.normalization))
+        best = np.argmax(scores, axis=1)
+        for row, frame_index in enumerate(valid):
+            all_similarities = None
+            if detail != DETAIL_NONE:
+                all_similarities = {letter: float(s) for letter, s in zip(matcher.letters, scores[row])}
+            traditional[frame_index] = self._build_recognition_result(
+                matcher.letters[best[row]], float(scores[row, best[row]]), all_similarities, {}
+            )
+        
+        return traditional
 
-    def recognize_gesture(self, landmarks: List[Dict]) -> Optional[Dict[str, Any]]:
+    def recognize_gesture(self, landmarks: List[Dict], detail: str = DETAIL_SUMMARY) -> Optional[Dict[str, Any]]:
         """
         Reconhecimento tradicional baseado em comparação de landmarks
         
         Args:
             landmarks: Lista de 21 pontos com coordenadas
+            detail: Com DETAIL_NONE o resultado não traz all_similarities
             
         Returns:
             Dict com letra reconhecida e similaridade ou None
@@ -367,69 +951,91 @@ class GestureManager:
                 print("❌ Landmarks inválidos para reconhecimento")
                 return None
             
-            # Normalizar landmarks de entrada
-            normalized_input = self._normalize_landmarks(landmarks)
-            if not normalized_input:
+            # Normalizar apenas os landmarks de entrada - os templates já estão normalizados
+            normalized_input = self._normalize_template(landmarks)
+            if normalized_input is None:
                 print("❌ Falha na normalização dos landmarks de entrada")
                 return None
             
             best_match = None
             best_similarity = 0.0
             all_similarities = {}
+            extra = {}
+            
+            if self.multi_exemplar:
+                # Votação entre os k exemplares mais próximos
+                knn_result = self._get_exemplar_index().query(normalized_input)
+                if not knn_result:
+                    print("⚠️ Nenhum exemplar salvo encontrado para comparação")
+                    return None
+                
+                best_match = knn_result['letter']
+                best_similarity = knn_result['similarity']
+                all_similarities = knn_result['all_similarities'] if detail != DETAIL_NONE else None
+                extra = {'votes': knn_result['votes'], 'method': 'knn'}
+                return self._build_recognition_result(best_match, best_similarity, all_similarities, extra)
             
-            # Comparar com todos os gestos salvos
-            all_gestures = self.get_all_gestures()
+            # Comparar com todos os gestos salvos (um único estado durante toda a consulta)
+            templates = self._load_templates()
             
-            if not all_gestures:
+            if not templates.gestures:
                 print("⚠️ Nenhum gesto salvo encontrado para comparação")
                 return None
             
-            print(f"🔍 Comparando com {len(all_gestures)} gestos salvos...")
+            print(f"🔍 Comparando com {len(templates.gestures)} gestos salvos...")
             
-            for letter, gesture_data in all_gestures.items():
-                if not gesture_data or not gesture_data.get('landmarks'):
-                    continue
-                
-                # Normalizar landmarks salvos
-                saved_landmarks = gesture_data['landmarks']
-                normalized_saved = self._normalize_landmarks(saved_landmarks)
-                if not normalized_saved:
-                    continue
-                
-                # Calcular similaridade
-                similarity = self._calculate_similarity(normalized_input, normalized_saved)
-                all_similarities[letter] = similarity
-                
-                print(f"📊 Letra {letter}: {similarity:.3f} similaridade")
-                
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = letter
-            
-            # Ajustar threshold para ser mais permissivo após melhorias
-            threshold = 0.4  # Reduzido de 0.3 para 0.4
-            
-            print(f"🎯 Melhor match: {best_match} com {best_similarity:.3f} (threshold: {threshold})")
-            
-            # Retornar apenas se similaridade for razoável
-            if best_similarity > threshold:
-                result = {
-                    'letter': best_match,
-                    'similarity': best_similarity,
-                    'all_similarities': all_similarities,
-                    'quality': 'excellent' if best_similarity > 0.8 else 'good' if best_similarity > 0.6 else 'acceptable'
-                }
-                print(f"✅ Gesto reconhecido: {best_match} ({result['quality']})")
-                return result
-            else:
-                print(f"❌ Nenhum gesto reconhecido - melhor similaridade: {best_similarity:.3f}")
+            if templates.matcher is not None:
+                # Comparar contra todos os templates em uma única operação
+                best_match, best_similarity, all_similarities = templates.matcher.best_match(
+                    normalized_input, with_all=detail != DETAIL_NONE
+                )
+            elif VECTORIZED_MATCHING_AVAILABLE:
+                # Templates em matriz NumPy não servem para o caminho escalar
+                print("❌ Matriz de templates indisponível")
                 return None
+            else:
+                for letter, normalized_saved in templates.normalized.items():
+                    similarity = self._calculate_similarity(normalized_input, normalized_saved)
+                    all_similarities[letter] = similarity
+                    
+                    if similarity > best_similarity:
+                        best_similarity = similarity
+                        best_match = letter
+                
+                if detail == DETAIL_NONE:
+                    all_similarities = None
+            
+            return self._build_recognition_result(best_match, best_similarity, all_similarities, extra)
             
         except Exception as e:
             print(f"❌ Erro no reconhecimento tradicional: {e}")
             import traceback
             traceback.print_exc()
             return None
+    
+    def _build_recognition_result(self, best_match: Optional[str], best_similarity: float,
+                                  all_similarities: Optional[Dict[str, float]], extra: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Aplica o threshold e monta o resultado do reconhecimento tradicional (sem all_similarities se None)"""
+        # Ajustar threshold para ser mais permissivo após melhorias
+        threshold = 0.4  # Reduzido de 0.3 para 0.4
+        
+        print(f"🎯 Melhor match: {best_match} com {best_similarity:.3f} (threshold: {threshold})")
+        
+        # Retornar apenas se similaridade for razoável
+        if best_similarity > threshold:
+            result = {
+                'letter': best_match,
+                'similarity': best_similarity,
+                'quality': 'excellent' if best_similarity > 0.8 else 'good' if best_similarity > 0.6 else 'acceptable'
+            }
+            if all_similarities is not None:
+                result['all_similarities'] = all_similarities
+            result.update(extra)
+            print(f"✅ Gesto reconhecido: {best_match} ({result['quality']})")
+            return result
+        else:
+            print(f"❌ Nenhum gesto reconhecido - melhor similaridade: {best_similarity:.3f}")
+            return None
 
     def _normalize_landmarks(self, landmarks: List[Dict]) -> Optional[List[Dict]]:
         """Normaliza landmarks para comparação consistente"""
@@ -559,7 +1165,7 @@ class GestureManager:
         try:
             letter = letter.upper()
             
-            with sqlite3.connect(self.db_path) as conn:
+            with connect_sqlite(self.db_path) as conn:
                 conn.execute("""
                     UPDATE gesture_analytics 
                     SET recognition_count = recognition_count + 1,
@@ -579,7 +1185,7 @@ class GestureManager:
             Dict com estatísticas
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect_sqlite(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 
                 # Estatísticas gerais
@@ -627,7 +1233,7 @@ class GestureManager:
             export_data = {
                 'export_date': datetime.now().isoformat(),
                 'version': '1.0',
-                'gestures': gestures,
+                'gestures': dict(gestures),
                 'analytics': analytics
             }
             
@@ -652,15 +1258,28 @@ class GestureManager:
             if 'gestures' not in import_data:
                 raise ValueError("Dados de importação inválidos")
             
-            imported_count = 0
+            imported = []
+            
+            with connect_sqlite(self.db_path) as conn:
+                version_before = self._begin_write(conn)
+                for letter, gesture_data in import_data['gestures'].items():
+                    try:
+                        self._validate_gesture(letter, gesture_data['landmarks'], gesture_data['quality'])
+                    except (ValueError, KeyError) as e:
+                        print(f"Erro ao importar gesto da letra {letter}: {e}")
+                        continue
+                    
+                    letter = letter.upper()
+                    self._write_gesture(conn, letter, gesture_data['landmarks'], gesture_data['quality'])
+                    imported.append((letter, gesture_data['landmarks'], gesture_data['quality']))
+                
+                synced_version = self._finish_write(conn, version_before)
             
-            for letter, gesture_data in import_data['gestures'].items():
-                if self.save_gesture(
-                    letter, 
-                    gesture_data['landmarks'], 
-                    gesture_data['quality']
-                ):
-                    imported_count += 1
+            # Todos os gestos entram no cache de uma vez (uma única matriz montada)
+            if synced_version is not None and imported:
+                self._update_cache_with_gestures(imported, synced_version)
+            self._exemplar_index = None
+            imported_count = len(imported)
             
             print(f"📥 Importados {imported_count} gestos com sucesso")
             return True
@@ -677,7 +1296,7 @@ class GestureManager:
             int: Número de gestos
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect_sqlite(self.db_path) as conn:
                 cursor = conn.execute("SELECT COUNT(*) as count FROM gestures")
                 return cursor.fetchone()[0]
         except Exception as e:
@@ -787,8 +1406,9 @@ class GestureManager:
             low_quality = sum(1 for g in gestures.values() if g['quality'] < 60)
             
             # Cache info
-            cache_status = "active" if self._cache else "empty"
-            cache_size = len(self._cache)
+            templates = self._templates
+            cache_status = "active" if templates.gestures else "empty"
+            cache_size = len(templates.gestures)
             
             return {
                 "total_gestures": total_gestures,
@@ -803,7 +1423,8 @@ class GestureManager:
                 "cache_info": {
                     "status": cache_status,
                     "size": cache_size,
-                    "timestamp": self._cache_timestamp
+                    "timestamp": self._cache_timestamp,
+                    "data_version": templates.version
                 },
                 "sync_status": "synchronized" if total_gestures > 0 else "empty"
             }
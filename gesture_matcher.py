@@ -0,0 +1,301 @@
+"""
+Motor vetorizado de comparação de gestos Libras
+Mantém todos os templates em uma única matriz NumPy e calcula a similaridade
+da mão atual contra todos eles em uma só operação
+
+Modos de normalização (GESTURE_NORMALIZATION, ver benchmark_normalization.py):
+    legacy     - padrão; pulso zerado e escala pela ponta do médio, como
+                 GestureManager._normalize_landmarks (sensível à rotação da mão)
+    palm       - translação pelo pulso, escala pelo tamanho da palma e rotação
+                 para um referencial da palma montado com os pontos 0, 5 e 17
+    procrustes - translação e escala como em palm; na comparação, a mão é
+                 girada sobre cada template (Procrustes ortogonal ponderado),
+                 tanto no TemplateMatcher quanto nos candidatos do índice k-NN
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Pesos por ponto da mão - mesmos valores de GestureManager._calculate_similarity
+POINT_WEIGHTS = {
+    0: 1.5,   # Pulso (muito importante para orientação)
+    4: 2.0,   # Ponta do polegar
+    8: 2.0,   # Ponta do indicador
+    12: 2.0,  # Ponta do médio
+    16: 2.0,  # Ponta do anelar
+    20: 2.0,  # Ponta do mindinho
+    # Articulações importantes
+    5: 1.5, 9: 1.5, 13: 1.5, 17: 1.5,  # Base dos dedos
+    # Outras articulações
+    1: 1.0, 2: 1.2, 3: 1.3,  # Polegar
+    6: 1.0, 7: 1.2,          # Indicador
+    10: 1.0, 11: 1.2,        # Médio
+    14: 1.0, 15: 1.2,        # Anelar
+    18: 1.0, 19: 1.2         # Mindinho
+}
+
+WEIGHT_VECTOR = np.array([POINT_WEIGHTS.get(i, 1.0) for i in range(21)], dtype=np.float32)
+
+MAX_DISTANCE = 0.15  # Distância máxima após normalização
+SIGMOID_GAIN = 10.0  # Inclinação da sigmoide de realce
+
+NORMALIZATION_LEGACY = 'legacy'
+NORMALIZATION_PALM = 'palm'
+NORMALIZATION_PROCRUSTES = 'procrustes'
+NORMALIZATION_MODES = (NORMALIZATION_LEGACY, NORMALIZATION_PALM, NORMALIZATION_PROCRUSTES)
+
+# Pulso -> ponta do médio dividido por pulso -> base do médio em uma mão aberta:
+# os modos palm/procrustes escalam pela base do médio (não muda ao dobrar os
+# dedos) e mantêm a mesma ordem de grandeza do modo legacy, usada por MAX_DISTANCE
+PALM_SCALE_RATIO = 2.0
+
+
+def landmarks_to_array(landmarks: List, dtype=np.float32) -> Optional[np.ndarray]:
+    """Converte 21 pontos (dicts ou listas) em uma matriz (21, 3)"""
+    if isinstance(landmarks, np.ndarray):
+        return landmarks.astype(dtype, copy=False) if landmarks.shape == (21, 3) else None
+
+    if not landmarks or len(landmarks) != 21:
+        return None
+
+    points = np.empty((21, 3), dtype=dtype)
+    for i, point in enumerate(landmarks):
+        if isinstance(point, dict):
+            points[i] = (point.get('x', 0), point.get('y', 0), point.get('z', 0))
+        else:
+            points[i] = (point[0], point[1], point[2] if len(point) > 2 else 0)
+    return points
+
+
+def normalize_array(landmarks: List, mode: str = NORMALIZATION_LEGACY) -> Optional[np.ndarray]:
+    """
+    Versão vetorizada de GestureManager._normalize_landmarks
+
+    No modo legacy reproduz exatamente o caminho escalar: lá o pulso é zerado
+    na primeira iteração da recentralização (o ponto 0 é o próprio objeto
+    usado como referência), então os demais pontos mantêm a posição original.
+    A escala usa a distância da ponta do médio (ponto 12) até a origem.
+    Os demais modos seguem ``normalize_batch``.
+
+    Returns:
+        np.ndarray (21, 3) float64 ou None se os landmarks forem inválidos
+    """
+    try:
+        points = landmarks_to_array(landmarks, dtype=np.float64)
+    except (TypeError, ValueError, KeyError, IndexError):
+        return None
+    if points is None:
+        return None
+
+    if mode != NORMALIZATION_LEGACY:
+        return normalize_batch(points[None], mode)[0]
+
+    points = np.array(points, dtype=np.float64)
+    points[0] = 0.0
+
+    scale_distance = float(np.sqrt(np.dot(points[12], points[12])))
+    if scale_distance > 0.01:  # Evitar divisão por zero
+        points *= 1.0 / scale_distance
+    return points
+
+
+def normalize_batch(points: np.ndarray, mode: str = NORMALIZATION_LEGACY) -> np.ndarray:
+    """Normaliza um lote (n, 21, 3) de mãos, com a mesma regra de ``normalize_array``"""
+    if mode not in NORMALIZATION_MODES:
+        raise ValueError(f"Modo de normalização inválido: {mode} (use {', '.join(NORMALIZATION_MODES)})")
+
+    points = np.array(points, dtype=np.float64)
+    if points.size == 0:
+        return points.reshape(0, 21, 3)
+
+    if mode == NORMALIZATION_LEGACY:
+        points[:, 0, :] = 0.0
+        scale_distance = np.sqrt(np.einsum('ij,ij->i', points[:, 12], points[:, 12]))
+    else:
+        points -= points[:, :1, :]
+        scale_distance = np.sqrt(np.einsum('ij,ij->i', points[:, 9], points[:, 9])) * PALM_SCALE_RATIO
+
+    scale_factor = np.where(scale_distance > 0.01, 1.0 / np.maximum(scale_distance, 0.01), 1.0)
+    points *= scale_factor[:, None, None]
+
+    if mode == NORMALIZATION_PALM:
+        points = to_palm_frame(points)
+    return points
+
+
+def _unit(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9), norms[..., 0] > 1e-6
+
+
+def to_palm_frame(points: np.ndarray) -> np.ndarray:
+    """
+    Gira mãos (n, 21, 3) já centradas no pulso para o referencial da palma
+
+    Eixo x: base do mindinho (17) -> base do indicador (5); eixo z: normal da
+    palma; eixo y: completa o referencial, apontando para os dedos. Mãos com
+    a palma degenerada (pontos colineares) ficam como estão.
+    """
+    x_axis, x_ok = _unit(points[:, 5] - points[:, 17])
+    normal, normal_ok = _unit(np.cross(x_axis, points[:, 9]))
+    y_axis = np.cross(normal, x_axis)
+
+    basis = np.stack([x_axis, y_axis, normal], axis=1)  # (n, 3, 3), uma linha por eixo
+    basis[~(x_ok & normal_ok)] = np.eye(3)
+    return np.einsum('npj,nij->npi', points, basis)
+
+
+def procrustes_align(templates: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Gira ``query`` sobre cada template com a rotação ótima (sem reflexão)
+
+    Procrustes ortogonal ponderado pelos pesos dos pontos, resolvido com uma
+    única SVD em lote para todos os templates. ``query`` pode ser uma mão
+    (21, 3) -> resultado (n, 21, 3) ou um lote (m, 21, 3) -> (m, n, 21, 3).
+    """
+    query = query.astype(np.float64)
+    weighted = query * WEIGHT_VECTOR.astype(np.float64)[:, None]
+    covariance = np.einsum('...pi,npj->...nij', weighted, templates.astype(np.float64))
+
+    u, _, vt = np.linalg.svd(covariance)
+    reflection = np.sign(np.linalg.det(u @ vt))
+    u[..., :, -1] *= reflection[..., None]
+    rotation = u @ vt
+
+    return np.einsum('...pi,...nij->...npj', query, rotation)
+
+
+def mode_similarity_scores(templates: np.ndarray, query: np.ndarray,
+                           mode: str = NORMALIZATION_LEGACY) -> np.ndarray:
+    """``similarity_scores`` com o alinhamento do modo: em 'procrustes' a mão é girada sobre cada template"""
+    if mode == NORMALIZATION_PROCRUSTES:
+        aligned = procrustes_align(templates, query)
+        return _similarity_from_diff(templates.astype(np.float64) - aligned)
+    return similarity_scores(templates, query)
+
+
+def similarity_scores(templates: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Similaridade (0-1) de ``query`` contra cada linha de ``templates`` (n, 21, 3)
+
+    Mesma fórmula de GestureManager._calculate_similarity: distância 2D/3D
+    combinada, média ponderada pelos pesos dos pontos e sigmoide de realce.
+    ``query`` pode ser uma mão (21, 3) -> resultado (n,) ou um lote
+    (m, 21, 3) -> resultado (m, n).
+    """
+    # Diferenças (..., n_templates, 21, 3) em float64 para manter a precisão do caminho escalar
+    diff = templates.astype(np.float64) - query.astype(np.float64)[..., None, :, :]
+    return _similarity_from_diff(diff)
+
+
+def _similarity_from_diff(diff: np.ndarray) -> np.ndarray:
+    """Similaridade a partir das diferenças ponto a ponto (..., 21, 3)"""
+    squared = diff * diff
+    squared_2d = squared[..., 0] + squared[..., 1]
+
+    distance_2d = np.sqrt(squared_2d)
+    distance_3d = np.sqrt(squared_2d + squared[..., 2])
+
+    # Para gestos de LIBRAS, a profundidade é menos importante
+    combined = distance_2d * 0.8 + distance_3d * 0.2
+    avg_weighted_distance = combined @ WEIGHT_VECTOR.astype(np.float64) / float(WEIGHT_VECTOR.sum())
+
+    similarity = np.maximum(0.0, 1.0 - avg_weighted_distance / MAX_DISTANCE)
+    enhanced = 1.0 / (1.0 + np.exp(-SIGMOID_GAIN * (similarity - 0.5)))
+    return np.minimum(1.0, enhanced)
+
+
+def array_to_landmarks(points: np.ndarray) -> List[Dict[str, float]]:
+    """Converte uma matriz (21, 3) de volta para a lista de dicts x/y/z"""
+    return [{'x': float(x), 'y': float(y), 'z': float(z)} for x, y, z in points]
+
+
+class TemplateMatcher:
+    """
+    Conjunto imutável de templates normalizados em uma matriz contígua
+
+    Args:
+        letters: Letras na mesma ordem das linhas de ``templates``
+        templates: Matriz (n_templates, 21, 3) com landmarks já normalizados
+        normalization: Modo usado nos templates; com 'procrustes' cada mão é
+            girada sobre cada template antes da comparação
+    """
+
+    def __init__(self, letters: List[str], templates: np.ndarray, normalization: str = NORMALIZATION_LEGACY):
+        templates = np.ascontiguousarray(templates, dtype=np.float32)
+        if templates.ndim != 3 or templates.shape[1:] != (21, 3):
+            raise ValueError("Templates devem ter formato (n_templates, 21, 3)")
+        if len(letters) != templates.shape[0]:
+            raise ValueError("Número de letras diferente do número de templates")
+
+        self.letters = list(letters)
+        self.templates = templates
+        self.weights = WEIGHT_VECTOR
+        self.normalization = normalization
+
+    @classmethod
+    def from_landmarks(cls, normalized: Dict[str, List], normalization: str = NORMALIZATION_LEGACY) -> 'TemplateMatcher':
+        """Cria o matcher a partir de um dict letra -> landmarks normalizados"""
+        letters = []
+        rows = []
+        for letter, landmarks in normalized.items():
+            points = landmarks_to_array(landmarks)
+            if points is None:
+                continue
+            letters.append(letter)
+            rows.append(points)
+
+        templates = np.stack(rows) if rows else np.empty((0, 21, 3), dtype=np.float32)
+        return cls(letters, templates, normalization)
+
+    def __len__(self) -> int:
+        return len(self.letters)
+
+    def score(self, normalized_input) -> np.ndarray:
+        """
+        Calcula a similaridade da mão contra todos os templates
+
+        Args:
+            normalized_input: Landmarks normalizados (lista de dicts ou matriz (21, 3))
+
+        Returns:
+            np.ndarray: Similaridade (0-1) de cada template, na ordem de ``letters``
+        """
+        if len(self.letters) == 0:
+            return np.empty(0, dtype=np.float64)
+
+        query = normalized_input if isinstance(normalized_input, np.ndarray) else landmarks_to_array(normalized_input)
+        if query is None:
+            return np.zeros(len(self.letters), dtype=np.float64)
+
+        return self._scores(query)
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        return mode_similarity_scores(self.templates, query, self.normalization)
+
+    def score_batch(self, normalized_inputs: np.ndarray) -> np.ndarray:
+        """
+        Calcula a similaridade de várias mãos (m, 21, 3) contra todos os templates
+
+        Returns:
+            np.ndarray (m, n_templates) com a similaridade de cada par
+        """
+        queries = np.asarray(normalized_inputs, dtype=np.float64).reshape(-1, 21, 3)
+        if len(self.letters) == 0:
+            return np.empty((len(queries), 0), dtype=np.float64)
+        return self._scores(queries)
+
+    def best_match(self, normalized_input, with_all: bool = True) -> Tuple[Optional[str], float, Optional[Dict[str, float]]]:
+        """
+        Retorna a melhor letra, sua similaridade e todas as similaridades
+
+        Com ``with_all=False`` o dicionário de similaridades não é montado (None).
+        """
+        scores = self.score(normalized_input)
+        if scores.size == 0:
+            return None, 0.0, {} if with_all else None
+
+        best_index = int(np.argmax(scores))
+        all_similarities = {letter: float(s) for letter, s in zip(self.letters, scores)} if with_all else None
+        return self.letters[best_index], float(scores[best_index]), all_similarities
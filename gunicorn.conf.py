@@ -0,0 +1,86 @@
+"""
+Configuração do gunicorn para produção
+Uso: gunicorn -c gunicorn.conf.py wsgi:app
+
+Variáveis de ambiente:
+    PORT               - porta HTTP (padrão 5000)
+    WEB_CONCURRENCY    - número de workers (padrão: núcleos da máquina, até 8)
+    GUNICORN_THREADS   - threads por worker (padrão 32)
+    STREAM_MAX_SESSIONS - sessões /ws/recognize simultâneas por worker
+                         (padrão: threads - 8; as excedentes recebem erro e devem usar o lote HTTP)
+    GUNICORN_TIMEOUT   - segundos até um worker travado ser reiniciado (padrão 120)
+    GUNICORN_MAX_REQUESTS - reinicia cada worker após N requisições (padrão 0 = nunca)
+    METRICS_DIR        - snapshots de métricas dos workers somados em /metrics
+                         (padrão: <tmp>/libras-metrics, limpo a cada início)
+    GESTURE_SHARED_TEMPLATES - matriz de templates mapeada por todos os workers
+                         (padrão: <tmp>/libras-templates.bin)
+
+Reload gracioso (relê templates e modelos sem derrubar conexões): kill -HUP <pid do mestre>
+"""
+
+import gc
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Reconhecimento é CPU: um worker por núcleo. Cada conexão /ws/recognize prende
+# uma thread do worker enquanto o aluno está conectado, então o pool é bem maior
+# que o número de núcleos: com 32 threads, até 24 alunos em streaming por worker
+# e 8 threads sempre livres para HTTP (WEB_CONCURRENCY x STREAM_MAX_SESSIONS no total)
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+worker_class = 'gthread'
+HTTP_RESERVED_THREADS = 8
+
+# Importar o app (e carregar templates/modelos) no mestre, antes do fork
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+# Definidos antes do preload: metrics.py e GestureManager leem o ambiente na importação do app
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'libras-metrics'))
+os.environ.setdefault('GESTURE_SHARED_TEMPLATES', os.path.join(tempfile.gettempdir(), 'libras-templates.bin'))
+os.environ.setdefault('STREAM_MAX_SESSIONS', str(max(1, threads - HTTP_RESERVED_THREADS)))
+
+
+def on_starting(server):
+    # Snapshots de uma execução anterior (só no início; o HUP mantém os contadores)
+    for stale_snapshot in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(stale_snapshot)
+
+
+def when_ready(server):
+    # Objetos carregados no mestre ficam fora da coleta de lixo: o GC dos
+    # workers não toca nessas páginas e elas continuam compartilhadas
+    gc.freeze()
+    server.log.info("Templates e modelos pré-carregados; %s workers x %s threads (até %s WebSockets por worker)",
+                    workers, threads, os.environ['STREAM_MAX_SESSIONS'])
+
+
+def on_reload(server):
+    # Com preload_app o HUP não reimporta o app: recarregar no mestre antes
+    # de criar os novos workers
+    import wsgi
+
+    gc.unfreeze()
+    wsgi.reload_shared_state()
+    gc.freeze()
+    server.log.info("Templates e modelos recarregados")
+
+
+def worker_exit(server, worker):
+    import metrics
+    import wsgi
+
+    wsgi.shutdown_worker()
+    metrics.persist()
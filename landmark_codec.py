@@ -0,0 +1,193 @@
+"""
+Formato binário compacto para landmarks de mão
+Cada mão é gravada como 1 byte de versão + 63 float32 little-endian
+(21 pontos x 3 coordenadas = 253 bytes), no lugar do JSON de 21 dicts (~1,5 KB)
+
+Os leitores aceitam os dois formatos, então bancos antigos continuam
+funcionando até a migração: python landmark_codec.py migrate <arquivo.db>
+"""
+
+import json
+import sqlite3
+import sys
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from sqlite_factory import connect as connect_sqlite
+
+LANDMARK_FORMAT_VERSION = 1
+LANDMARK_DTYPE = np.dtype('<f4')
+LANDMARK_PAYLOAD_SIZE = 21 * 3 * LANDMARK_DTYPE.itemsize  # 252 bytes
+LANDMARK_BLOB_SIZE = LANDMARK_PAYLOAD_SIZE + 1
+
+# Tabelas e colunas com landmarks gravados por este projeto
+LANDMARK_COLUMNS = [
+    ('gesture_examples', 'landmarks'),
+    ('user_feedback', 'landmarks'),
+    ('gestures', 'landmarks_json'),
+    ('gesture_exemplars', 'landmarks_json'),
+]
+
+
+def encode_landmarks(landmarks) -> bytes:
+    """Converte 21 pontos (dicts, listas ou matriz (21, 3)) no BLOB versionado"""
+    if isinstance(landmarks, np.ndarray):
+        points = landmarks
+    else:
+        if not landmarks or len(landmarks) != 21:
+            raise ValueError("Landmarks devem ter 21 pontos")
+        points = [
+            (p.get('x', 0), p.get('y', 0), p.get('z', 0)) if isinstance(p, dict)
+            else (p[0], p[1], p[2] if len(p) > 2 else 0)
+            for p in landmarks
+        ]
+
+    points = np.asarray(points, dtype=LANDMARK_DTYPE)
+    if points.shape != (21, 3):
+        raise ValueError("Landmarks devem ter formato (21, 3)")
+    return bytes([LANDMARK_FORMAT_VERSION]) + points.tobytes()
+
+
+def to_db_value(landmarks):
+    """Valor a gravar no banco: BLOB binário, ou JSON se os landmarks não forem uma mão de 21 pontos"""
+    try:
+        return encode_landmarks(landmarks)
+    except (TypeError, ValueError, KeyError, IndexError):
+        return json.dumps(landmarks)
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and len(value) == LANDMARK_BLOB_SIZE
+
+
+def decode_landmarks(value) -> Optional[np.ndarray]:
+    """
+    Decodifica um valor da coluna de landmarks em uma matriz (21, 3) float32
+
+    Aceita o BLOB versionado (sem cópia, via np.frombuffer) ou o JSON legado.
+    Retorna None se o valor for inválido.
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if len(value) != LANDMARK_BLOB_SIZE or value[0] != LANDMARK_FORMAT_VERSION:
+            return None
+        return np.frombuffer(value, dtype=LANDMARK_DTYPE, count=63, offset=1).reshape(21, 3)
+
+    try:
+        landmarks = json.loads(value)
+        return np.frombuffer(encode_landmarks(landmarks), dtype=LANDMARK_DTYPE, count=63, offset=1).reshape(21, 3)
+    except (TypeError, ValueError, KeyError, IndexError):
+        return None
+
+
+def decode_many(values: Iterable, with_index: bool = False):
+    """
+    Decodifica várias linhas em uma matriz (n, 21, 3) float32, ignorando as inválidas
+
+    Quando todas as linhas estão no formato binário, a matriz é montada com
+    um único np.frombuffer sobre os BLOBs concatenados.
+
+    Args:
+        values: Valores da coluna de landmarks
+        with_index: Retornar também os índices das linhas válidas
+
+    Returns:
+        Matriz (n, 21, 3), ou (matriz, índices) se ``with_index``
+    """
+    values = list(values)
+    if values and all(is_encoded(v) and v[0] == LANDMARK_FORMAT_VERSION for v in values):
+        buffer = b''.join(bytes(v) for v in values)
+        records = np.frombuffer(buffer, dtype=np.uint8).reshape(len(values), LANDMARK_BLOB_SIZE)
+        points = records[:, 1:].copy().view(LANDMARK_DTYPE).reshape(len(values), 21, 3)
+        return (points, list(range(len(values)))) if with_index else points
+
+    index = []
+    decoded = []
+    for i, value in enumerate(values):
+        points = decode_landmarks(value)
+        if points is not None:
+            index.append(i)
+            decoded.append(points)
+
+    points = np.stack(decoded) if decoded else np.empty((0, 21, 3), dtype=LANDMARK_DTYPE)
+    return (points, index) if with_index else points
+
+
+def decode_to_dicts(value) -> Optional[List[dict]]:
+    """Decodifica para a lista de dicts x/y/z usada pelas APIs e pelo frontend"""
+    points = decode_landmarks(value)
+    if points is None:
+        return None
+    return [{'x': float(x), 'y': float(y), 'z': float(z)} for x, y, z in points]
+
+
+def migrate_column(conn: sqlite3.Connection, table: str, column: str, batch_size: int = 500) -> int:
+    """
+    Converte as linhas em JSON de ``table.column`` para o formato binário
+
+    Linhas que não puderem ser decodificadas são mantidas como estão.
+
+    Returns:
+        Número de linhas convertidas
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    if cursor.fetchone() is None:
+        return 0
+
+    converted = 0
+    last_rowid = -1
+    while True:
+        # Lotes por rowid: o SELECT não fica aberto enquanto as linhas são atualizadas
+        cursor.execute(f"""
+            SELECT rowid, {column} FROM {table}
+            WHERE typeof({column}) = 'text' AND rowid > ?
+            ORDER BY rowid LIMIT ?
+        """, (last_rowid, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+
+        updates = []
+        for rowid, value in rows:
+            points = decode_landmarks(value)
+            if points is not None:
+                updates.append((encode_landmarks(points), rowid))
+
+        cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE rowid = ?", updates)
+        conn.commit()
+        converted += len(updates)
+
+    return converted
+
+
+def migrate_database(db_path: str, vacuum: bool = True) -> dict:
+    """Migra todas as colunas de landmarks conhecidas de um banco SQLite"""
+    conn = connect_sqlite(db_path)
+    try:
+        result = {
+            f"{table}.{column}": migrate_column(conn, table, column)
+            for table, column in LANDMARK_COLUMNS
+        }
+        if vacuum and any(result.values()):
+            # Devolver ao sistema de arquivos o espaço liberado pelo JSON
+            conn.execute("VACUUM")
+        return result
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != 'migrate':
+        print("Uso: python landmark_codec.py migrate <arquivo.db> [<arquivo.db> ...]")
+        sys.exit(1)
+
+    for path in sys.argv[2:]:
+        print(f"🔄 Migrando landmarks de {path}...")
+        for name, count in migrate_database(path).items():
+            print(f"  {name}: {count} linhas convertidas")
+    print("✅ Migração concluída")
@@ -0,0 +1,263 @@
+"""
+Ranking do modo Desafio com top-K pré-calculado
+Cada quadro (nível, escopo, período) guarda no máximo LEADERBOARD_SIZE
+resultados na tabela challenge_leaderboard, atualizada na mesma transação
+de save_challenge_result; as leituras vêm de uma cópia em memória validada
+por um contador de versão por nível
+
+Escopos:
+    all  - todas as partidas
+    best - apenas a melhor partida de cada usuário
+Períodos:
+    all    - desde sempre
+    daily  - dia atual (UTC)
+    weekly - semana atual (UTC, começando na segunda-feira)
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+SCOPES = ('all', 'best')
+PERIODS = ('all', 'daily', 'weekly')
+LEADERBOARD_SIZE = max(1, int(os.environ.get('LEADERBOARD_SIZE', '50')))
+
+# Quadros diários/semanais mais antigos que isso são descartados
+PERIOD_RETENTION_DAYS = {'daily': 7, 'weekly': 35}
+
+# Chave do período calculada pelo SQLite (backfill), equivalente a period_key()
+_SQL_PERIOD_KEY = {
+    'all': "''",
+    'daily': "DATE(created_at)",
+    'weekly': "DATE(created_at, 'weekday 0', '-6 days')",
+}
+
+# Mesma ordem do ranking original, com o id como desempate estável
+_SQL_RANK_ORDER = "score DESC, words_completed DESC, time_taken ASC, id ASC"
+
+LEADERBOARD_SCHEMA_SQL = [
+    """CREATE TABLE IF NOT EXISTS challenge_leaderboard (
+        level TEXT NOT NULL,
+        scope TEXT NOT NULL,
+        period TEXT NOT NULL,
+        period_key TEXT NOT NULL,
+        result_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        words_completed INTEGER,
+        score INTEGER,
+        words_per_minute REAL,
+        time_taken INTEGER,
+        created_at TEXT,
+        PRIMARY KEY (level, scope, period, period_key, result_id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS challenge_leaderboard_meta (
+        level TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )""",
+]
+
+_ENTRY_COLUMNS = "result_id, user_id, words_completed, score, words_per_minute, time_taken, created_at"
+
+
+def rebuild_statements(size: int = LEADERBOARD_SIZE) -> List[str]:
+    """Comandos SQL que recalculam todos os quadros a partir de challenge_results"""
+    statements = ["DELETE FROM challenge_leaderboard"]
+
+    for period, key_sql in _SQL_PERIOD_KEY.items():
+        partition = f"level, {key_sql}"
+        for scope in SCOPES:
+            source = "challenge_results WHERE user_id IS NOT NULL"
+            if scope == 'best':
+                # Melhor partida de cada usuário dentro do período
+                source = f"""(
+                    SELECT * FROM (
+                        SELECT *, ROW_NUMBER() OVER (PARTITION BY {partition}, user_id ORDER BY {_SQL_RANK_ORDER}) AS user_rank
+                        FROM challenge_results WHERE user_id IS NOT NULL
+                    ) WHERE user_rank = 1
+                )"""
+            statements.append(f"""
+                INSERT INTO challenge_leaderboard
+                (level, scope, period, period_key, {_ENTRY_COLUMNS})
+                SELECT level, '{scope}', '{period}', board_key, id, user_id, words_completed, score,
+                       words_per_minute, time_taken, created_at
+                FROM (
+                    SELECT *, {key_sql} AS board_key,
+                           ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY {_SQL_RANK_ORDER}) AS board_rank
+                    FROM {source}
+                ) WHERE board_rank <= {int(size)}
+            """)
+
+    for period, days in PERIOD_RETENTION_DAYS.items():
+        statements.append(
+            f"DELETE FROM challenge_leaderboard WHERE period = '{period}' AND period_key < DATE('now', '-{days} days')"
+        )
+
+    statements.append("""
+        INSERT INTO challenge_leaderboard_meta (level, version)
+        SELECT DISTINCT level, 1 FROM challenge_results WHERE true
+        ON CONFLICT(level) DO UPDATE SET version = version + 1
+    """)
+    return statements
+
+
+def validate_board(scope: str, period: str):
+    """Confere escopo e período do ranking (ValueError se desconhecidos)"""
+    if scope not in SCOPES:
+        raise ValueError(f"Escopo de ranking inválido: {scope}")
+    if period not in PERIODS:
+        raise ValueError(f"Período de ranking inválido: {period}")
+
+
+def period_key(period: str, created_at: str) -> str:
+    """Chave do quadro do período para um timestamp 'YYYY-MM-DD HH:MM:SS' (UTC)"""
+    if period == 'all':
+        return ''
+    day = datetime.strptime(created_at[:10], '%Y-%m-%d').date()
+    if period == 'weekly':
+        day -= timedelta(days=day.weekday())
+    return day.isoformat()
+
+
+def _rank_key(entry: Tuple) -> Tuple:
+    # entry = (result_id, user_id, words_completed, score, words_per_minute, time_taken, created_at)
+    return (-entry[3], -entry[2], entry[5], entry[0])
+
+
+def merge_entry(board: List[Tuple], entry: Tuple, scope: str, size: int = LEADERBOARD_SIZE) -> List[Tuple]:
+    """
+    Novo conteúdo do quadro após a chegada de ``entry``
+
+    No escopo 'best' a entrada só substitui a do mesmo usuário se for melhor.
+    """
+    if scope == 'best':
+        current = next((row for row in board if row[1] == entry[1]), None)
+        if current is not None:
+            if _rank_key(entry) >= _rank_key(current):
+                return board
+            board = [row for row in board if row is not current]
+
+    if len(board) >= size and _rank_key(entry) >= _rank_key(board[-1]):
+        return board
+    return sorted(board + [entry], key=_rank_key)[:size]
+
+
+def record_result(cursor, level: str, entry: Tuple, size: int = LEADERBOARD_SIZE) -> bool:
+    """
+    Atualiza os quadros do nível com um novo resultado (na transação do chamador)
+
+    Lê no máximo ``size`` linhas por quadro pela chave primária, então o custo
+    não depende do tamanho do histórico.
+
+    Returns:
+        True se algum quadro mudou
+    """
+    created_at = entry[6]
+    changed = False
+
+    for period in PERIODS:
+        key = period_key(period, created_at)
+        for scope in SCOPES:
+            cursor.execute(f'''
+                SELECT {_ENTRY_COLUMNS} FROM challenge_leaderboard
+                WHERE level = ? AND scope = ? AND period = ? AND period_key = ?
+            ''', (level, scope, period, key))
+            board = sorted((tuple(row) for row in cursor.fetchall()), key=_rank_key)
+            merged = merge_entry(board, entry, scope, size)
+            if merged is board:
+                continue
+
+            removed = {row[0] for row in board} - {row[0] for row in merged}
+            for result_id in removed:
+                cursor.execute('''
+                    DELETE FROM challenge_leaderboard
+                    WHERE level = ? AND scope = ? AND period = ? AND period_key = ? AND result_id = ?
+                ''', (level, scope, period, key, result_id))
+            if entry[0] in {row[0] for row in merged}:
+                cursor.execute(f'''
+                    INSERT INTO challenge_leaderboard (level, scope, period, period_key, {_ENTRY_COLUMNS})
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (level, scope, period, key) + tuple(entry))
+            changed = True
+
+    for period, days in PERIOD_RETENTION_DAYS.items():
+        cutoff = period_key(period, created_at)
+        cutoff = (datetime.strptime(cutoff, '%Y-%m-%d') - timedelta(days=days)).strftime('%Y-%m-%d')
+        for scope in SCOPES:
+            cursor.execute('''
+                DELETE FROM challenge_leaderboard
+                WHERE level = ? AND scope = ? AND period = ? AND period_key < ?
+            ''', (level, scope, period, cutoff))
+
+    if changed:
+        cursor.execute('''
+            INSERT INTO challenge_leaderboard_meta (level, version) VALUES (?, 1)
+            ON CONFLICT(level) DO UPDATE SET version = version + 1
+        ''', (level,))
+    return changed
+
+
+class Leaderboard:
+    """
+    Cópia em memória dos quadros do ranking
+
+    Cada quadro é uma tupla imutável trocada por inteiro; uma leitura custa
+    uma consulta pela chave primária em challenge_leaderboard_meta e, só
+    quando a versão do nível mudou (inclusive por outro processo), a releitura
+    das até LEADERBOARD_SIZE linhas do quadro.
+    """
+
+    def __init__(self, size: int = LEADERBOARD_SIZE):
+        self.size = size
+        self._boards: Dict[Tuple[str, str, str, str], Tuple[int, Tuple[Dict[str, Any], ...]]] = {}
+        self._lock = threading.Lock()
+
+    def top(self, conn, level: str, limit: int = 10, scope: str = 'all', period: str = 'all',
+            now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Ranking de um nível
+
+        Raises:
+            ValueError: Escopo ou período desconhecido
+        """
+        validate_board(scope, period)
+        timestamp = (now or datetime.utcnow()).strftime('%Y-%m-%d %H:%M:%S')
+        board_id = (level, scope, period, period_key(period, timestamp))
+
+        row = conn.execute('SELECT version FROM challenge_leaderboard_meta WHERE level = ?', (level,)).fetchone()
+        version = row[0] if row else 0
+
+        cached = self._boards.get(board_id)
+        if cached is None or cached[0] != version:
+            cached = (version, self._load(conn, board_id))
+            with self._lock:
+                self._boards[board_id] = cached
+
+        return [dict(entry) for entry in cached[1][:max(0, min(int(limit), self.size))]]
+
+    def _load(self, conn, board_id) -> Tuple[Dict[str, Any], ...]:
+        rows = conn.execute('''
+            SELECT u.username, lb.words_completed, lb.score, lb.words_per_minute, lb.time_taken, lb.created_at,
+                   lb.result_id
+            FROM challenge_leaderboard lb
+            JOIN users u ON lb.user_id = u.id
+            WHERE lb.level = ? AND lb.scope = ? AND lb.period = ? AND lb.period_key = ?
+        ''', board_id).fetchall()
+        rows.sort(key=lambda r: (-r[2], -r[1], r[4], r[6]))
+
+        return tuple(
+            {
+                'position': i,
+                'username': row[0],
+                'words_completed': row[1],
+                'score': row[2],
+                'words_per_minute': round(row[3] or 0, 1),
+                'time_taken': row[4],
+                'date': (row[5] or '')[:10]  # Apenas data, sem hora
+            }
+            for i, row in enumerate(rows, 1)
+        )
+
+    def invalidate(self):
+        with self._lock:
+            self._boards = {}
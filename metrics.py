@@ -0,0 +1,245 @@
+"""
+Instrumentação de latência exposta no formato texto do Prometheus (/metrics)
+Contadores e histogramas simples, sem dependências externas
+
+Com vários processos (gunicorn), defina METRICS_DIR: cada processo grava
+periodicamente um snapshot <pid>.json nesse diretório e /metrics soma os
+snapshots de todos os workers, não só do que atendeu a requisição.
+"""
+
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+# Limites (segundos) dos buckets: de consultas ao banco até treinamentos
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                   30.0, 60.0, 300.0)
+PERSIST_INTERVAL = float(os.environ.get('METRICS_PERSIST_INTERVAL', 5))
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Dict[str, object]) -> LabelSet:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    Contadores e histogramas do processo atual
+
+    Após um fork o processo filho começa do zero (o que foi medido no mestre
+    continua contado apenas no snapshot do mestre).
+    """
+
+    def __init__(self, metrics_dir: Optional[str] = None):
+        self.metrics_dir = metrics_dir
+        self._lock = threading.Lock()
+        self._definitions = {}  # nome -> (tipo, ajuda, buckets)
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}    # (nome, labels) -> valor
+        self._histograms = {}  # (nome, labels) -> [contagens por bucket, soma, total]
+        self._persisted_at = 0.0
+
+    def counter(self, name: str, help_text: str):
+        self._definitions[name] = ('counter', help_text, None)
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._definitions[name] = ('histogram', help_text, tuple(sorted(buckets)))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._maybe_persist()
+
+    def observe(self, name: str, seconds: float, **labels):
+        buckets = self._definitions[name][2]
+        key = (name, _labels_key(labels))
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            index = bisect_left(buckets, seconds)
+            if index < len(buckets):
+                state[0][index] += 1
+            state[1] += seconds
+            state[2] += 1
+        self._maybe_persist()
+
+    # ------------------------------------------------------------------
+    # Snapshots entre processos
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, list]:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            return {
+                'counters': [[name, list(map(list, labels)), value]
+                             for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(map(list, labels)), list(state[0]), state[1], state[2]]
+                               for (name, labels), state in self._histograms.items()],
+            }
+
+    def _maybe_persist(self):
+        if self.metrics_dir and time.monotonic() - self._persisted_at >= PERSIST_INTERVAL:
+            self.persist()
+
+    def persist(self):
+        """Grava o snapshot deste processo em METRICS_DIR/<pid>.json (troca atômica)"""
+        if not self.metrics_dir:
+            return
+        self._persisted_at = time.monotonic()
+        try:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.metrics_dir, prefix='.metrics-', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, os.path.join(self.metrics_dir, f'{os.getpid()}.json'))
+        except OSError as e:
+            print(f"⚠️ Erro ao gravar snapshot de métricas: {e}")
+
+    def _collect(self):
+        """Snapshots de todos os processos (o deste, ao vivo, mais os arquivos dos outros)"""
+        snapshots = [self.snapshot()]
+        if self.metrics_dir and os.path.isdir(self.metrics_dir):
+            own_file = f'{os.getpid()}.json'
+            for name in os.listdir(self.metrics_dir):
+                if not name.endswith('.json') or name == own_file:
+                    continue
+                try:
+                    with open(os.path.join(self.metrics_dir, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    # ------------------------------------------------------------------
+    # Formato texto do Prometheus
+    # ------------------------------------------------------------------
+
+    def render(self) -> str:
+        counters = {}
+        histograms = {}
+        for snapshot in self._collect():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, bucket_counts, total, count in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                state = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0, 0])
+                if len(state[0]) != len(bucket_counts):
+                    continue  # Buckets mudaram entre versões do processo
+                state[0] = [a + b for a, b in zip(state[0], bucket_counts)]
+                state[1] += total
+                state[2] += count
+
+        lines = []
+        for name, (kind, help_text, buckets) in sorted(self._definitions.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+
+            for (metric, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, bucket_counts):
+                    cumulative += bucket_count
+                    bucket_labels = labels + (('le', _format_value(bound)),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry(os.environ.get('METRICS_DIR') or None)
+
+REGISTRY.counter('libras_http_requests_total', 'Requisições HTTP atendidas')
+REGISTRY.histogram('libras_http_request_duration_seconds', 'Latência das requisições HTTP por rota')
+REGISTRY.histogram('libras_recognition_stage_seconds', 'Tempo de cada etapa do reconhecimento híbrido')
+REGISTRY.histogram('libras_db_call_seconds', 'Tempo das chamadas ao LibrasDatabase')
+REGISTRY.histogram('libras_ml_training_seconds', 'Duração dos treinamentos de modelos de ML')
+REGISTRY.counter('libras_recognition_cache_total', 'Consultas ao cache de reconhecimento (hit/miss)')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def inc(name: str, value: float = 1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, seconds: float, **labels):
+    REGISTRY.observe(name, seconds, **labels)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Mede o bloco e registra no histograma ``name`` (também quando há exceção)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - started, **labels)
+
+
+def instrument_methods(cls, name: str, exclude: Iterable[str] = ()):
+    """Envolve os métodos públicos de ``cls`` com um timer (label ``method``)"""
+    exclude = set(exclude)
+    for attr, func in list(vars(cls).items()):
+        if attr.startswith('_') or attr in exclude or not callable(func):
+            continue
+
+        def wrap(func, method):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with timer(name, method=method):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        setattr(cls, attr, wrap(func, attr))
+    return cls
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def persist():
+    REGISTRY.persist()
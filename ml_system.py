@@ -1,10 +1,18 @@
-import sqlite3
 import numpy as np
-import json
-import pickle
 import os
+import shutil
 from datetime import datetime
 import logging
+import threading
+import time
+
+import metrics
+from model_registry import ModelRegistry, ModelSnapshot
+from landmark_codec import LANDMARK_COLUMNS, decode_many, migrate_column, to_db_value
+from retrain_scheduler import RetrainScheduler
+from schema_migrations import apply_migrations
+from sqlite_factory import connect as connect_sqlite
+from training_queue import TrainingQueue
 
 # Tentar importar sklearn, mas continuar sem ML se não disponível
 try:
@@ -19,29 +27,82 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+MODEL_MODE_PER_LETTER = "per_letter"  # Um RandomForest one-vs-rest por letra
+MODEL_MODE_MULTICLASS = "multiclass"  # Um único classificador para todas as letras
+MODEL_MODES = (MODEL_MODE_PER_LETTER, MODEL_MODE_MULTICLASS)
+MULTICLASS_KEY = "*"  # Identificador do modelo multiclasse no histórico de treinamento
+
+# Migrações versionadas do banco de ML (ver schema_migrations.py)
+ML_MIGRATIONS = [
+    (1, "Índices de exemplos e histórico de treinamento", [
+        "CREATE INDEX IF NOT EXISTS idx_examples_letter_created ON gesture_examples (letter, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_training_history_letter ON model_training_history (letter, created_at)",
+        "ANALYZE",
+    ]),
+]
+
 class LibrasMLSystem:
     """Sistema de Machine Learning para melhorar reconhecimento de gestos LIBRAS"""
     
-    def __init__(self, db_path="libras_ml.db", models_path="ml_models"):
+    def __init__(self, db_path="libras_ml.db", models_path="ml_models", model_mode=None, async_training=None,
+                 retrain_scheduler=None):
         self.db_path = db_path
         self.models_path = models_path
-        self.models = {}
-        self.scalers = {}
+        # Modo inicial; depois de uma migração vale o modo gravado no manifesto do registro
+        model_mode = model_mode or os.environ.get('ML_MODEL_MODE', MODEL_MODE_PER_LETTER)
+        if model_mode not in MODEL_MODES:
+            raise ValueError(f"Modo de modelo inválido: {model_mode} (use {', '.join(MODEL_MODES)})")
+        self.model_mode = model_mode
+        self._snapshot = ModelSnapshot()  # Modelos ativos - substituídos por referência, nunca alterados
+        self._snapshot_checked_at = 0.0
+        self._manifest_mtime = 0
+        self.registry_poll_interval = float(os.environ.get('ML_REGISTRY_POLL_INTERVAL', 5))
+        self.registry = None
         self.sklearn_available = SKLEARN_AVAILABLE
         
+        # Retreinos disparados pela coleta rodam em segundo plano por padrão
+        if async_training is None:
+            async_training = os.environ.get('ML_ASYNC_TRAINING', '1').lower() not in ('0', 'false', 'no')
+        self.async_training = async_training
+        self.training_queue = TrainingQueue(self._run_training_job)
+        self._training_lock = threading.RLock()
+        self.retrain_scheduler = retrain_scheduler or RetrainScheduler.from_env()
+        
         if not self.sklearn_available:
             print("⚠️ ML System inicializado sem scikit-learn - apenas coleta de dados")
             return
         
         # Criar diretório para modelos
         os.makedirs(models_path, exist_ok=True)
+        self.registry = ModelRegistry(models_path)
         
         self.init_ml_database()
         self.load_existing_models()
+        self._seed_retrain_scheduler()
+    
+    @property
+    def models(self):
+        return self._snapshot.models
+    
+    @property
+    def scalers(self):
+        return self._snapshot.scalers
+    
+    @property
+    def multiclass_model(self):
+        return self._snapshot.multiclass_model
+    
+    @property
+    def multiclass_scaler(self):
+        return self._snapshot.multiclass_scaler
+    
+    @property
+    def model_version(self):
+        return self._snapshot.version
     
     def init_ml_database(self):
         """Inicializa banco de dados para Machine Learning"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_sqlite(self.db_path)
         cursor = conn.cursor()
         
         # Tabela para armazenar exemplos de gestos
@@ -86,23 +147,23 @@ class LibrasMLSystem:
         ''')
         
         conn.commit()
+        
+        apply_migrations(conn, ML_MIGRATIONS)
         conn.close()
         print(f"Banco de dados ML inicializado: {self.db_path}")
     
     def collect_gesture_example(self, letter, landmarks, user_id=None, confidence=None, source="game"):
         """Coleta exemplo de gesto durante o uso"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_sqlite(self.db_path)
         cursor = conn.cursor()
         
         try:
-            # Converter landmarks para JSON
-            landmarks_json = json.dumps(landmarks)
-            
+            # Landmarks gravados como BLOB float32 (ver landmark_codec)
             cursor.execute('''
                 INSERT INTO gesture_examples 
                 (letter, landmarks, user_id, confidence, source)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (letter, landmarks_json, user_id, confidence, source))
+            ''', (letter, to_db_value(landmarks), user_id, confidence, source))
             
             example_id = cursor.lastrowid
             conn.commit()
@@ -122,17 +183,15 @@ class LibrasMLSystem:
     
     def add_user_feedback(self, user_id, predicted_letter, actual_letter, confidence, landmarks, feedback_type="correction"):
         """Adiciona feedback do usuário para melhorar o modelo"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_sqlite(self.db_path)
         cursor = conn.cursor()
         
         try:
-            landmarks_json = json.dumps(landmarks)
-            
             cursor.execute('''
                 INSERT INTO user_feedback 
                 (user_id, predicted_letter, actual_letter, confidence, landmarks, feedback_type)
                 VALUES (?, ?, ?, ?, ?, ?)
-            ''', (user_id, predicted_letter, actual_letter, confidence, landmarks_json, feedback_type))
+            ''', (user_id, predicted_letter, actual_letter, confidence, to_db_value(landmarks), feedback_type))
             
             feedback_id = cursor.lastrowid
             conn.commit()
@@ -152,27 +211,62 @@ class LibrasMLSystem:
         finally:
             conn.close()
     
-    def _check_retrain_needed(self, letter, min_examples=10):
-        """Verifica se há exemplos suficientes para retreinar o modelo"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Contar exemplos para a letra
-        cursor.execute('''
-            SELECT COUNT(*) FROM gesture_examples 
-            WHERE letter = ? AND created_at > datetime('now', '-7 days')
-        ''', (letter,))
-        
-        recent_count = cursor.fetchone()[0]
-        conn.close()
-        
-        if recent_count >= min_examples:
-            print(f"Retreinamento necessário para letra {letter}: {recent_count} novos exemplos")
-            self.train_letter_model(letter)
+    def _training_key(self, letter):
+        """Chave de treinamento: a letra, ou o modelo único no modo multiclasse"""
+        return MULTICLASS_KEY if self.model_mode == MODEL_MODE_MULTICLASS else letter
+    
+    def _seed_retrain_scheduler(self):
+        """Carrega os contadores de exemplos novos a partir do histórico de treinamento"""
+        conn = connect_sqlite(self.db_path)
+        try:
+            shared_key = MULTICLASS_KEY if self.model_mode == MODEL_MODE_MULTICLASS else None
+            self.retrain_scheduler.seed(conn, shared_key)
+        finally:
+            conn.close()
+    
+    def _check_retrain_needed(self, letter):
+        """Verifica se há exemplos novos suficientes para retreinar o modelo (sem consultar o banco)"""
+        key = self._training_key(letter)
+        if self.retrain_scheduler.record_example(key):
+            print(f"Retreinamento agendado para {key}")
+            self.schedule_training(letter)
+    
+    def schedule_training(self, letter):
+        """
+        Agenda o retreinamento de uma letra
+        
+        Com treinamento assíncrono a requisição apenas enfileira o job; no modo
+        multiclasse todas as letras compartilham o mesmo job.
+        """
+        if not self.async_training:
+            success = self.train_letter_model(letter)
+            if not success:
+                self.retrain_scheduler.mark_failed(self._training_key(letter))
+            return success
+        
+        return self.training_queue.enqueue(self._training_key(letter))
+    
+    def _run_training_job(self, key):
+        """Executado pela thread da fila de treinamento"""
+        if key == MULTICLASS_KEY:
+            success = self.train_multiclass_model()
+        else:
+            success = self.train_letter_model(key)
+        
+        if not success:
+            self.retrain_scheduler.mark_failed(key)
+        return success
+    
+    def get_training_status(self):
+        """Estado da fila de treinamento em segundo plano"""
+        status = self.training_queue.get_status()
+        status['async'] = self.async_training
+        status['scheduler'] = self.retrain_scheduler.get_status()
+        return status
     
     def prepare_training_data(self, letter):
         """Prepara dados de treinamento para uma letra específica"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_sqlite(self.db_path)
         cursor = conn.cursor()
         
         # Buscar exemplos positivos (letra correta)
@@ -181,13 +275,8 @@ class LibrasMLSystem:
             WHERE letter = ?
         ''', (letter,))
         
-        positive_examples = []
-        for row in cursor.fetchall():
-            landmarks = json.loads(row[0])
-            # Converter para array flat de 63 features (21 pontos x 3 coordenadas)
-            features = self._landmarks_to_features(landmarks)
-            if features is not None:
-                positive_examples.append(features)
+        # Array flat de 63 features (21 pontos x 3 coordenadas) direto dos BLOBs
+        positive_examples = decode_many(row[0] for row in cursor.fetchall()).reshape(-1, 63)
         
         # Buscar exemplos negativos (outras letras)
         cursor.execute('''
@@ -197,12 +286,7 @@ class LibrasMLSystem:
             LIMIT ?
         ''', (letter, len(positive_examples) * 2))  # 2x mais exemplos negativos
         
-        negative_examples = []
-        for row in cursor.fetchall():
-            landmarks = json.loads(row[0])
-            features = self._landmarks_to_features(landmarks)
-            if features is not None:
-                negative_examples.append(features)
+        negative_examples = decode_many(row[0] for row in cursor.fetchall()).reshape(-1, 63)
         
         conn.close()
         
@@ -211,10 +295,10 @@ class LibrasMLSystem:
             return None, None
         
         # Preparar datasets
-        X_positive = np.array(positive_examples)
+        X_positive = positive_examples
         y_positive = np.ones(len(positive_examples))
         
-        X_negative = np.array(negative_examples)
+        X_negative = negative_examples
         y_negative = np.zeros(len(negative_examples))
         
         # Combinar dados
@@ -241,10 +325,25 @@ class LibrasMLSystem:
     
     def train_letter_model(self, letter):
         """Treina modelo específico para uma letra"""
+        # No modo multiclasse, um novo exemplo de qualquer letra retreina o modelo único
+        # (medido como kind='multiclass' em train_multiclass_model)
+        if self.model_mode == MODEL_MODE_MULTICLASS:
+            return self.train_multiclass_model()
+        
+        # Um treinamento por vez neste processo (fila e rotas de administração);
+        # entre processos o lock do registro ordena as versões publicadas
+        with self._training_lock:
+            started = time.perf_counter()
+            success = self._train_letter_model(letter)
+            metrics.observe('libras_ml_training_seconds', time.perf_counter() - started,
+                            kind='letter', outcome='success' if success else 'failure')
+            return success
+    
+    def _train_letter_model(self, letter):
         if not self.sklearn_available:
             print("❌ Sklearn não disponível - não é possível treinar modelos")
             return False
-            
+        
         print(f"Iniciando treinamento para letra {letter}...")
         
         start_time = datetime.now()
@@ -277,19 +376,11 @@ class LibrasMLSystem:
             y_pred = model.predict(X_test_scaled)
             accuracy = accuracy_score(y_test, y_pred)
             
-            # Salvar modelo e scaler
-            model_path = os.path.join(self.models_path, f"model_{letter}.pkl")
-            scaler_path = os.path.join(self.models_path, f"scaler_{letter}.pkl")
-            
-            with open(model_path, 'wb') as f:
-                pickle.dump(model, f)
-            
-            with open(scaler_path, 'wb') as f:
-                pickle.dump(scaler, f)
-            
-            # Carregar modelo em memória
-            self.models[letter] = model
-            self.scalers[letter] = scaler
+            # Publicar nova versão no registro e trocar o snapshot em memória
+            self._commit_models(
+                {f"model_{letter}.pkl": model, f"scaler_{letter}.pkl": scaler},
+                {'trained': [letter], 'accuracy': accuracy, 'examples': len(X)}
+            )
             
             # Salvar histórico de treinamento
             training_time = (datetime.now() - start_time).total_seconds()
@@ -302,9 +393,141 @@ class LibrasMLSystem:
             print(f"❌ Erro no treinamento do modelo {letter}: {e}")
             return False
     
+    def prepare_multiclass_training_data(self, min_examples=5):
+        """Prepara dados de todas as letras com pelo menos ``min_examples`` exemplos"""
+        conn = connect_sqlite(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT letter, landmarks FROM gesture_examples
+            WHERE letter IN (
+                SELECT letter FROM gesture_examples
+                GROUP BY letter HAVING COUNT(*) >= ?
+            )
+        ''', (min_examples,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        points, valid = decode_many((row[1] for row in rows), with_index=True)
+        features = points.reshape(-1, 63)
+        labels = [rows[i][0] for i in valid]
+        
+        if len(set(labels)) < 2:
+            print(f"Letras insuficientes para o modelo multiclasse: {len(set(labels))}")
+            return None, None
+        
+        print(f"Dados multiclasse preparados: {len(labels)} exemplos, {len(set(labels))} letras")
+        return features, np.array(labels)
+    
+    def train_multiclass_model(self, min_examples=5):
+        """Treina um único classificador multiclasse com um scaler compartilhado"""
+        with self._training_lock:
+            started = time.perf_counter()
+            success = self._train_multiclass_model(min_examples)
+            metrics.observe('libras_ml_training_seconds', time.perf_counter() - started,
+                            kind='multiclass', outcome='success' if success else 'failure')
+            return success
+    
+    def _train_multiclass_model(self, min_examples):
+        if not self.sklearn_available:
+            print("❌ Sklearn não disponível - não é possível treinar modelos")
+            return False
+        
+        print("Iniciando treinamento do modelo multiclasse...")
+        start_time = datetime.now()
+        
+        X, y = self.prepare_multiclass_training_data(min_examples)
+        if X is None:
+            return False
+        
+        try:
+            # Estratificar só é possível se todas as letras tiverem exemplos suficientes no teste
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=0.2, random_state=42,
+                stratify=y if len(y) * 0.2 >= len(set(y)) else None
+            )
+            
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
+            
+            model = RandomForestClassifier(
+                n_estimators=100,
+                random_state=42,
+                class_weight='balanced'
+            )
+            model.fit(X_train_scaled, y_train)
+            
+            accuracy = accuracy_score(y_test, model.predict(X_test_scaled))
+            
+            self._commit_models(
+                {"model_multiclass.pkl": model, "scaler_multiclass.pkl": scaler},
+                {'trained': [MULTICLASS_KEY], 'accuracy': accuracy, 'examples': len(X)}
+            )
+            
+            training_time = (datetime.now() - start_time).total_seconds()
+            self._save_training_history(MULTICLASS_KEY, len(X), accuracy, training_time)
+            
+            print(f"✅ Modelo multiclasse treinado com {len(model.classes_)} letras! Accuracy: {accuracy:.3f}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Erro no treinamento do modelo multiclasse: {e}")
+            return False
+    
+    def migrate_to_multiclass(self, min_examples=5):
+        """
+        Migra os modelos por letra para o modo multiclasse
+        
+        Os RandomForests one-vs-rest não podem ser combinados em um único
+        classificador, então o modelo multiclasse é treinado a partir dos
+        exemplos em gesture_examples e publicado como nova versão do registro
+        (a versão por letra continua disponível para rollback). Pickles soltos
+        do formato anterior ao registro são movidos para ml_models/legacy_per_letter.
+        
+        Returns:
+            Dict com o resultado da migração
+        """
+        if not self.train_multiclass_model(min_examples):
+            return {"success": False, "error": "Não foi possível treinar o modelo multiclasse"}
+        
+        legacy_dir = os.path.join(self.models_path, "legacy_per_letter")
+        archived = []
+        for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+            for prefix in ("model", "scaler"):
+                path = os.path.join(self.models_path, f"{prefix}_{letter}.pkl")
+                if os.path.exists(path):
+                    os.makedirs(legacy_dir, exist_ok=True)
+                    shutil.move(path, os.path.join(legacy_dir, os.path.basename(path)))
+                    archived.append(os.path.basename(path))
+        
+        # Gravado no manifesto: os outros workers trocam de modo ao recarregar o registro
+        self.registry.set_model_mode(MODEL_MODE_MULTICLASS)
+        self.reload_models()
+        
+        print(f"✅ Migração para multiclasse concluída: {len(archived)} arquivos arquivados")
+        return {
+            "success": True,
+            "letters": [str(letter) for letter in self.multiclass_model.classes_],
+            "archived_files": archived
+        }
+    
+    def migrate_landmark_storage(self):
+        """Converte os landmarks em JSON de gesture_examples e user_feedback para BLOB float32"""
+        conn = connect_sqlite(self.db_path)
+        try:
+            return {
+                f"{table}.{column}": migrate_column(conn, table, column)
+                for table, column in LANDMARK_COLUMNS
+                if table in ('gesture_examples', 'user_feedback')
+            }
+        finally:
+            conn.close()
+    
     def _save_training_history(self, letter, examples_count, accuracy, training_time):
         """Salva histórico de treinamento"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_sqlite(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -315,24 +538,72 @@ class LibrasMLSystem:
         
         conn.commit()
         conn.close()
+        
+        self.retrain_scheduler.mark_trained(letter)
     
     def load_existing_models(self):
-        """Carrega modelos existentes"""
-        for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-            model_path = os.path.join(self.models_path, f"model_{letter}.pkl")
-            scaler_path = os.path.join(self.models_path, f"scaler_{letter}.pkl")
-            
-            if os.path.exists(model_path) and os.path.exists(scaler_path):
-                try:
-                    with open(model_path, 'rb') as f:
-                        self.models[letter] = pickle.load(f)
-                    
-                    with open(scaler_path, 'rb') as f:
-                        self.scalers[letter] = pickle.load(f)
-                    
-                    print(f"Modelo {letter} carregado")
-                except Exception as e:
-                    print(f"Erro ao carregar modelo {letter}: {e}")
+        """Carrega a versão ativa do registro (importando os pickles antigos na primeira vez)"""
+        self.registry.import_legacy()
+        self.reload_models()
+        
+        if self.model_mode == MODEL_MODE_MULTICLASS and self.multiclass_model is None and self.models:
+            print("⚠️ Modelo multiclasse não encontrado - usando modelos por letra até a migração")
+    
+    def reload_models(self):
+        """Recarrega a versão ativa do registro (e o modo gravado no manifesto) e troca o snapshot atomicamente"""
+        self._manifest_mtime = self.registry.manifest_mtime()
+        stored_mode = self.registry.model_mode()
+        if stored_mode in MODEL_MODES and stored_mode != self.model_mode:
+            print(f"🔀 Modo dos modelos alterado para {stored_mode} pelo registro")
+            self.model_mode = stored_mode
+            # As chaves de retreinamento mudam junto com o modo (na inicialização o __init__ já semeia)
+            if self._snapshot_checked_at:
+                self._seed_retrain_scheduler()
+        
+        snapshot = self.registry.load().for_mode(self.model_mode == MODEL_MODE_MULTICLASS)
+        self._snapshot = snapshot
+        self._snapshot_checked_at = datetime.now().timestamp()
+        
+        if snapshot.version:
+            print(f"Modelos carregados da versão {snapshot.version} ({len(snapshot)} modelos)")
+        return snapshot.version
+    
+    def _commit_models(self, artifacts, metadata):
+        """Publica artefatos como nova versão e ativa o snapshot correspondente"""
+        version = self.registry.commit(artifacts, metadata=metadata)
+        self.reload_models()
+        return version
+    
+    def _current_snapshot(self):
+        """
+        Snapshot ativo, conferindo periodicamente se outro processo promoveu uma versão
+        
+        Leitores não usam lock: a troca de self._snapshot é uma atribuição de referência.
+        """
+        now = datetime.now().timestamp()
+        if self.registry is not None and now - self._snapshot_checked_at >= self.registry_poll_interval:
+            self._snapshot_checked_at = now
+            if self.registry.manifest_mtime() != self._manifest_mtime:
+                self.reload_models()
+        return self._snapshot
+    
+    def active_model_version(self):
+        """Versão ativa dos modelos, conferindo se outro processo promoveu uma nova"""
+        return self._current_snapshot().version
+    
+    def rollback_models(self, version=None):
+        """Volta para a versão anterior (ou para ``version``) do registro"""
+        with self._training_lock:
+            version = self.registry.rollback(version)
+            self.reload_models()
+        print(f"↩️ Modelos revertidos para a versão {version}")
+        return version
+    
+    def get_model_versions(self):
+        """Versões de modelo disponíveis no registro"""
+        if self.registry is None:
+            return []
+        return self.registry.list_versions()
     
     def predict_letter(self, landmarks, return_probabilities=False):
         """Prediz letra usando modelos ML"""
@@ -344,11 +615,20 @@ class LibrasMLSystem:
             return None, 0.0
         
         predictions = {}
+        snapshot = self._current_snapshot()
         
-        for letter, model in self.models.items():
+        if snapshot.multiclass_model is not None:
+            # Uma única chamada de transform + predict_proba para todas as letras
+            try:
+                probs = snapshot.multiclass_model.predict_proba(snapshot.multiclass_scaler.transform([features]))[0]
+                predictions = {str(letter): float(p) for letter, p in zip(snapshot.multiclass_model.classes_, probs)}
+            except Exception as e:
+                print(f"Erro na predição multiclasse: {e}")
+        
+        for letter, model in snapshot.models.items():
             try:
                 # Normalizar features
-                scaler = self.scalers[letter]
+                scaler = snapshot.scalers[letter]
                 features_scaled = scaler.transform([features])
                 
                 # Fazer predição
@@ -373,9 +653,65 @@ class LibrasMLSystem:
         
         return best_letter, best_confidence
     
+    def predict_letters_batch(self, landmarks_list):
+        """
+        Prediz letras para vários frames de uma vez
+
+        Cada modelo recebe todos os frames em uma única chamada de
+        scaler.transform/predict_proba, em vez de uma chamada por frame.
+
+        Returns:
+            Lista de tuplas (letra, confiança) na mesma ordem dos frames
+        """
+        if not self.sklearn_available or not landmarks_list:
+            return [(None, 0.0)] * len(landmarks_list)
+
+        features = [self._landmarks_to_features(landmarks) for landmarks in landmarks_list]
+        valid = [i for i, f in enumerate(features) if f is not None]
+        results = [(None, 0.0)] * len(landmarks_list)
+        if not valid:
+            return results
+
+        X = np.vstack([features[i] for i in valid])
+        snapshot = self._current_snapshot()
+        
+        if snapshot.multiclass_model is not None:
+            try:
+                probabilities = snapshot.multiclass_model.predict_proba(snapshot.multiclass_scaler.transform(X))
+                best = np.argmax(probabilities, axis=1)
+                for row, frame_index in enumerate(valid):
+                    results[frame_index] = (str(snapshot.multiclass_model.classes_[best[row]]), float(probabilities[row, best[row]]))
+                return results
+            except Exception as e:
+                print(f"Erro na predição multiclasse: {e}")
+                return results
+        
+        letters = []
+        columns = []
+
+        for letter, model in snapshot.models.items():
+            try:
+                probs = model.predict_proba(snapshot.scalers[letter].transform(X))
+                columns.append(probs[:, 1] if probs.shape[1] > 1 else probs[:, 0])
+                letters.append(letter)
+            except Exception as e:
+                print(f"Erro na predição para {letter}: {e}")
+                continue
+
+        if not letters:
+            return results
+
+        # Matriz (frames, letras) - melhor letra por frame
+        probabilities = np.column_stack(columns)
+        best = np.argmax(probabilities, axis=1)
+        for row, frame_index in enumerate(valid):
+            results[frame_index] = (letters[best[row]], float(probabilities[row, best[row]]))
+
+        return results
+
     def get_model_stats(self):
         """Retorna estatísticas dos modelos"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_sqlite(self.db_path)
         cursor = conn.cursor()
         
         stats = {}
@@ -392,7 +728,7 @@ class LibrasMLSystem:
             letter, count = row
             stats[letter] = {
                 'examples': count,
-                'has_model': letter in self.models,
+                'has_model': letter in self.models or letter in self.trained_letters(),
                 'last_training': None,
                 'accuracy': None
             }
@@ -411,12 +747,27 @@ class LibrasMLSystem:
             if letter in stats:
                 stats[letter]['last_training'] = created_at
                 stats[letter]['accuracy'] = accuracy
+            elif letter == MULTICLASS_KEY:
+                # No modo multiclasse a accuracy é do modelo único, compartilhada pelas letras
+                for trained in self.trained_letters():
+                    if trained in stats:
+                        stats[trained]['last_training'] = created_at
+                        stats[trained]['accuracy'] = accuracy
         
         conn.close()
         return stats
     
+    def trained_letters(self):
+        """Letras cobertas pelo modelo multiclasse (vazio no modo por letra)"""
+        if self.multiclass_model is None:
+            return set()
+        return {str(letter) for letter in self.multiclass_model.classes_}
+    
     def train_all_models(self, min_examples=10):
         """Treina modelos para todas as letras com exemplos suficientes"""
+        if self.model_mode == MODEL_MODE_MULTICLASS:
+            return 1 if self.train_multiclass_model(min_examples) else 0
+        
         stats = self.get_model_stats()
         trained = 0
         
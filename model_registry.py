@@ -0,0 +1,387 @@
+"""
+Registro versionado dos modelos de Machine Learning
+Cada treinamento gera um diretório de versão imutável em ml_models/registry;
+a versão ativa é indicada por um manifesto trocado atomicamente (os.replace)
+
+Alterações do manifesto (commit, promote, rollback, prune) são feitas sob um
+lock exclusivo (fcntl.flock em manifest.lock): vários workers do gunicorn
+treinando letras diferentes não partem da mesma versão pai nem perdem versões
+
+Estrutura:
+    ml_models/registry/manifest.json
+    ml_models/registry/manifest.lock
+    ml_models/registry/versions/v0001/model_A.pkl, scaler_A.pkl, ...
+"""
+
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional
+
+# Lock entre processos (indisponível no Windows - lá só o lock entre threads vale)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+MULTICLASS_ARTIFACT = "multiclass"  # model_multiclass.pkl / scaler_multiclass.pkl
+_ARTIFACT_PATTERN = re.compile(r'^(model|scaler)_(\w+)\.pkl$')
+
+
+class ModelSnapshot:
+    """
+    Conjunto imutável de modelos carregados de uma versão do registro
+
+    Os leitores pegam a referência do snapshot atual uma vez por predição;
+    um novo treinamento cria outro snapshot em vez de alterar este.
+    """
+
+    __slots__ = ('version', 'models', 'scalers', 'multiclass_model', 'multiclass_scaler')
+
+    def __init__(self, version=None, models=None, scalers=None, multiclass_model=None, multiclass_scaler=None):
+        self.version = version
+        self.models = MappingProxyType(dict(models or {}))
+        self.scalers = MappingProxyType(dict(scalers or {}))
+        self.multiclass_model = multiclass_model
+        self.multiclass_scaler = multiclass_scaler
+
+    @classmethod
+    def from_artifacts(cls, version: Optional[str], artifacts: Dict[str, Any]) -> 'ModelSnapshot':
+        models = {}
+        scalers = {}
+        for name, obj in artifacts.items():
+            match = _ARTIFACT_PATTERN.match(name)
+            if match:
+                (models if match.group(1) == 'model' else scalers)[match.group(2)] = obj
+
+        multiclass_model = models.pop(MULTICLASS_ARTIFACT, None)
+        multiclass_scaler = scalers.pop(MULTICLASS_ARTIFACT, None)
+        if multiclass_model is None or multiclass_scaler is None:
+            multiclass_model = multiclass_scaler = None
+
+        # Um modelo por letra só é usado com o scaler correspondente
+        letters = set(models) & set(scalers)
+        return cls(
+            version,
+            {letter: models[letter] for letter in letters},
+            {letter: scalers[letter] for letter in letters},
+            multiclass_model,
+            multiclass_scaler
+        )
+
+    def for_mode(self, multiclass: bool) -> 'ModelSnapshot':
+        """
+        Snapshot com apenas os modelos usados no modo informado
+
+        No modo multiclasse os modelos por letra só são usados enquanto não
+        houver um modelo multiclasse treinado.
+        """
+        if multiclass and self.multiclass_model is not None:
+            return ModelSnapshot(self.version, None, None, self.multiclass_model, self.multiclass_scaler)
+        return ModelSnapshot(self.version, self.models, self.scalers)
+
+    def __len__(self) -> int:
+        return len(self.models) + (1 if self.multiclass_model is not None else 0)
+
+
+class ModelRegistry:
+    """
+    Registro de versões de modelos com promoção atômica e rollback
+
+    Args:
+        models_path: Diretório base dos modelos (ml_models)
+        keep_versions: Quantas versões manter em disco (as mais antigas são removidas)
+    """
+
+    def __init__(self, models_path: str = "ml_models", keep_versions: int = 10):
+        self.models_path = models_path
+        self.root = os.path.join(models_path, "registry")
+        self.versions_dir = os.path.join(self.root, "versions")
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self.lock_path = os.path.join(self.root, "manifest.lock")
+        self.keep_versions = max(2, keep_versions)
+
+        # Reentrante: commit chama promote, que chama prune, todos sob o mesmo lock
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Lock exclusivo do manifesto, entre threads e entre processos"""
+        with self._thread_lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+
+            with open(self.lock_path, 'a') as lock_file:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    if FCNTL_AVAILABLE:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Manifesto
+    # ------------------------------------------------------------------
+
+    def read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'current': None, 'history': [], 'versions': {}}
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        """Grava o manifesto em um arquivo temporário e troca com os.replace (atômico)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.manifest-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.manifest_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def current_version(self) -> Optional[str]:
+        return self.read_manifest().get('current')
+
+    def model_mode(self) -> Optional[str]:
+        """Modo dos modelos gravado no manifesto (None se nunca foi definido)"""
+        return self.read_manifest().get('model_mode')
+
+    def set_model_mode(self, mode: str):
+        """
+        Grava o modo dos modelos no manifesto
+
+        Todos os workers leem o modo daqui ao recarregar o registro, então a
+        troca vale para todos os processos e sobrevive a reinícios.
+        """
+        with self._locked():
+            manifest = self.read_manifest()
+            manifest['model_mode'] = mode
+            self._write_manifest(manifest)
+
+    def manifest_mtime(self) -> float:
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        manifest = self.read_manifest()
+        return [
+            dict(manifest['versions'][version], version=version, current=version == manifest.get('current'))
+            for version in sorted(manifest.get('versions', {}))
+        ]
+
+    # ------------------------------------------------------------------
+    # Escrita de versões
+    # ------------------------------------------------------------------
+
+    def _next_version_name(self) -> str:
+        existing = [int(name[1:]) for name in os.listdir(self.versions_dir) if re.match(r'^v\d+$', name)]
+        return f"v{(max(existing) + 1 if existing else 1):04d}"
+
+    def commit(self, artifacts: Dict[str, Any], drop: Iterable[str] = (), metadata: Optional[Dict[str, Any]] = None,
+               promote: bool = True) -> str:
+        """
+        Cria uma nova versão a partir da atual, substituindo ``artifacts``
+
+        Os arquivos não alterados da versão atual são reaproveitados por hard
+        link (ou cópia, se o sistema de arquivos não suportar). A versão é
+        montada em um diretório temporário e renomeada de uma vez, então
+        nenhum leitor vê uma versão pela metade.
+
+        Args:
+            artifacts: Nome do arquivo (ex.: model_A.pkl) -> objeto a serializar
+            drop: Arquivos da versão atual que não devem ser levados adiante
+            metadata: Informações extras gravadas no manifesto
+            promote: Tornar a nova versão a versão ativa (sob o mesmo lock do commit)
+
+        Returns:
+            Nome da nova versão
+        """
+        with self._locked():
+            manifest = self.read_manifest()
+            parent = manifest.get('current')
+            parent_dir = os.path.join(self.versions_dir, parent) if parent else None
+
+            staging = tempfile.mkdtemp(dir=self.versions_dir, prefix='.staging-')
+            try:
+                for name, obj in artifacts.items():
+                    with open(os.path.join(staging, name), 'wb') as f:
+                        pickle.dump(obj, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                if parent_dir and os.path.isdir(parent_dir):
+                    skip = set(artifacts) | set(drop)
+                    for name in os.listdir(parent_dir):
+                        if name in skip:
+                            continue
+                        source = os.path.join(parent_dir, name)
+                        target = os.path.join(staging, name)
+                        try:
+                            os.link(source, target)
+                        except OSError:
+                            shutil.copy2(source, target)
+
+                # Renomear o diretório completo; se outro processo pegou o nome, tentar o próximo
+                while True:
+                    version = self._next_version_name()
+                    try:
+                        os.rename(staging, os.path.join(self.versions_dir, version))
+                        break
+                    except OSError:
+                        if not os.path.exists(os.path.join(self.versions_dir, version)):
+                            raise
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+
+            manifest = self.read_manifest()
+            manifest.setdefault('versions', {})[version] = dict(
+                metadata or {},
+                parent=parent,
+                created_at=datetime.now().isoformat(),
+                files=sorted(os.listdir(os.path.join(self.versions_dir, version)))
+            )
+            self._write_manifest(manifest)
+
+            if promote:
+                self.promote(version)
+            return version
+
+    def promote(self, version: str):
+        """Torna ``version`` a versão ativa"""
+        with self._locked():
+            manifest = self.read_manifest()
+            if version not in manifest.get('versions', {}):
+                raise ValueError(f"Versão de modelo desconhecida: {version}")
+
+            manifest['current'] = version
+            history = manifest.setdefault('history', [])
+            if not history or history[-1] != version:
+                history.append(version)
+            self._write_manifest(manifest)
+            self.prune()
+
+    def rollback(self, version: Optional[str] = None) -> str:
+        """
+        Volta para ``version`` ou, se omitida, para a versão promovida antes da atual
+
+        Returns:
+            Versão ativa após o rollback
+        """
+        with self._locked():
+            manifest = self.read_manifest()
+            history = manifest.get('history', [])
+
+            if version is None:
+                if len(history) < 2:
+                    raise ValueError("Não há versão anterior para rollback")
+                history.pop()
+                version = history[-1]
+            elif version not in manifest.get('versions', {}):
+                raise ValueError(f"Versão de modelo desconhecida: {version}")
+            else:
+                history.append(version)
+
+            manifest['current'] = version
+            manifest['history'] = history
+            self._write_manifest(manifest)
+            return version
+
+    def prune(self):
+        """Remove as versões mais antigas que não estão no histórico recente"""
+        with self._locked():
+            manifest = self.read_manifest()
+            versions = sorted(manifest.get('versions', {}))
+            protected = set(manifest.get('history', [])[-self.keep_versions:])
+            protected.add(manifest.get('current'))
+
+            removable = [v for v in versions if v not in protected][:max(0, len(versions) - self.keep_versions)]
+            if not removable:
+                return
+
+            for version in removable:
+                manifest['versions'].pop(version, None)
+            manifest['history'] = [v for v in manifest.get('history', []) if v not in removable]
+            self._write_manifest(manifest)
+
+            for version in removable:
+                shutil.rmtree(os.path.join(self.versions_dir, version), ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def load(self, version: Optional[str] = None) -> ModelSnapshot:
+        """Carrega uma versão (a ativa, por padrão) em um snapshot imutável"""
+        version = version or self.current_version()
+        if not version:
+            return ModelSnapshot()
+
+        version_dir = os.path.join(self.versions_dir, version)
+        artifacts = {}
+        for name in sorted(os.listdir(version_dir)):
+            if not _ARTIFACT_PATTERN.match(name):
+                continue
+            try:
+                with open(os.path.join(version_dir, name), 'rb') as f:
+                    artifacts[name] = pickle.load(f)
+            except Exception as e:
+                print(f"Erro ao carregar {name} da versão {version}: {e}")
+
+        return ModelSnapshot.from_artifacts(version, artifacts)
+
+    def import_legacy(self) -> Optional[str]:
+        """
+        Importa os pickles soltos em ml_models/ (formato anterior ao registro) como primeira versão
+
+        Os arquivos originais não são alterados. Feito sob o lock do manifesto:
+        só o primeiro worker a iniciar importa.
+        """
+        with self._locked():
+            if self.current_version():
+                return None
+
+            names = [
+                name for name in os.listdir(self.models_path)
+                if _ARTIFACT_PATTERN.match(name) and os.path.isfile(os.path.join(self.models_path, name))
+            ]
+            if not names:
+                return None
+
+            artifacts = {}
+            for name in names:
+                try:
+                    with open(os.path.join(self.models_path, name), 'rb') as f:
+                        artifacts[name] = pickle.load(f)
+                except Exception as e:
+                    print(f"Erro ao importar {name}: {e}")
+
+            version = self.commit(artifacts, metadata={'source': 'legacy_import'})
+            print(f"📦 {len(artifacts)} arquivos de modelo importados para o registro ({version})")
+            return version
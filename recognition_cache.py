@@ -0,0 +1,161 @@
+"""
+Cache de resultados de reconhecimento para poses repetidas
+Uma mão parada gera landmarks quase idênticos em frames consecutivos: a chave
+é a mão normalizada quantizada em uma grade, então esses frames caem na mesma
+entrada e reutilizam o resultado híbrido (templates + modelos de ML)
+
+Com 63 coordenadas, basta uma perto da borda de uma célula para mudar a chave;
+por isso, quando a chave exata não existe, a mão também é comparada com as
+últimas poses guardadas (diferença máxima de até uma célula)
+
+A versão (templates, modelos) vale para o cache inteiro; o que só muda o
+formato da resposta (nível de detalhe, com ou sem ML) é uma variante dentro
+da chave de cada entrada, então tráfego misto não esvazia o cache
+
+Variáveis de ambiente (RecognitionCache.from_env):
+    RECOGNITION_CACHE            - '0' desativa o cache (padrão: ativado)
+    RECOGNITION_CACHE_RESOLUTION - tamanho da célula da grade, em unidades da mão
+                                   normalizada (padrão 0.05; menor = menos acertos)
+    RECOGNITION_CACHE_SIZE       - máximo de entradas (LRU, padrão 1024)
+    RECOGNITION_CACHE_TTL        - segundos de validade de uma entrada (padrão 30)
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+import metrics
+
+# Poses recentes conferidas por vizinhança quando a chave exata não existe
+RECENT_POSES = 8
+
+
+class RecognitionCache:
+    """
+    LRU com TTL de resultados indexados pela mão normalizada quantizada
+
+    Cada consulta informa a versão dos dados (templates, modelos): quando ela
+    muda, todas as entradas são descartadas de uma vez. ``variant`` separa
+    resultados da mesma mão que diferem só no formato (nível de detalhe...).
+    Resultados são copiados (deepcopy) na entrada e na saída: quem recebe
+    pode alterar o dict sem afetar o cache.
+
+    Args:
+        resolution: Tamanho da célula da grade de quantização
+        max_size: Número máximo de entradas
+        ttl: Segundos de validade de uma entrada (0 = sem expiração)
+    """
+
+    def __init__(self, resolution: float = 0.05, max_size: int = 1024, ttl: float = 30.0):
+        if resolution <= 0:
+            raise ValueError("Resolução do cache deve ser positiva")
+        self.resolution = float(resolution)
+        self.max_size = max(1, int(max_size))
+        self.ttl = max(0.0, float(ttl))
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (variante, chave) -> (resultado, gravado_em)
+        self._recent = deque(maxlen=RECENT_POSES)  # (mão normalizada, chave)
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['RecognitionCache']:
+        """Cria o cache com a configuração do ambiente; None se RECOGNITION_CACHE=0"""
+        if os.environ.get('RECOGNITION_CACHE', '1').lower() in ('0', 'false', 'no'):
+            return None
+        return cls(
+            resolution=float(os.environ.get('RECOGNITION_CACHE_RESOLUTION', 0.05)),
+            max_size=int(os.environ.get('RECOGNITION_CACHE_SIZE', 1024)),
+            ttl=float(os.environ.get('RECOGNITION_CACHE_TTL', 30)),
+        )
+
+    def key(self, normalized: np.ndarray) -> bytes:
+        """Chave da mão normalizada (21x3): coordenadas arredondadas para a grade"""
+        return np.rint(np.asarray(normalized, dtype=np.float32) / self.resolution).astype(np.int32).tobytes()
+
+    def _check_version(self, version: Hashable):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._recent.clear()
+            self._version = version
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl and time.monotonic() - entry[1] > self.ttl:
+            del self._entries[key]
+            return None
+        return entry
+
+    def _nearest_recent(self, normalized: np.ndarray, variant: Hashable):
+        """Entrada de uma pose recente a no máximo uma célula de distância em cada coordenada"""
+        for pose, key in reversed(self._recent):
+            if np.max(np.abs(pose - normalized)) <= self.resolution:
+                entry = self._live_entry((variant, key))
+                if entry is not None:
+                    return (variant, key), entry
+        return None, None
+
+    def get(self, normalized: np.ndarray, version: Hashable, variant: Hashable = None) -> Optional[Dict[str, Any]]:
+        """Resultado guardado para a mão na ``version`` atual (cópia independente) ou None"""
+        normalized = np.asarray(normalized, dtype=np.float32)
+        key = (variant, self.key(normalized))
+        with self._lock:
+            self._check_version(version)
+            entry = self._live_entry(key)
+            if entry is None:
+                key, entry = self._nearest_recent(normalized, variant)
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+        metrics.inc('libras_recognition_cache_total', result='hit' if entry else 'miss')
+        return copy.deepcopy(entry[0]) if entry else None
+
+    def put(self, normalized: np.ndarray, version: Hashable, result: Dict[str, Any], variant: Hashable = None):
+        normalized = np.asarray(normalized, dtype=np.float32)
+        pose_key = self.key(normalized)
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._check_version(version)
+            key = (variant, pose_key)
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            if not any(recent_key == pose_key for _, recent_key in self._recent):
+                self._recent.append((normalized, pose_key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._recent.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Contadores de acerto para /api/recognition_cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'resolution': self.resolution,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,112 @@
+"""
+Sessões de reconhecimento contínuo (streaming) de gestos Libras
+Cada conexão mantém uma janela de suavização no servidor e só emite um
+evento quando uma letra se estabiliza, como o prediction_buffer do cliente desktop
+"""
+
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+
+class RecognitionSession:
+    """
+    Janela de suavização temporal para um fluxo contínuo de landmarks
+
+    Args:
+        gesture_manager: GestureManager usado no reconhecimento
+        ml_system: Sistema de ML opcional
+        window: Número de frames considerados na votação
+        min_votes: Votos mínimos para uma letra ser considerada estável
+    """
+
+    def __init__(self, gesture_manager, ml_system=None, window: int = 5, min_votes: int = 3):
+        self.gesture_manager = gesture_manager
+        self.ml_system = ml_system
+        self.window = max(1, window)
+        self.min_votes = max(1, min(min_votes, self.window))
+
+        self._predictions = deque(maxlen=self.window)  # (letra ou None, confiança, método)
+        self._last_emitted = None
+        self.frames_processed = 0
+        self.events_emitted = 0
+        self.started_at = time.time()
+
+    def reset(self):
+        """Limpa a janela - a próxima letra estável será emitida mesmo se repetida"""
+        self._predictions.clear()
+        self._last_emitted = None
+
+    def push_frames(self, frames: List[Optional[List[Dict]]]) -> List[Dict[str, Any]]:
+        """
+        Processa um ou mais frames e retorna os eventos de letra gerados
+
+        Args:
+            frames: Lista de mãos (21 pontos); ``None`` indica frame sem mão
+
+        Returns:
+            Lista de eventos {"type": "letter", ...} (vazia se nada estabilizou)
+        """
+        events = []
+        pending = []
+
+        for frame in frames:
+            if frame:
+                pending.append(frame)
+                continue
+            # Frame sem mão: processar o que veio antes e reiniciar a janela
+            events.extend(self._recognize(pending))
+            pending = []
+            self.reset()
+
+        events.extend(self._recognize(pending))
+        return events
+
+    def _recognize(self, frames: List[List[Dict]]) -> List[Dict[str, Any]]:
+        if not frames:
+            return []
+
+        # Só a letra e a confiança entram na votação: sem similaridades por letra
+        results = self.gesture_manager.recognize_gesture_batch(frames, self.ml_system, detail='none')
+        self.frames_processed += len(frames)
+
+        events = []
+        for result in results:
+            self._predictions.append((result['final'], result['confidence'], result['method']))
+            event = self._stable_letter_event()
+            if event:
+                events.append(event)
+        return events
+
+    def _stable_letter_event(self) -> Optional[Dict[str, Any]]:
+        """Emite a letra majoritária da janela quando ela muda"""
+        votes = Counter(letter for letter, _, _ in self._predictions if letter)
+        if not votes:
+            return None
+
+        letter, count = votes.most_common(1)[0]
+        if count < self.min_votes or letter == self._last_emitted:
+            return None
+
+        matching = [(confidence, method) for l, confidence, method in self._predictions if l == letter]
+        methods = [method for _, method in matching]
+
+        self._last_emitted = letter
+        self.events_emitted += 1
+        return {
+            'type': 'letter',
+            'letter': letter,
+            'confidence': sum(confidence for confidence, _ in matching) / len(matching),
+            'method': max(set(methods), key=methods.count),
+            'votes': count,
+            'window': len(self._predictions)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'frames_processed': self.frames_processed,
+            'events_emitted': self.events_emitted,
+            'window': self.window,
+            'min_votes': self.min_votes,
+            'duration': time.time() - self.started_at
+        }
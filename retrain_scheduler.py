@@ -0,0 +1,163 @@
+"""
+Política de retreinamento do sistema de ML
+Conta em memória os exemplos novos desde o último treinamento de cada letra,
+para que a coleta de exemplos não precise consultar o banco a cada inserção
+"""
+
+import calendar
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+def _timestamp_to_epoch(value: Optional[str]) -> Optional[float]:
+    """Converte um CURRENT_TIMESTAMP do SQLite (UTC) em segundos desde a época"""
+    if not value:
+        return None
+    try:
+        return float(calendar.timegm(datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S').timetuple()))
+    except ValueError:
+        return None
+
+
+class RetrainScheduler:
+    """
+    Decide quando uma letra deve ser retreinada
+
+    Uma letra é retreinada quando acumula ``delta`` exemplos novos desde o
+    último treinamento e já passou ``min_interval`` segundos do último
+    disparo, ou quando tem qualquer exemplo novo e o último treinamento tem
+    mais de ``max_interval`` segundos (0 desativa essa janela).
+
+    Args:
+        delta: Exemplos novos necessários para disparar um treinamento
+        min_interval: Intervalo mínimo (s) entre treinamentos da mesma letra
+        max_interval: Idade máxima (s) de um modelo com exemplos pendentes
+    """
+
+    def __init__(self, delta: int = 10, min_interval: float = 60.0, max_interval: float = 0.0):
+        self.delta = max(1, int(delta))
+        self.min_interval = max(0.0, float(min_interval))
+        self.max_interval = max(0.0, float(max_interval))
+
+        self._lock = threading.Lock()
+        self._new_examples = {}   # letra -> exemplos desde o último treinamento
+        self._in_flight = {}      # letra -> exemplos cobertos pelo treinamento em andamento
+        self._last_trained = {}   # letra -> momento do último treinamento (ou disparo)
+        self.triggers = 0
+
+    @classmethod
+    def from_env(cls) -> 'RetrainScheduler':
+        """Cria o agendador a partir de ML_RETRAIN_DELTA / _MIN_INTERVAL / _MAX_INTERVAL"""
+        return cls(
+            delta=int(os.environ.get('ML_RETRAIN_DELTA', 10)),
+            min_interval=float(os.environ.get('ML_RETRAIN_MIN_INTERVAL', 60)),
+            max_interval=float(os.environ.get('ML_RETRAIN_MAX_INTERVAL', 0))
+        )
+
+    def seed(self, conn, shared_key: Optional[str] = None):
+        """
+        Inicializa os contadores a partir de model_training_history
+
+        Executado uma vez na inicialização de cada worker: conta os exemplos
+        de cada letra criados depois do último treinamento da sua chave. A
+        contagem é agregada no SQLite (uma linha por letra), sem trazer os
+        exemplos para o Python.
+
+        Args:
+            conn: Conexão SQLite com gesture_examples e model_training_history
+            shared_key: Chave de treinamento comum a todas as letras (modo
+                multiclasse); None quando cada letra é a própria chave
+        """
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT letter, MAX(created_at) FROM model_training_history GROUP BY letter
+        ''')
+        last_trained = dict(cursor.fetchall())
+
+        cursor.execute('''
+            SELECT e.letter, COUNT(*)
+            FROM gesture_examples e
+            LEFT JOIN (
+                SELECT letter, MAX(created_at) AS trained_at
+                FROM model_training_history
+                GROUP BY letter
+            ) t ON t.letter = COALESCE(?, e.letter)
+            WHERE t.trained_at IS NULL OR e.created_at > t.trained_at
+            GROUP BY e.letter
+        ''', (shared_key,))
+
+        new_examples = {}
+        for letter, count in cursor.fetchall():
+            key = shared_key or letter
+            new_examples[key] = new_examples.get(key, 0) + count
+
+        with self._lock:
+            self._new_examples = new_examples
+            self._in_flight = {}
+            self._last_trained = {
+                key: epoch for key, epoch in
+                ((key, _timestamp_to_epoch(value)) for key, value in last_trained.items())
+                if epoch is not None
+            }
+
+    def record_example(self, key: str) -> bool:
+        """
+        Conta um exemplo novo (sem acessar o banco)
+
+        Returns:
+            True se a letra deve ser retreinada agora
+        """
+        now = time.time()
+        with self._lock:
+            count = self._new_examples.get(key, 0) + 1
+            self._new_examples[key] = count
+
+            if key in self._in_flight:
+                return False
+
+            elapsed = now - self._last_trained.get(key, 0.0)
+            due = count >= self.delta and elapsed >= self.min_interval
+            if not due and self.max_interval and key in self._last_trained:
+                due = elapsed >= self.max_interval
+
+            if not due:
+                return False
+
+            self._in_flight[key] = count
+            self._new_examples[key] = 0
+            self._last_trained[key] = now
+            self.triggers += 1
+            return True
+
+    def mark_trained(self, key: str):
+        """Registra um treinamento bem-sucedido"""
+        with self._lock:
+            if self._in_flight.pop(key, None) is None:
+                # Treinamento manual: o modelo já cobre todos os exemplos
+                self._new_examples[key] = 0
+            self._last_trained[key] = time.time()
+
+    def mark_failed(self, key: str):
+        """Devolve os exemplos de um treinamento que falhou para o contador"""
+        with self._lock:
+            count = self._in_flight.pop(key, 0)
+            self._new_examples[key] = self._new_examples.get(key, 0) + count
+
+    def pending(self, key: str) -> int:
+        with self._lock:
+            return self._new_examples.get(key, 0)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'delta': self.delta,
+                'min_interval': self.min_interval,
+                'max_interval': self.max_interval,
+                'triggers': self.triggers,
+                'new_examples': {key: count for key, count in self._new_examples.items() if count},
+                'in_flight': list(self._in_flight)
+            }
@@ -0,0 +1,64 @@
+"""
+Migrações versionadas de schema para os bancos SQLite
+Cada banco registra em schema_migrations as versões já aplicadas, então
+cada migração roda uma única vez por arquivo
+"""
+
+import sqlite3
+from typing import List, Sequence, Tuple
+
+# (versão, descrição, comandos SQL)
+Migration = Tuple[int, str, Sequence[str]]
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: List[Migration]) -> List[int]:
+    """
+    Aplica, em ordem, as migrações ainda não registradas no banco
+
+    Cada migração roda em sua própria transação junto com o registro da versão.
+
+    Returns:
+        Versões aplicadas nesta chamada
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+    applied = {row[0] for row in conn.execute('SELECT version FROM schema_migrations')}
+    newly_applied = []
+
+    for version, description, statements in sorted(migrations, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        try:
+            # BEGIN explícito: o sqlite3 não abre transação sozinho antes de DDL
+            conn.execute('BEGIN')
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(
+                'INSERT INTO schema_migrations (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        newly_applied.append(version)
+        print(f"🔧 Migração {version} aplicada: {description}")
+
+    return newly_applied
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Maior versão de migração aplicada (0 se nenhuma)"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
@@ -0,0 +1,141 @@
+"""
+Templates normalizados compartilhados entre processos (vários workers do gunicorn)
+O processo que salva um gesto grava a matriz float32 (n, 21, 3) e o índice de
+letras em um arquivo; todos os workers mapeiam o arquivo em memória somente
+leitura, então existe uma única cópia em RAM e um template novo chega aos
+outros processos na próxima consulta (basta um os.stat para perceber a troca)
+
+Formato do arquivo (little-endian):
+    cabeçalho  - magic, formato, geração, versão dos dados, n, tamanho do índice
+    índice     - JSON {"source": banco de origem, "letters": [...]}
+    matriz     - n x 21 x 3 float32, alinhada em 16 bytes
+
+Variáveis de ambiente (SharedTemplateStore.from_env):
+    GESTURE_SHARED_TEMPLATES - caminho do arquivo; '1' usa <tmp>/libras-templates.bin
+                               (padrão: desativado, cada processo tem sua matriz)
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections import namedtuple
+from typing import List, Optional
+
+import numpy as np
+
+MAGIC = b'LBTP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sIQQII')  # magic, formato, geração, versão dos dados, n, bytes do índice
+ALIGNMENT = 16
+
+SharedTemplates = namedtuple('SharedTemplates', ['letters', 'templates', 'data_version', 'generation'])
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SharedTemplateStore:
+    """
+    Arquivo de templates mapeado em memória
+
+    ``publish`` grava um arquivo novo e o troca atomicamente (os.replace):
+    quem já mapeou a versão anterior continua lendo dados consistentes até
+    a próxima chamada de ``load``, que detecta a troca pelo os.stat.
+
+    Args:
+        path: Caminho do arquivo compartilhado
+        source: Identifica o banco de origem; arquivos de outro banco são ignorados
+    """
+
+    def __init__(self, path: str, source: str = ''):
+        self.path = path
+        self.source = source
+        self._lock = threading.Lock()
+        self._stat_key = None
+        self._current = None
+
+    @classmethod
+    def from_env(cls, source: str = '') -> Optional['SharedTemplateStore']:
+        """Cria o store se GESTURE_SHARED_TEMPLATES estiver definido; None caso contrário"""
+        path = os.environ.get('GESTURE_SHARED_TEMPLATES', '')
+        if path.lower() in ('', '0', 'false', 'no'):
+            return None
+        if path.lower() in ('1', 'true', 'yes'):
+            path = os.path.join(tempfile.gettempdir(), 'libras-templates.bin')
+        return cls(path, source=source)
+
+    def load(self) -> Optional[SharedTemplates]:
+        """Templates publicados (visão somente leitura do arquivo mapeado) ou None"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            if stat_key != self._stat_key:
+                self._current = self._map()
+                self._stat_key = stat_key
+            return self._current
+
+    def _map(self) -> Optional[SharedTemplates]:
+        try:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Erro ao mapear templates compartilhados: {e}")
+            return None
+
+        if len(mapped) < HEADER.size:
+            return None
+        magic, file_format, generation, data_version, count, index_size = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or file_format != FORMAT_VERSION:
+            print(f"⚠️ Arquivo de templates compartilhados inválido: {self.path}")
+            return None
+
+        index = json.loads(bytes(mapped[HEADER.size:HEADER.size + index_size]).decode('utf-8'))
+        if index.get('source') != self.source:
+            return None
+
+        offset = _aligned(HEADER.size + index_size)
+        templates = np.frombuffer(mapped, dtype='<f4', count=count * 63, offset=offset).reshape(count, 21, 3)
+        return SharedTemplates(index['letters'], templates, data_version, generation)
+
+    def publish(self, letters: List[str], templates: np.ndarray, data_version: int) -> Optional[SharedTemplates]:
+        """
+        Grava os templates como nova geração e devolve a visão mapeada
+
+        Não sobrescreve um arquivo com dados mais novos (versão dos dados maior),
+        publicado por outro processo enquanto este montava sua matriz.
+        """
+        templates = np.ascontiguousarray(templates, dtype='<f4').reshape(-1, 21, 3)
+        if len(letters) != len(templates):
+            raise ValueError("Número de letras diferente do número de templates")
+
+        current = self.load()
+        if current is not None and current.data_version > data_version:
+            return current
+        generation = current.generation + 1 if current is not None else 1
+
+        index = json.dumps({'source': self.source, 'letters': list(letters)}).encode('utf-8')
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, generation, data_version, len(letters), len(index))
+        padding = b'\0' * (_aligned(HEADER.size + len(index)) - HEADER.size - len(index))
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.templates-', suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header + index + padding)
+                f.write(templates.tobytes())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Erro ao publicar templates compartilhados: {e}")
+            return None
+
+        print(f"📤 Templates compartilhados publicados (geração {generation}, versão dos dados {data_version})")
+        return self.load()
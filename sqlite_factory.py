@@ -0,0 +1,80 @@
+"""
+Fábrica de conexões SQLite compartilhada
+Aplica o mesmo perfil de desempenho (WAL, synchronous=NORMAL, busy_timeout,
+mmap, cache) em LibrasDatabase, GestureManager e LibrasMLSystem
+
+Perfis (variável SQLITE_PROFILE):
+    tuned  - padrão; leitores não bloqueiam atrás de escritores e cada commit
+             não faz fsync completo
+    legacy - configuração padrão do SQLite (rollback journal), para comparação
+"""
+
+import os
+import sqlite3
+import threading
+
+PROFILES = {
+    'tuned': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,           # ms esperando um lock antes de SQLITE_BUSY
+        'mmap_size': 256 * 1024 * 1024,  # leituras via memória mapeada
+        'cache_size': -20000,           # ~20 MB de páginas em cache por conexão
+        'temp_store': 'MEMORY',
+    },
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+}
+
+CACHED_STATEMENTS = 256  # Cache de prepared statements por conexão (padrão do sqlite3: 128)
+
+_journal_ready = set()  # (caminho, modo) já configurados neste processo
+_journal_lock = threading.Lock()
+
+
+def current_profile():
+    return os.environ.get('SQLITE_PROFILE', 'tuned')
+
+
+def apply_pragmas(conn, db_path, profile=None):
+    """Aplica os PRAGMAs do perfil em uma conexão já aberta"""
+    settings = PROFILES.get(profile or current_profile(), PROFILES['tuned'])
+
+    # journal_mode fica gravado no arquivo: basta configurar uma vez por processo
+    journal_mode = settings.get('journal_mode')
+    if journal_mode and db_path != ':memory:':
+        key = (os.path.abspath(db_path), journal_mode)
+        if key not in _journal_ready:
+            with _journal_lock:
+                if key not in _journal_ready:
+                    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+                    _journal_ready.add(key)
+
+    for pragma in ('synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store'):
+        if pragma in settings:
+            conn.execute(f"PRAGMA {pragma}={settings[pragma]}")
+    return conn
+
+
+def connect(db_path, factory=sqlite3.Connection, profile=None, **kwargs):
+    """
+    Abre uma conexão SQLite com o perfil de desempenho do projeto
+
+    Args:
+        db_path: Caminho do arquivo do banco
+        factory: Classe da conexão (ex.: conexões reaproveitadas do LibrasDatabase)
+        profile: Perfil de PRAGMAs; padrão em SQLITE_PROFILE
+        **kwargs: Demais argumentos de sqlite3.connect
+
+    Returns:
+        sqlite3.Connection configurada
+    """
+    settings = PROFILES.get(profile or current_profile(), PROFILES['tuned'])
+    kwargs.setdefault('timeout', settings.get('busy_timeout', 5000) / 1000.0)
+    kwargs.setdefault('cached_statements', CACHED_STATEMENTS)
+
+    conn = sqlite3.connect(db_path, factory=factory, **kwargs)
+    return apply_pragmas(conn, db_path, profile)
@@ -2,5 +2,5 @@
 # Start script para Railway
 echo "🎯 Iniciando Libras Learning App..."
 
-# Executar aplicação
-python app.py
\ No newline at end of file
+# Executar aplicação (gunicorn com workers pré-carregados; ver gunicorn.conf.py)
+exec gunicorn -c gunicorn.conf.py wsgi:app
\ No newline at end of file
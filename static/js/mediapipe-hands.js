@@ -18,7 +18,17 @@ class HandTracker {
         this.savedGestures = {};
         this.lastRecognitionTime = 0;
         this.recognitionDelay = 500; // Reconhecer a cada 500ms para evitar spam
-        this.lastDetailedAnalysis = null; // Armazenar análise detalhada
+        
+        // Reconhecimento em lote: amostrar frames entre requisições e enviá-los juntos.
+        // Amostragem no mesmo ritmo do envio individual (2 frames/s avaliados no servidor),
+        // mas um lote de 10 frames a cada 5s: 0,2 requisição/s por aluno em vez de 2 (10x menos).
+        // Em troca, a letra detectada é atualizada a cada 5s
+        this.useBatchRecognition = true;
+        this.frameBuffer = [];
+        this.frameSampleInterval = 500; // Amostrar um frame a cada 500ms
+        this.maxBatchFrames = 10;
+        this.batchInterval = this.frameSampleInterval * this.maxBatchFrames; // 5s entre lotes
+        this.lastFrameSampleTime = 0;
         
         // Configurar canvas
         this.canvasElement.width = 640;
@@ -211,8 +221,12 @@ class HandTracker {
                     lineWidth: 3
                 });
                 
-                // Desenhar pontos com cores baseadas na análise (se disponível)
-                this.drawLandmarksWithAnalysis(landmarks, this.lastDetailedAnalysis);
+                // Desenhar pontos
+                drawLandmarks(this.canvasCtx, landmarks, {
+                    color: '#FF0000',
+                    lineWidth: 2,
+                    radius: 4
+                });
                 
                 // Reconhecer letra (apenas para a primeira mão, com throttling)
                 if (i === 0) {
@@ -272,13 +286,25 @@ class HandTracker {
     }
     
     async recognizeGesture(landmarks) {
-        // Throttling para evitar muitas requisições
         const currentTime = Date.now();
-        if (currentTime - this.lastRecognitionTime < this.recognitionDelay) {
+        
+        // Guardar frames amostrados para o próximo envio em lote
+        if (this.useBatchRecognition && currentTime - this.lastFrameSampleTime >= this.frameSampleInterval) {
+            this.frameBuffer.push(landmarks);
+            if (this.frameBuffer.length > this.maxBatchFrames) {
+                this.frameBuffer.shift();
+            }
+            this.lastFrameSampleTime = currentTime;
+        }
+        
+        // Throttling para evitar muitas requisições (em lote, uma por janela de amostragem)
+        const delay = this.useBatchRecognition ? this.batchInterval : this.recognitionDelay;
+        if (currentTime - this.lastRecognitionTime < delay) {
             return;
         }
         
         this.lastRecognitionTime = currentTime;
+        const frames = this.frameBuffer.splice(0, this.frameBuffer.length);
         
         try {
             // Verificar se temos gestos salvos
@@ -287,14 +313,13 @@ class HandTracker {
                 return;
             }
             
-            const response = await fetch('/api/recognize_gesture', {
+            const useBatch = this.useBatchRecognition && frames.length > 1;
+            const response = await fetch(useBatch ? '/api/recognize_gesture_batch' : '/api/recognize_gesture', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({
-                    landmarks: landmarks
-                })
+                body: JSON.stringify(useBatch ? { frames: frames } : { landmarks: landmarks })
             });
             
             if (response.ok) {
@@ -302,37 +327,9 @@ class HandTracker {
                 if (data.success && data.result) {
                     const result = data.result;
                     
-                    // Log detalhado do reconhecimento
-                    console.log('🎯 Reconhecimento detalhado:');
-                    console.log(`📝 Letra: ${result.letter}`);
-                    console.log(`📊 Similaridade: ${(result.similarity * 100).toFixed(1)}%`);
-                    
-                    // Se houver análise detalhada, mostrar estatísticas
-                    if (result.detailed_analysis && result.detailed_analysis.statistics) {
-                        const stats = result.detailed_analysis.statistics;
-                        console.log('📈 Análise dos pontos:');
-                        console.log(`  ✅ Excelentes: ${stats.excellent_points}/21`);
-                        console.log(`  ✔️ Bons: ${stats.good_points}/21`);
-                        console.log(`  ⚠️ Aceitáveis: ${stats.acceptable_points}/21`);
-                        console.log(`  ❌ Ruins: ${stats.bad_points}/21`);
-                        console.log(`  🎯 Taxa de match: ${stats.match_percentage.toFixed(1)}%`);
-                        
-                        // Mostrar pontos problemáticos
-                        if (result.detailed_analysis.point_analysis) {
-                            const badPoints = result.detailed_analysis.point_analysis
-                                .filter(p => p.quality === 'ruim')
-                                .map(p => p.point_id);
-                            
-                            if (badPoints.length > 0) {
-                                console.log(`⚠️ Pontos com problemas: ${badPoints.join(', ')}`);
-                            }
-                        }
-                    }
+                    console.log(`🎯 Letra: ${result.letter} (${(result.similarity * 100).toFixed(1)}%)`);
                     
                     this.updateDetectedLetter(result.letter, result);
-                    
-                    // Armazenar análise detalhada para visualização
-                    this.lastDetailedAnalysis = result.detailed_analysis;
                 } else {
                     this.updateDetectedLetter('-');
                 }
@@ -344,11 +341,10 @@ class HandTracker {
         }
     }
     
-    updateDetectedLetter(letter, detailedResult = null) {
+    updateDetectedLetter(letter, result = null) {
         const letterElement = document.getElementById('detectedLetter');
         const detailsElement = document.getElementById('recognitionDetails');
         const analysisElement = document.getElementById('analysisInfo');
-        const legendElement = document.getElementById('pointLegend');
         
         if (letterElement) {
             letterElement.textContent = letter;
@@ -364,42 +360,14 @@ class HandTracker {
                     letterElement.style.transform = 'scale(1.0)';
                 }, 200);
                 
-                // Mostrar informações detalhadas
-                if (detailedResult && detailedResult.detailed_analysis) {
-                    const stats = detailedResult.detailed_analysis.statistics;
-                    
-                    // Tooltip detalhado
-                    letterElement.title = `Similaridade: ${(detailedResult.similarity * 100).toFixed(1)}%\n` +
-                                         `Pontos excelentes: ${stats.excellent_points}/21\n` +
-                                         `Pontos bons: ${stats.good_points}/21\n` +
-                                         `Taxa de match: ${stats.match_percentage.toFixed(1)}%`;
-                    
-                    // Informações na interface
-                    if (analysisElement && detailsElement) {
-                        analysisElement.innerHTML = `Similaridade: ${(detailedResult.similarity * 100).toFixed(1)}% | ` +
-                                                   `Match: ${stats.match_percentage.toFixed(1)}% | ` +
-                                                   `Pontos OK: ${stats.excellent_points + stats.good_points}/21`;
-                        detailsElement.style.display = 'block';
-                    }
-                    
-                    // Mostrar legenda quando há análise detalhada
-                    if (legendElement) {
-                        legendElement.style.display = 'block';
-                    }
-                } else {
-                    letterElement.title = `Similaridade: ${detailedResult ? (detailedResult.similarity * 100).toFixed(1) + '%' : 'N/A'}`;
-                    
-                    if (analysisElement && detailsElement) {
-                        analysisElement.textContent = detailedResult ? 
-                            `Similaridade: ${(detailedResult.similarity * 100).toFixed(1)}%` : 
-                            'Análise básica';
-                        detailsElement.style.display = 'block';
-                    }
-                    
-                    // Esconder legenda para análise básica
-                    if (legendElement) {
-                        legendElement.style.display = 'none';
-                    }
+                // Mostrar similaridade (a análise ponto a ponto só é pedida pelas páginas de debug)
+                letterElement.title = `Similaridade: ${result ? (result.similarity * 100).toFixed(1) + '%' : 'N/A'}`;
+                
+                if (analysisElement && detailsElement) {
+                    analysisElement.textContent = result ? 
+                        `Similaridade: ${(result.similarity * 100).toFixed(1)}%` : 
+                        'Análise básica';
+                    detailsElement.style.display = 'block';
                 }
                 
                 console.log('✅ Letra reconhecida:', letter);
@@ -409,80 +377,14 @@ class HandTracker {
                 letterElement.style.fontSize = '1.2em';
                 letterElement.title = 'Nenhuma letra detectada';
                 
-                // Esconder detalhes e legenda
+                // Esconder detalhes
                 if (detailsElement) {
                     detailsElement.style.display = 'none';
                 }
-                if (legendElement) {
-                    legendElement.style.display = 'none';
-                }
             }
         }
     }
     
-    drawLandmarksWithAnalysis(landmarks, detailedAnalysis) {
-        if (!landmarks) return;
-        
-        // Se não há análise detalhada, desenhar normalmente
-        if (!detailedAnalysis || !detailedAnalysis.point_analysis) {
-            drawLandmarks(this.canvasCtx, landmarks, {
-                color: '#FF0000',
-                lineWidth: 2,
-                radius: 4
-            });
-            return;
-        }
-        
-        // Desenhar cada ponto com cor baseada na qualidade
-        const pointAnalysis = detailedAnalysis.point_analysis;
-        
-        landmarks.forEach((landmark, index) => {
-            const analysis = pointAnalysis.find(p => p.point_id === index);
-            let color = '#FF0000'; // Padrão vermelho
-            let radius = 4;
-            
-            if (analysis) {
-                switch (analysis.quality) {
-                    case 'excelente':
-                        color = '#00FF00'; // Verde
-                        radius = 5;
-                        break;
-                    case 'bom':
-                        color = '#90EE90'; // Verde claro
-                        radius = 4;
-                        break;
-                    case 'aceitável':
-                        color = '#FFA500'; // Laranja
-                        radius = 4;
-                        break;
-                    case 'ruim':
-                        color = '#FF4444'; // Vermelho forte
-                        radius = 6;
-                        break;
-                }
-            }
-            
-            // Desenhar o ponto
-            this.canvasCtx.fillStyle = color;
-            this.canvasCtx.beginPath();
-            this.canvasCtx.arc(
-                landmark.x * this.canvasElement.width,
-                landmark.y * this.canvasElement.height,
-                radius,
-                0,
-                2 * Math.PI
-            );
-            this.canvasCtx.fill();
-            
-            // Adicionar contorno para pontos ruins
-            if (analysis && analysis.quality === 'ruim') {
-                this.canvasCtx.strokeStyle = '#FFFFFF';
-                this.canvasCtx.lineWidth = 2;
-                this.canvasCtx.stroke();
-            }
-        });
-    }
-
     updateHandLandmarks(handsData) {
         const container = document.getElementById('hand_landmarks');
         if (!container) return;
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Mãos sintéticas usadas pelos testes
+"""
+
+import random
+
+
+def make_hand(seed, base=None, jitter=0.02):
+    """Gera uma mão sintética com 21 pontos (ou uma variação de ``base``)"""
+    rng = random.Random(seed)
+    if base is None:
+        return [{'x': rng.uniform(0.2, 0.8), 'y': rng.uniform(0.2, 0.8), 'z': rng.uniform(-0.1, 0.1)}
+                for _ in range(21)]
+    return [{'x': p['x'] + rng.uniform(-jitter, jitter),
+             'y': p['y'] + rng.uniform(-jitter, jitter),
+             'z': p['z'] + rng.uniform(-jitter, jitter)} for p in base]
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Testes da camada de banco de dados (LibrasDatabase)
+"""
+
+import random
+import threading
+import time
+
+import pytest
+
+from database import LibrasDatabase, get_database
+from write_behind import WriteBehindBuffer
+
+
+def make_db(tmp_path, name="stats.db"):
+    return LibrasDatabase(str(tmp_path / name))
+
+
+def test_connection_is_reused_per_thread(tmp_path):
+    db = make_db(tmp_path)
+    user_id = db.create_user("ana")
+
+    conn = db._connect()
+    assert db.get_user("ana")[0] == user_id
+    assert db._connect() is conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db._connect()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_schema_is_initialized_once_per_process(tmp_path, monkeypatch):
+    calls = []
+    original = LibrasDatabase.init_database
+    monkeypatch.setattr(LibrasDatabase, 'init_database', lambda self: (calls.append(1), original(self)))
+
+    for _ in range(5):
+        LibrasDatabase(str(tmp_path / "once.db"))
+
+    assert len(calls) == 1
+
+
+def test_get_database_returns_shared_instance(tmp_path):
+    path = str(tmp_path / "shared.db")
+    assert get_database(path) is get_database(path)
+
+
+def test_transaction_commits_or_rolls_back_as_a_unit(tmp_path):
+    db = make_db(tmp_path)
+    user_id = db.create_user("bia")
+
+    with db.transaction():
+        db.save_soletrando_letter(user_id, 'A', 'CASA', 1, 1.5)
+        db.save_soletrando_letter(user_id, 'S', 'CASA', 2, 2.0)
+    assert db.get_soletrando_stats(user_id)['general']['total_letters'] == 2
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.save_soletrando_letter(user_id, 'A', 'CASA', 3, 1.0)
+            raise RuntimeError("falha no meio da transação")
+    assert db.get_soletrando_stats(user_id)['general']['total_letters'] == 2
+
+
+def test_failed_write_does_not_leak_into_next_call(tmp_path):
+    db = make_db(tmp_path)
+    user_id = db.create_user("caio")
+
+    # level NULL viola NOT NULL: o método faz rollback e a conexão volta limpa
+    assert not db.save_challenge_result(user_id, None, 3, 30, 60)
+    assert db.save_challenge_result(user_id, 'iniciante', 3, 30, 60)
+    assert not db._connect().in_transaction
+
+
+def test_connections_use_tuned_sqlite_profile(tmp_path, monkeypatch):
+    monkeypatch.delenv('SQLITE_PROFILE', raising=False)
+    conn = make_db(tmp_path, "tuned.db")._connect()
+
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+
+
+def populate(db):
+    user_ids = [db.create_user(f"aluno{i}") for i in range(5)]
+    for user_id in user_ids:
+        session_id = db.start_session(user_id, 'soletrando', 'facil')
+        word_id = db.save_word_practice(session_id, 'CASA', 4, 4, 4)
+        db.save_letter_times(session_id, word_id, [('C', 1.0), ('A', 1.2)])
+        db.update_letter_stats(user_id, 'C', 1.0, True)
+        for position, letter in enumerate('CASA'):
+            db.save_soletrando_letter(user_id, letter, 'CASA', position, 1.0 + position, 0.9)
+        for level in ('iniciante', 'expert'):
+            db.save_challenge_result(user_id, level, 3, 30, 60)
+    return user_ids
+
+
+def traced_selects(db, action):
+    """Executa ``action`` e retorna os SELECTs (com parâmetros expandidos) que ele emitiu"""
+    statements = []
+    conn = db._connect()
+    conn.set_trace_callback(statements.append)
+    try:
+        action()
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+
+
+def test_stats_queries_use_indexes(tmp_path):
+    db = make_db(tmp_path, "indexed.db")
+    user_ids = populate(db)
+    user_id = user_ids[0]
+
+    selects = traced_selects(db, lambda: (
+        db.get_soletrando_stats(user_id),
+        db.get_challenge_stats(user_id),
+        db.get_challenge_ranking('iniciante'),
+        db.get_user_stats(user_id),
+        db.get_letter_progress(user_id, 'C'),
+        db.get_user_statistics('aluno0'),
+    ))
+    assert len(selects) >= 12
+
+    conn = db._connect()
+    full_scans = []
+    for sql in selects:
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+            detail = row[-1]
+            # "SCAN tabela" sem índice = leitura da tabela inteira
+            if detail.startswith('SCAN') and 'USING' not in detail and '(subquery' not in detail:
+                full_scans.append((detail, sql))
+    assert full_scans == []
+
+
+def test_index_migration_is_versioned(tmp_path):
+    db = make_db(tmp_path, "versioned.db")
+    conn = db._connect()
+
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_migrations")]
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    assert versions == [1, 2, 3]
+    assert {'idx_soletrando_user_letter', 'idx_challenge_ranking', 'idx_challenge_user_created'} <= indexes
+
+
+AGGREGATE_TABLES = ['soletrando_user_totals', 'soletrando_user_letters', 'soletrando_user_words',
+                    'soletrando_user_daily', 'soletrando_user_day_words', 'challenge_user_totals',
+                    'challenge_user_levels', 'challenge_user_daily']
+
+
+def aggregate_rows(db):
+    conn = db._connect()
+    return {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall()) for table in AGGREGATE_TABLES}
+
+
+def test_aggregates_match_raw_history(tmp_path):
+    db = make_db(tmp_path, "aggregates.db")
+    user_id = db.create_user("bia")
+    for position, (letter, seconds) in enumerate([('C', 1.5), ('A', 2.0), ('S', 0.5), ('A', 3.0)]):
+        db.save_soletrando_letter(user_id, letter, 'CASA', position, seconds, 0.8 if position else None)
+    db.save_soletrando_letter(user_id, 'O', 'OI', 0, 4.0, 0.6)
+    for level, words, score, seconds in [('iniciante', 3, 30, 60), ('iniciante', 5, 80, 90), ('expert', 2, 45, 120)]:
+        db.save_challenge_result(user_id, level, words, score, seconds)
+
+    conn = db._connect()
+    soletrando = db.get_soletrando_stats(user_id)
+    raw = conn.execute('''
+        SELECT COUNT(*), COUNT(DISTINCT word), AVG(completion_time), MIN(completion_time),
+               MAX(completion_time), AVG(similarity_score)
+        FROM soletrando_stats WHERE user_id = ?
+    ''', (user_id,)).fetchone()
+    assert soletrando['general'] == {
+        'total_letters': raw[0], 'total_words': raw[1], 'avg_time': round(raw[2], 2),
+        'best_time': round(raw[3], 2), 'worst_time': round(raw[4], 2), 'avg_similarity': round(raw[5], 2)
+    }
+
+    challenge = db.get_challenge_stats(user_id)
+    raw = conn.execute('''
+        SELECT COUNT(*), SUM(words_completed), SUM(score), AVG(score), MAX(score),
+               AVG(words_completed), MAX(words_completed), AVG(words_per_minute), MAX(words_per_minute)
+        FROM challenge_results WHERE user_id = ?
+    ''', (user_id,)).fetchone()
+    general = challenge['general']
+    assert (general['total_games'], general['total_words'], general['total_score'], general['best_score']) == \
+        (raw[0], raw[1], raw[2], raw[4])
+    assert general['avg_score'] == round(raw[3], 1)
+    assert general['best_wpm'] == round(raw[8], 1)
+    assert [row[:2] for row in challenge['level_stats']] == [('iniciante', 2), ('expert', 1)]
+    assert challenge['level_stats'][0][4] == 55.0  # média de score do nível
+    assert challenge['daily_progress'][0][1:3] == (3, 10)
+
+
+def test_rebuild_aggregates_matches_incremental(tmp_path):
+    db = make_db(tmp_path, "rebuild.db")
+    populate(db)
+    db.save_challenge_result(None, 'iniciante', 1, 10, 30)  # sem usuário: fora dos agregados
+
+    incremental = aggregate_rows(db)
+    assert all(incremental[table] for table in AGGREGATE_TABLES)
+
+    db.rebuild_aggregates()
+    assert aggregate_rows(db) == incremental
+
+
+def brute_force_ranking(db, level, best_only=False):
+    rows = db._connect().execute('''
+        SELECT cr.id, u.username, cr.user_id, cr.score, cr.words_completed, cr.time_taken
+        FROM challenge_results cr JOIN users u ON cr.user_id = u.id
+        WHERE cr.level = ?
+        ORDER BY cr.score DESC, cr.words_completed DESC, cr.time_taken ASC, cr.id ASC
+    ''', (level,)).fetchall()
+    if best_only:
+        seen = set()
+        rows = [row for row in rows if not (row[2] in seen or seen.add(row[2]))]
+    return [(row[1], row[3], row[4], row[5]) for row in rows]
+
+
+def ranking_rows(ranking):
+    return [(r['username'], r['score'], r['words_completed'], r['time_taken']) for r in ranking]
+
+
+def test_leaderboard_matches_full_sort(tmp_path):
+    db = make_db(tmp_path, "ranking.db")
+    db.leaderboard.size = 8
+    rng = random.Random(7)
+    user_ids = [db.create_user(f"jogador{i}") for i in range(6)]
+    for _ in range(60):
+        db.save_challenge_result(rng.choice(user_ids), rng.choice(['iniciante', 'expert']),
+                                 rng.randint(0, 6), rng.choice([10, 20, 30, 40]), rng.randint(20, 90))
+
+    for level in ('iniciante', 'expert'):
+        assert ranking_rows(db.get_challenge_ranking(level, limit=5)) == brute_force_ranking(db, level)[:5]
+        best = db.get_challenge_ranking(level, limit=8, scope='best')
+        assert ranking_rows(best) == brute_force_ranking(db, level, best_only=True)[:8]
+        assert [r['position'] for r in best] == list(range(1, len(best) + 1))
+        # Todos os resultados são de hoje: quadros diário e semanal iguais ao geral
+        assert db.get_challenge_ranking(level, 5, period='daily') == db.get_challenge_ranking(level, 5)
+        assert db.get_challenge_ranking(level, 5, 'best', 'weekly') == best[:5]
+
+    with pytest.raises(ValueError):
+        db.get_challenge_ranking('iniciante', scope='todos')
+
+
+def test_leaderboard_rebuild_and_cross_instance_reads(tmp_path):
+    db = make_db(tmp_path, "ranking_rebuild.db")
+    populate(db)
+    with db._connect() as conn:
+        conn.execute("INSERT INTO challenge_results (user_id, level, words_completed, score, time_taken, total_time, "
+                     "created_at) VALUES (1, 'iniciante', 9, 999, 10, 180, '2020-01-01 10:00:00')")
+
+    assert 999 not in [r['score'] for r in db.get_challenge_ranking('iniciante')]
+    db.rebuild_aggregates()
+    assert db.get_challenge_ranking('iniciante')[0]['score'] == 999
+    assert 999 not in [r['score'] for r in db.get_challenge_ranking('iniciante', period='weekly')]
+
+    # Outra instância (como outro processo) grava; a cópia em memória é revalidada pela versão
+    other = LibrasDatabase(db.db_path)
+    other.save_challenge_result(2, 'iniciante', 10, 1000, 10)
+    assert db.get_challenge_ranking('iniciante', limit=1)[0]['score'] == 1000
+
+
+def test_letter_stats_upsert_running_average(tmp_path):
+    db = make_db(tmp_path, "letters.db")
+    user_id = db.create_user("caio")
+
+    db.update_letter_stats(user_id, 'A', 2.0, True)
+    db.update_letter_stats_batch(user_id, [('A', 4.0, False), ('B', 1.0, True), ('A', 0.5, True)])
+
+    rows = {row[0]: row[1:] for row in db._connect().execute(
+        "SELECT letter, total_attempts, correct_attempts, avg_time, best_time, worst_time "
+        "FROM letter_stats WHERE user_id = ?", (user_id,))}
+    assert rows['A'] == (3, 2, pytest.approx(6.5 / 3), 0.5, 4.0)
+    assert rows['B'] == (1, 1, 1.0, 1.0, 1.0)
+
+
+def test_letter_stats_concurrent_updates_are_not_lost(tmp_path):
+    db = make_db(tmp_path, "letters_concurrent.db")
+    user_id = db.create_user("duda")
+
+    def worker():
+        for _ in range(25):
+            db.update_letter_stats_batch(user_id, [('C', 1.0, True), ('D', 2.0, False)])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    totals = dict(db._connect().execute("SELECT letter, total_attempts FROM letter_stats WHERE user_id = ?",
+                                        (user_id,)))
+    assert totals == {'C': 100, 'D': 100}
+
+
+def letter_event(user_id, i):
+    return (user_id, 'CASA'[i % 4], 'CASA', i % 4, 1.0 + i % 3, 0.9, '2026-01-05 12:00:00')
+
+
+def test_write_behind_batches_letters_in_few_transactions(tmp_path):
+    buffered = make_db(tmp_path, "buffered.db")
+    direct = make_db(tmp_path, "direct.db")
+    user_id = buffered.create_user("eva")
+    assert direct.create_user("eva") == user_id
+
+    commits = []
+    buffer = WriteBehindBuffer(lambda events: commits.append(buffered.save_soletrando_letters(events)),
+                               max_events=50, max_delay_ms=10000)
+    for i in range(200):
+        buffer.submit(letter_event(user_id, i))
+    # Lotes disparados por quantidade; o resto (< max_events) esperaria o timer de 10s
+    deadline = time.time() + 5
+    while buffer.get_status()['depth'] >= 50 and time.time() < deadline:
+        time.sleep(0.01)
+    buffer.flush()
+
+    status = buffer.get_status()
+    assert status['flushed'] == 200 and status['depth'] == 0
+    assert status['flushes'] == len(commits) <= 5
+    assert status['avg_flush_ms'] is not None
+
+    direct.save_soletrando_letters([letter_event(user_id, i) for i in range(200)])
+    assert aggregate_rows(buffered) == aggregate_rows(direct)
+    assert buffered.get_soletrando_stats(user_id)['general']['total_letters'] == 200
+    buffer.close()
+
+
+def test_write_behind_flushes_on_timer_and_close(tmp_path):
+    batches = []
+    buffer = WriteBehindBuffer(batches.append, max_events=1000, max_delay_ms=20)
+    buffer.submit('a')
+    buffer.submit('b')
+    deadline = time.time() + 5
+    while not batches and time.time() < deadline:
+        time.sleep(0.01)
+    assert batches == [['a', 'b']]
+
+    buffer.max_delay = 60
+    buffer.submit('c')
+    buffer.close()
+    assert batches == [['a', 'b'], ['c']]
+    with pytest.raises(RuntimeError):
+        buffer.submit('d')
+
+
+def test_write_behind_keeps_events_when_flush_fails():
+    attempts = []
+
+    def flaky(events):
+        attempts.append(list(events))
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+
+    buffer = WriteBehindBuffer(flaky, max_events=1000, max_delay_ms=60000)
+    buffer.submit(1)
+    buffer.submit(2)
+    assert buffer.flush() == 0
+    buffer.submit(3)
+    assert buffer.flush() == 3
+
+    assert attempts == [[1, 2], [1, 2, 3]]
+    assert buffer.get_status()['failed_flushes'] == 1
+    buffer.close()
+
+
+def test_write_behind_isolates_events_that_keep_failing():
+    """Um evento inválido não bloqueia os demais: após max_retries ele vai para dead_letters"""
+    written = []
+
+    def strict(events):
+        if 'bad' in events:
+            raise ValueError("CHECK constraint failed")
+        written.extend(events)
+
+    buffer = WriteBehindBuffer(strict, max_events=1000, max_delay_ms=60000, max_retries=2)
+    buffer.submit('a')
+    buffer.submit('bad')
+    assert buffer.flush() == 0
+    buffer.submit('b')
+    assert buffer.flush() == 0
+    assert buffer.flush() == 2  # Terceira tentativa: evento a evento
+
+    assert written == ['a', 'b']
+    status = buffer.get_status()
+    assert list(buffer.dead_letters) == ['bad']
+    assert status['dead_lettered'] == 1 and status['depth'] == 0 and status['retry_attempts'] == 0
+
+    # Lote que falha volta para a fila sem passar do limite de eventos pendentes
+    buffer.max_pending = 5
+    for i in range(4):
+        buffer.submit(f'c{i}')
+    buffer.submit('bad')
+    assert buffer.flush() == 0
+    for i in range(3):
+        buffer.submit(f'd{i}')
+    assert buffer.get_status()['depth'] == 5 and buffer.get_status()['dropped'] == 3
+    buffer.close()
+
+
+def test_user_id_cache_avoids_repeated_lookups(tmp_path):
+    db = make_db(tmp_path, "users.db")
+    user_id = db.get_or_create_user("fabi")
+    assert db.get_or_create_user("fabi") == user_id
+    assert db.get_user("fabi")[0] == user_id
+
+    selects = traced_selects(db, lambda: [db.get_user_id("fabi") for _ in range(5)])
+    assert selects == []
+    assert db.get_user_id("ninguem") is None
+
+    db.user_ids.max_size = 2
+    db.get_or_create_user("gabi")
+    db.get_or_create_user("hugo")
+    assert len(db.user_ids._ids) == 2 and "fabi" not in db.user_ids._ids
+
+    db.invalidate_user_cache("hugo")
+    assert len(traced_selects(db, lambda: db.get_user_id("hugo"))) == 1
+
+
+def test_delete_user_invalidates_cached_id(tmp_path):
+    db = make_db(tmp_path, "users.db")
+    user_id = db.get_or_create_user("fabi")
+    assert db.get_user_id("fabi") == user_id
+
+    assert db.delete_user("fabi")
+    assert not db.delete_user("fabi")
+    assert db.get_user_id("fabi") is None
+
+    # Novo cadastro com o mesmo nome não herda o id (nem as estatísticas) do removido
+    assert db.get_or_create_user("fabi") not in (None, user_id)
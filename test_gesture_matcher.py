@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Testes do motor vetorizado de comparação de gestos
+Garante que o caminho NumPy retorna as mesmas similaridades do caminho escalar
+"""
+
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+import gesture_manager
+from gesture_index import ExemplarIndex
+from gesture_manager import GestureManager
+from gesture_matcher import TemplateMatcher, landmarks_to_array, normalize_array, normalize_batch
+from recognition_stream import RecognitionSession
+from synthetic_hands import make_hand
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def make_manager(tmp_path, templates):
+    gm = GestureManager(db_path=str(tmp_path / "gestures.db"))
+    for letter, landmarks in templates.items():
+        assert gm.save_gesture(letter, landmarks, 90)
+    gm.invalidate_cache()
+    return gm
+
+
+def test_vectorized_scores_match_scalar_path(tmp_path):
+    """Similaridades vetorizadas devem ser iguais às do _calculate_similarity"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS)}
+    gm = make_manager(tmp_path, {})
+
+    normalized = {letter: gm._normalize_landmarks(lm) for letter, lm in templates.items()}
+    matcher = TemplateMatcher.from_landmarks(normalized)
+    assert matcher.templates.shape == (26, 21, 3)
+
+    for seed in range(20):
+        query = gm._normalize_landmarks(make_hand(1000 + seed, jitter=0.02, base=templates[LETTERS[seed]]))
+        scores = matcher.score(query)
+
+        for letter, score in zip(matcher.letters, scores):
+            expected = gm._calculate_similarity(query, normalized[letter])
+            assert abs(score - expected) < 1e-5, (letter, score, expected)
+
+
+def test_normalize_array_matches_scalar_path(tmp_path):
+    gm = make_manager(tmp_path, {})
+    for seed in range(10):
+        hand = make_hand(seed)
+        expected = landmarks_to_array(gm._normalize_landmarks(hand), dtype=float)
+        assert abs(normalize_array(hand) - expected).max() < 1e-9
+
+
+def test_recognize_gesture_same_result_with_and_without_numpy(tmp_path, monkeypatch):
+    """recognize_gesture deve retornar a mesma letra e similaridade nos dois caminhos"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS[:10])}
+    gm = make_manager(tmp_path, templates)
+    query = make_hand(42, jitter=0.005, base=templates['C'])
+
+    vectorized = gm.recognize_gesture(query)
+    monkeypatch.setattr(gesture_manager, 'VECTORIZED_MATCHING_AVAILABLE', False)
+    gm.invalidate_cache()
+    scalar = gm.recognize_gesture(query)
+    assert gm._templates.matcher is None
+
+    assert vectorized is not None and scalar is not None
+    assert vectorized['letter'] == scalar['letter'] == 'C'
+    assert abs(vectorized['similarity'] - scalar['similarity']) < 1e-5
+    assert vectorized['all_similarities'].keys() == scalar['all_similarities'].keys()
+
+
+def test_templates_normalized_once(tmp_path, monkeypatch):
+    """Reconhecimento deve normalizar apenas a mão de entrada, não os templates"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS[:5])}
+    gm = make_manager(tmp_path, templates)
+    gm.get_all_gestures()
+    assert len(gm._templates.matcher) == 5
+
+    calls = []
+    original = gesture_manager.normalize_array
+    monkeypatch.setattr(gesture_manager, 'normalize_array', lambda lm, *args: calls.append(1) or original(lm, *args))
+
+    gm.recognize_gesture(make_hand(7, jitter=0.005, base=templates['B']))
+    assert len(calls) == 1
+
+    # Salvar um novo gesto normaliza somente ele e mantém os demais no cache
+    gm.save_gesture('F', make_hand(99), 80)
+    assert len(calls) == 2
+    assert sorted(gm.get_all_gestures()) == ['A', 'B', 'C', 'D', 'E', 'F']
+    assert gm._templates.matcher.letters[-1] == 'F'
+
+
+def test_import_gestures_builds_matcher(tmp_path):
+    gm = make_manager(tmp_path, {'A': make_hand(1)})
+    gm.get_all_gestures()
+
+    imported = {'gestures': {letter: {'landmarks': make_hand(i + 10), 'quality': 70}
+                             for i, letter in enumerate('BCD')}}
+    assert gm.import_gestures(imported)
+    assert sorted(gm._templates.matcher.letters) == ['A', 'B', 'C', 'D']
+    assert gm.get_gesture_count() == 4
+
+
+def test_empty_matcher():
+    matcher = TemplateMatcher.from_landmarks({})
+    assert len(matcher) == 0
+    assert matcher.best_match(make_hand(1)) == (None, 0.0, {})
+
+
+def test_multi_exemplar_knn_vote(tmp_path):
+    """Modo multi-exemplar deve votar entre os vizinhos e aceitar várias capturas por letra"""
+    gm = GestureManager(db_path=str(tmp_path / "gestures.db"), multi_exemplar=True, knn_k=5)
+    bases = {letter: make_hand(i) for i, letter in enumerate('ABC')}
+    for letter, base in bases.items():
+        for seed in range(6):
+            assert gm.save_exemplar(letter, make_hand(100 + seed, jitter=0.01, base=base), 80)
+
+    result = gm.recognize_gesture(make_hand(500, jitter=0.01, base=bases['B']))
+    assert result['letter'] == 'B'
+    assert result['method'] == 'knn'
+    assert sum(result['votes'].values()) > 0
+    assert gm.get_exemplar_counts() == {'A': 6, 'B': 6, 'C': 6}
+
+
+def test_exemplar_index_incremental_add():
+    """Exemplares novos ficam no buffer até a reconstrução da árvore"""
+    index = ExemplarIndex(k=3, rebuild_threshold=4)
+    hands = [normalize_array(make_hand(i)) for i in range(12)]
+    index.build(['A'] * 4, np.stack(hands[:4]))
+
+    for hand in hands[4:7]:
+        index.add('B', hand)
+    assert index.pending_count == 3
+    assert index.query(hands[5])['letter'] == 'B'
+
+    index.add('B', hands[7])
+    assert index.pending_count == 0
+    assert len(index) == 8
+    assert index.query(hands[1])['letter'] == 'A'
+
+
+def test_exemplar_index_add_while_querying():
+    """Consultas concorrentes com inserções sempre veem letras e templates do mesmo estado"""
+    index = ExemplarIndex(k=3, rebuild_threshold=8)
+    hands = {letter: normalize_array(make_hand(i)) for i, letter in enumerate('AB')}
+    index.build(['A'], hands['A'][None])
+    errors = []
+
+    def query():
+        try:
+            for _ in range(300):
+                result = index.query(hands['A'])
+                assert result['letter'] in ('A', 'B') and result['neighbors'] >= 1
+        except Exception as e:  # Reportada na thread principal
+            errors.append(e)
+
+    reader = threading.Thread(target=query)
+    reader.start()
+    buffers = set()
+    for i in range(200):
+        index.add('AB'[i % 2], hands['AB'[i % 2]])
+        buffers.add(id(index._template_buffer))
+    reader.join()
+
+    assert errors == []
+    assert len(index) == 201
+    assert len(buffers) <= 6  # Crescimento por dobra, não uma cópia por inserção
+    assert index.query(hands['B'])['letter'] == 'B'
+
+
+def test_batch_recognition_matches_single_frames(tmp_path):
+    """Reconhecimento em lote deve dar o mesmo resultado de cada frame isolado"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS[:8])}
+    gm = make_manager(tmp_path, templates)
+    gm.result_cache = None  # Compara o cálculo, não o reaproveitamento de poses vizinhas
+    frames = [make_hand(200 + i, jitter=0.01, base=templates[LETTERS[i % 3]]) for i in range(6)]
+    frames.append(make_hand(999))  # mão sem correspondência
+
+    batch = gm.recognize_gesture_batch(frames)
+    single = [gm.recognize_gesture_hybrid(frame) for frame in frames]
+
+    for b, s in zip(batch, single):
+        assert b['final'] == s['final']
+        assert abs(b['confidence'] - s['confidence']) < 1e-9
+
+    aggregated = GestureManager.aggregate_batch_results(batch[:4])
+    assert aggregated['final'] == 'A'
+    assert aggregated['frames_agreeing'] == 2
+    assert aggregated['total_frames'] == 4
+
+
+def test_detail_none_skips_all_similarities(tmp_path):
+    """detail='none' devolve a mesma letra e similaridade, sem o mapa por letra"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS[:6])}
+    gm = make_manager(tmp_path, templates)
+    frames = [make_hand(300 + i, jitter=0.01, base=templates[LETTERS[i]]) for i in range(4)]
+
+    for frame in frames:
+        summary = gm.recognize_gesture(frame)
+        lean = gm.recognize_gesture(frame, gesture_manager.DETAIL_NONE)
+        assert lean['letter'] == summary['letter']
+        assert abs(lean['similarity'] - summary['similarity']) < 1e-9
+        assert 'all_similarities' not in lean
+        assert len(summary['all_similarities']) == 6
+
+    batch = gm.recognize_gesture_batch(frames, detail=gesture_manager.DETAIL_NONE)
+    assert [r['final'] for r in batch] == list(LETTERS[:4])
+    assert all('all_similarities' not in r['traditional'] for r in batch)
+
+
+def test_stream_session_debounces_letters(tmp_path):
+    """Sessão de streaming só emite quando a letra estabiliza e não repete enquanto mantida"""
+    templates = {letter: make_hand(i) for i, letter in enumerate('AB')}
+    gm = make_manager(tmp_path, templates)
+    stream = RecognitionSession(gm, window=5, min_votes=3)
+
+    held_a = [make_hand(300 + i, jitter=0.005, base=templates['A']) for i in range(6)]
+    events = stream.push_frames(held_a[:2])
+    assert events == []
+
+    events = stream.push_frames(held_a[2:])
+    assert [e['letter'] for e in events] == ['A']
+
+    # Frame sem mão reinicia a janela - a mesma letra pode ser emitida de novo
+    events = stream.push_frames([None] + held_a[:3])
+    assert [e['letter'] for e in events] == ['A']
+
+    events = stream.push_frames([make_hand(400 + i, jitter=0.005, base=templates['B']) for i in range(3)])
+    assert [e['letter'] for e in events] == ['B']
+    assert stream.get_stats()['frames_processed'] == 12
+
+
+def test_held_pose_hits_result_cache(tmp_path):
+    """Frames quase idênticos reutilizam o resultado; salvar um gesto invalida o cache"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS[:4])}
+    gm = make_manager(tmp_path, templates)
+    assert gm.result_cache is not None
+
+    held = [make_hand(600 + i, jitter=0.001, base=templates['C']) for i in range(10)]
+    results = [gm.recognize_gesture_hybrid(frame) for frame in held]
+    assert {r['final'] for r in results} == {'C'}
+    status = gm.result_cache.get_status()
+    assert status['hits'] >= 8 and status['misses'] <= 2
+
+    # Novo template para a letra: o mesmo frame volta a ser calculado
+    gm.save_gesture('D', held[0], 95)
+    misses = gm.result_cache.get_status()['misses']
+    assert gm.recognize_gesture_hybrid(held[0])['final'] in ('C', 'D')
+    assert gm.result_cache.get_status()['misses'] == misses + 1
+
+    batch = gm.recognize_gesture_batch(held[:3] + [make_hand(999)])
+    assert [r['final'] for r in batch[:3]] == [batch[0]['final']] * 3
+    assert gm.result_cache.get_status()['hits'] > status['hits']
+
+
+def test_mixed_detail_levels_keep_cache_hits(tmp_path):
+    """Páginas de debug (full) e o jogo (none) alternando não esvaziam o cache um do outro"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS[:4])}
+    gm = make_manager(tmp_path, templates)
+    held = [make_hand(800 + i, jitter=0.001, base=templates['B']) for i in range(6)]
+
+    def alternate():
+        for frame in held:
+            for detail in (gesture_manager.DETAIL_NONE, gesture_manager.DETAIL_FULL):
+                result = gm.recognize_gesture_hybrid(frame, detail=detail)
+                assert result['final'] == 'B'
+                assert ('all_similarities' in result['traditional']) == (detail == gesture_manager.DETAIL_FULL)
+
+    alternate()
+    first = gm.result_cache.get_status()
+    assert first['hits'] >= 8
+
+    # Segunda passada: tudo já está no cache, nos dois níveis de detalhe
+    alternate()
+    status = gm.result_cache.get_status()
+    assert status['misses'] == first['misses']
+    assert status['hits'] == first['hits'] + 12
+    assert status['invalidations'] == 0
+
+    # Alterar o resultado recebido não altera o que está no cache
+    result = gm.recognize_gesture_hybrid(held[0], detail=gesture_manager.DETAIL_FULL)
+    result['traditional']['letter'] = 'Z'
+    assert gm.recognize_gesture_hybrid(held[0], detail=gesture_manager.DETAIL_FULL)['traditional']['letter'] == 'B'
+
+
+def rotate_hand(hand, degrees, scale=1.0, shift=(0.0, 0.0)):
+    """Gira a mão no plano da imagem em torno do pulso, com escala e deslocamento"""
+    angle = np.radians(degrees)
+    cos, sin = np.cos(angle), np.sin(angle)
+    wrist = hand[0]
+    rotated = []
+    for p in hand:
+        x, y = p['x'] - wrist['x'], p['y'] - wrist['y']
+        rotated.append({'x': wrist['x'] + shift[0] + scale * (x * cos - y * sin),
+                        'y': wrist['y'] + shift[1] + scale * (x * sin + y * cos),
+                        'z': p['z'] * scale})
+    return rotated
+
+
+@pytest.mark.parametrize('mode', ['palm', 'procrustes'])
+def test_rotation_invariant_normalization(tmp_path, mode):
+    """Modos palm/procrustes reconhecem a mão girada, escalada e deslocada; legacy não"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS[:8])}
+    queries = {letter: rotate_hand(make_hand(700 + i, jitter=0.005, base=templates[letter]), 35,
+                                   scale=0.8, shift=(0.05, -0.04))
+               for i, letter in enumerate(LETTERS[:8])}
+
+    gm = GestureManager(db_path=str(tmp_path / "gestures.db"), normalization=mode)
+    assert gm.normalization == mode
+    for letter, landmarks in templates.items():
+        assert gm.save_gesture(letter, landmarks, 90)
+    gm.result_cache = None
+
+    for letter, query in queries.items():
+        result = gm.recognize_gesture(query)
+        assert result['letter'] == letter
+        assert result['similarity'] > 0.9
+
+    batch = gm.recognize_gesture_batch(list(queries.values()))
+    assert [r['traditional']['letter'] for r in batch] == list(queries)
+
+    legacy = GestureManager(db_path=str(tmp_path / "gestures.db"))
+    assert legacy.normalization == 'legacy'
+    misses = [legacy.recognize_gesture(query) for query in queries.values()]
+    assert sum(r is not None and r['letter'] == letter for r, letter in zip(misses, queries)) < len(queries)
+
+
+def test_procrustes_same_scores_with_and_without_exemplars(tmp_path):
+    """No modo procrustes o k-NN alinha os candidatos como o TemplateMatcher"""
+    templates = {letter: make_hand(i) for i, letter in enumerate(LETTERS[:8])}
+    queries = {letter: rotate_hand(make_hand(900 + i, jitter=0.005, base=templates[letter]), -40)
+               for i, letter in enumerate(LETTERS[:8])}
+
+    single = GestureManager(db_path=str(tmp_path / "single.db"), normalization='procrustes')
+    knn = GestureManager(db_path=str(tmp_path / "knn.db"), normalization='procrustes',
+                         multi_exemplar=True, knn_k=1)
+    for letter, landmarks in templates.items():
+        assert single.save_gesture(letter, landmarks, 90)
+        assert knn.save_gesture(letter, landmarks, 90)
+
+    for letter, query in queries.items():
+        expected = single.recognize_gesture(query)
+        result = knn.recognize_gesture(query)
+        assert result['method'] == 'knn'
+        assert result['letter'] == expected['letter'] == letter
+        assert abs(result['similarity'] - expected['similarity']) < 1e-5
+
+
+def test_invalid_normalization_mode(tmp_path, monkeypatch):
+    with pytest.raises(ValueError):
+        normalize_batch(np.zeros((1, 21, 3)), 'affine')
+
+    monkeypatch.setenv('GESTURE_NORMALIZATION', 'affine')
+    assert GestureManager(db_path=str(tmp_path / "gestures.db")).normalization == 'legacy'
+
+
+def test_gesture_cache_follows_data_version(tmp_path, monkeypatch):
+    """Outro processo salvando um gesto invalida o cache; sem mudanças nada é recarregado"""
+    monkeypatch.setenv('GESTURE_VERSION_POLL_INTERVAL', '0')
+    worker_a = make_manager(tmp_path, {'A': make_hand(1)})
+    worker_b = GestureManager(db_path=str(tmp_path / "gestures.db"))
+
+    snapshot = worker_b.get_all_gestures()
+    assert worker_b.get_all_gestures() is snapshot  # Sem cópia enquanto nada muda
+    with pytest.raises(TypeError):
+        snapshot['Z'] = {}
+
+    loads = []
+    original = worker_b._publish_templates
+    monkeypatch.setattr(worker_b, '_publish_templates', lambda *args: loads.append(1) or original(*args))
+    for _ in range(5):
+        worker_b.get_all_gestures()
+    assert loads == []
+
+    assert worker_a.save_gesture('B', make_hand(2), 85)
+    assert sorted(worker_b.get_all_gestures()) == ['A', 'B']
+    assert sorted(snapshot) == ['A']  # Quem já tinha o snapshot continua com a versão antiga
+
+    # A escrita local mantém o cache em dia sem recarregar tudo
+    assert worker_b.delete_gesture('A')
+    assert sorted(worker_b.get_all_gestures()) == ['B']
+    assert worker_b._templates.version == worker_b._read_data_version(sqlite3.connect(str(tmp_path / "gestures.db")))
+
+
+def test_reload_publishes_templates_with_matcher(tmp_path, monkeypatch):
+    """Durante um recarregamento, leitores nunca veem gestos novos sem a matriz correspondente"""
+    monkeypatch.setenv('GESTURE_VERSION_POLL_INTERVAL', '0')
+    writer = make_manager(tmp_path, {'A': make_hand(1), 'B': make_hand(2)})
+    reader = GestureManager(db_path=str(tmp_path / "gestures.db"))
+
+    seen = []
+    original = reader._build_matcher
+
+    def build(normalized, version):
+        seen.append(reader._templates)  # O que uma requisição concorrente pegaria agora
+        return original(normalized, version)
+
+    monkeypatch.setattr(reader, '_build_matcher', build)
+    assert writer.save_gesture('C', make_hand(3), 80)
+
+    assert reader.recognize_gesture(make_hand(50, jitter=0.005, base=make_hand(3)))['letter'] == 'C'
+    assert seen
+    for state in seen:
+        # Estado vazio faz o leitor recarregar; qualquer outro traz a matriz dos seus gestos
+        assert state.version is None or sorted(state.matcher.letters) == sorted(state.gestures)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Testes do formato binário de landmarks
+"""
+
+import json
+import sqlite3
+
+import numpy as np
+
+from gesture_manager import GestureManager
+from landmark_codec import (LANDMARK_BLOB_SIZE, decode_landmarks, decode_many, decode_to_dicts,
+                            encode_landmarks, migrate_database)
+from ml_system import LibrasMLSystem
+from synthetic_hands import make_hand
+
+
+def test_roundtrip_and_size():
+    hand = make_hand(1)
+    blob = encode_landmarks(hand)
+
+    assert len(blob) == LANDMARK_BLOB_SIZE == 253
+    assert len(json.dumps(hand)) > 5 * len(blob)
+
+    points = decode_landmarks(blob)
+    expected = np.array([[p['x'], p['y'], p['z']] for p in hand], dtype=np.float32)
+    assert np.array_equal(points, expected)
+    assert decode_to_dicts(blob)[3]['y'] == float(expected[3, 1])
+
+
+def test_decode_many_accepts_mixed_formats():
+    hands = [make_hand(i) for i in range(4)]
+    values = [encode_landmarks(hands[0]), json.dumps(hands[1]), 'inválido', encode_landmarks(hands[3])]
+
+    points, valid = decode_many(values, with_index=True)
+
+    assert valid == [0, 1, 3]
+    assert points.shape == (3, 21, 3)
+    assert np.array_equal(points[2], decode_landmarks(values[3]))
+
+    binary_only = decode_many([encode_landmarks(h) for h in hands])
+    assert binary_only.shape == (4, 21, 3) and binary_only.dtype == np.float32
+
+
+def test_migrate_legacy_json_rows(tmp_path):
+    db_path = str(tmp_path / "ml.db")
+    ml = LibrasMLSystem(db_path=db_path, models_path=str(tmp_path / "models"), async_training=False)
+
+    # Linhas no formato antigo (JSON em texto)
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("INSERT INTO gesture_examples (letter, landmarks) VALUES (?, ?)",
+                         [('AB'[i % 2], json.dumps(make_hand(i))) for i in range(40)])
+    X_before, y_before = ml.prepare_training_data('A')
+
+    result = migrate_database(db_path)
+
+    assert result['gesture_examples.landmarks'] == 40
+    with sqlite3.connect(db_path) as conn:
+        types = {row[0] for row in conn.execute("SELECT typeof(landmarks) FROM gesture_examples")}
+    assert types == {'blob'}
+
+    X_after, y_after = ml.prepare_training_data('A')
+    assert X_after.shape == X_before.shape
+    assert np.array_equal(np.sort(X_after[y_after == 1], axis=0), np.sort(X_before[y_before == 1], axis=0))
+
+
+def test_gesture_manager_stores_binary_and_reads_legacy(tmp_path):
+    gm = GestureManager(db_path=str(tmp_path / "gestures.db"))
+    assert gm.save_gesture('A', make_hand(1), 90)
+
+    with sqlite3.connect(gm.db_path) as conn:
+        conn.execute("INSERT INTO gestures (letter, landmarks_json, quality) VALUES (?, ?, ?)",
+                     ('B', json.dumps(make_hand(2)), 80))
+        types = dict(conn.execute("SELECT letter, typeof(landmarks_json) FROM gestures"))
+    assert types == {'A': 'blob', 'B': 'text'}
+
+    gm.invalidate_cache()
+    gestures = gm.get_all_gestures()
+    assert abs(gestures['A']['landmarks'][5]['x'] - make_hand(1)[5]['x']) < 1e-6
+    assert gestures['B']['landmarks'] == make_hand(2)
+
+    assert gm.migrate_landmark_storage()['gestures.landmarks_json'] == 1
+    assert abs(gm.get_gesture('B')['landmarks'][5]['x'] - make_hand(2)[5]['x']) < 1e-6
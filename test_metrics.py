@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Testes da instrumentação de latência (/metrics)
+"""
+
+import json
+
+from metrics import MetricsRegistry, instrument_methods
+
+
+def make_registry(metrics_dir=None):
+    registry = MetricsRegistry(str(metrics_dir) if metrics_dir else None)
+    registry.counter('app_requests_total', 'Requisições')
+    registry.histogram('app_latency_seconds', 'Latência', buckets=(0.01, 0.1, 1.0))
+    return registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = make_registry()
+    for seconds in (0.005, 0.05, 0.05, 3.0):
+        registry.observe('app_latency_seconds', seconds, route='/api/x')
+    registry.inc('app_requests_total', route='/api/"x"', status=200)
+
+    text = registry.render()
+
+    assert '# TYPE app_latency_seconds histogram' in text
+    assert 'app_latency_seconds_bucket{route="/api/x",le="0.01"} 1' in text
+    assert 'app_latency_seconds_bucket{route="/api/x",le="0.1"} 3' in text
+    assert 'app_latency_seconds_bucket{route="/api/x",le="1"} 3' in text
+    assert 'app_latency_seconds_bucket{route="/api/x",le="+Inf"} 4' in text
+    assert 'app_latency_seconds_count{route="/api/x"} 4' in text
+    assert 'app_latency_seconds_sum{route="/api/x"} 3.105' in text
+    assert 'app_requests_total{route="/api/\\"x\\"",status="200"} 1' in text
+
+
+def test_snapshots_from_other_workers_are_summed(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.inc('app_requests_total', 2, route='/')
+    registry.observe('app_latency_seconds', 0.05, route='/')
+
+    # Snapshot gravado por outro worker
+    other = {'counters': [['app_requests_total', [['route', '/']], 3]],
+             'histograms': [['app_latency_seconds', [['route', '/']], [1, 0, 0], 0.002, 1]]}
+    (tmp_path / '999999.json').write_text(json.dumps(other))
+
+    text = registry.render()
+    assert 'app_requests_total{route="/"} 5' in text
+    assert 'app_latency_seconds_bucket{route="/",le="0.01"} 1' in text
+    assert 'app_latency_seconds_count{route="/"} 2' in text
+
+    registry.persist()
+    saved = [p.name for p in tmp_path.iterdir() if p.suffix == '.json']
+    assert len(saved) == 2
+
+
+def test_instrument_methods_times_public_methods():
+    registry = make_registry()
+
+    class Store:
+        def load(self, key):
+            return key * 2
+
+        def _helper(self):
+            return 'privado'
+
+    import metrics
+    original = metrics.REGISTRY
+    metrics.REGISTRY = registry
+    try:
+        registry.histogram('store_call_seconds', 'Chamadas')
+        instrument_methods(Store, 'store_call_seconds')
+        assert Store().load(21) == 42
+        assert Store()._helper() == 'privado'
+    finally:
+        metrics.REGISTRY = original
+
+    text = registry.render()
+    assert 'store_call_seconds_count{method="load"} 1' in text
+    assert '_helper' not in text
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Testes do sistema de Machine Learning
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+
+import pytest
+
+import metrics
+from ml_system import MODEL_MODE_MULTICLASS, MODEL_MODE_PER_LETTER, MULTICLASS_KEY, LibrasMLSystem
+from model_registry import ModelRegistry
+from retrain_scheduler import RetrainScheduler
+from synthetic_hands import make_hand
+from training_queue import TrainingQueue
+
+
+def make_trained_system(tmp_path, letters='ABC', examples=12, model_mode=MODEL_MODE_PER_LETTER):
+    ml = LibrasMLSystem(db_path=str(tmp_path / "ml.db"), models_path=str(tmp_path / "models"),
+                        model_mode=model_mode)
+    bases = {letter: make_hand(i) for i, letter in enumerate(letters)}
+    for letter, base in bases.items():
+        for seed in range(examples):
+            ml.collect_gesture_example(letter, make_hand(seed * 31 + ord(letter), base=base))
+    assert ml.training_queue.wait_idle(timeout=60)
+    for letter in letters:
+        assert ml.train_letter_model(letter)
+    return ml, bases
+
+
+def test_predict_letters_batch_matches_single(tmp_path):
+    ml, bases = make_trained_system(tmp_path)
+    frames = [make_hand(1000 + i, base=bases['ABC'[i % 3]]) for i in range(6)]
+
+    batch = ml.predict_letters_batch(frames)
+    for frame, (letter, confidence) in zip(frames, batch):
+        expected_letter, expected_confidence = ml.predict_letter(frame)
+        assert letter == expected_letter
+        assert abs(confidence - expected_confidence) < 1e-9
+
+
+def test_multiclass_keeps_predict_contract(tmp_path):
+    ml, bases = make_trained_system(tmp_path, model_mode=MODEL_MODE_MULTICLASS)
+    assert ml.trained_letters() == {'A', 'B', 'C'}
+    assert ml.models == {}
+
+    letter, confidence, all_predictions = ml.predict_letter(make_hand(2000, base=bases['B']), return_probabilities=True)
+    assert letter == 'B'
+    assert set(all_predictions) == {'A', 'B', 'C'}
+    assert abs(sum(all_predictions.values()) - 1.0) < 1e-9
+    assert confidence == all_predictions['B']
+
+    frames = [make_hand(3000 + i, base=bases['ABC'[i % 3]]) for i in range(6)]
+    for frame, batch_result in zip(frames, ml.predict_letters_batch(frames)):
+        assert batch_result == ml.predict_letter(frame)
+
+    # Um novo processo carrega o modelo único do disco
+    reloaded = LibrasMLSystem(db_path=ml.db_path, models_path=ml.models_path, model_mode=MODEL_MODE_MULTICLASS)
+    assert reloaded.trained_letters() == {'A', 'B', 'C'}
+
+
+def test_migrate_to_multiclass_archives_legacy_models(tmp_path):
+    ml, bases = make_trained_system(tmp_path)
+    per_letter_version = ml.model_version
+
+    # Pickle solto do formato anterior ao registro
+    with open(os.path.join(ml.models_path, "model_A.pkl"), 'wb') as f:
+        pickle.dump(ml.models['A'], f)
+
+    result = ml.migrate_to_multiclass()
+
+    assert result['success']
+    assert sorted(result['letters']) == ['A', 'B', 'C']
+    assert not os.path.exists(os.path.join(ml.models_path, "model_A.pkl"))
+    assert os.path.exists(os.path.join(ml.models_path, "legacy_per_letter", "model_A.pkl"))
+    assert ml.model_mode == MODEL_MODE_MULTICLASS
+    assert ml.model_version != per_letter_version
+    assert ml.predict_letter(make_hand(4000, base=bases['C']))[0] == 'C'
+
+
+def test_migration_mode_is_shared_through_registry(tmp_path, monkeypatch):
+    """Outro worker e um worker reiniciado passam ao modo multiclasse pelo manifesto"""
+    monkeypatch.delenv('ML_MODEL_MODE', raising=False)
+    ml, bases = make_trained_system(tmp_path)
+    other = LibrasMLSystem(db_path=ml.db_path, models_path=ml.models_path, async_training=False)
+    other.registry_poll_interval = 0
+    assert other.model_mode == MODEL_MODE_PER_LETTER
+
+    assert ml.migrate_to_multiclass()['success']
+
+    assert other.active_model_version() == ml.model_version
+    assert other.model_mode == MODEL_MODE_MULTICLASS
+    assert other.multiclass_model is not None and not other.models
+
+    restarted = LibrasMLSystem(db_path=ml.db_path, models_path=ml.models_path, async_training=False)
+    assert restarted.model_mode == MODEL_MODE_MULTICLASS
+    assert restarted.predict_letter(make_hand(4000, base=bases['B']))[0] == 'B'
+
+
+def test_invalid_model_mode_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setenv('ML_MODEL_MODE', 'multi-class')
+    with pytest.raises(ValueError):
+        LibrasMLSystem(db_path=str(tmp_path / "ml.db"), models_path=str(tmp_path / "models"))
+
+
+def test_multiclass_training_is_timed_once(tmp_path, monkeypatch):
+    ml, bases = make_trained_system(tmp_path, model_mode=MODEL_MODE_MULTICLASS)
+    observed = []
+    monkeypatch.setattr(metrics, 'observe', lambda name, seconds, **labels: observed.append(labels))
+
+    assert ml.train_letter_model('A')
+    assert observed == [{'kind': 'multiclass', 'outcome': 'success'}]
+
+
+def test_training_queue_coalesces_repeated_triggers():
+    started = threading.Event()
+    release = threading.Event()
+    trained = []
+
+    def slow_train(key):
+        trained.append(key)
+        started.set()
+        release.wait(5)
+        return True
+
+    queue = TrainingQueue(slow_train)
+    assert queue.enqueue('A')
+    assert started.wait(5)
+
+    # 'A' está treinando: só um novo treino é agendado; 'B' entra uma única vez
+    results = [queue.enqueue('A') for _ in range(10)] + [queue.enqueue('B') for _ in range(10)]
+    assert results.count(True) == 2
+
+    release.set()
+    assert queue.wait_idle(timeout=5)
+    assert sorted(trained) == ['A', 'A', 'B']
+
+    status = queue.get_status()
+    assert status['completed'] == 3
+    assert status['coalesced'] == 18
+    assert status['pending'] == [] and status['running'] is None
+
+
+def test_collect_example_only_enqueues_training(tmp_path):
+    ml = LibrasMLSystem(db_path=str(tmp_path / "ml.db"), models_path=str(tmp_path / "models"),
+                        async_training=True)
+    release = threading.Event()
+    calls = []
+
+    def blocked_train(letter):
+        calls.append(letter)
+        release.wait(5)
+        return True
+
+    ml.train_letter_model = blocked_train
+    base = make_hand(0)
+    for seed in range(15):
+        assert ml.collect_gesture_example('A', make_hand(seed, base=base)) is not None
+
+    assert ml.get_training_status()['enqueued'] <= 2
+    release.set()
+    assert ml.training_queue.wait_idle(timeout=5)
+    assert calls and set(calls) == {'A'}
+
+
+def make_counting_system(tmp_path, scheduler):
+    ml = LibrasMLSystem(db_path=str(tmp_path / "ml.db"), models_path=str(tmp_path / "models"),
+                        async_training=False, retrain_scheduler=scheduler)
+    trainings = []
+
+    def fake_train(letter):
+        trainings.append(letter)
+        ml._save_training_history(letter, 0, 1.0, 0.0)
+        return True
+
+    ml._train_letter_model = fake_train
+    return ml, trainings
+
+
+def test_retraining_is_bounded_by_delta(tmp_path):
+    ml, trainings = make_counting_system(tmp_path, RetrainScheduler(delta=100, min_interval=0))
+    base = make_hand(0)
+
+    for i in range(1000):
+        ml.collect_gesture_example('ABCDE'[i % 5], make_hand(i, base=base))
+
+    # 200 exemplos por letra -> exatamente 2 treinamentos por letra
+    assert len(trainings) == 1000 // 100
+    assert sorted(set(trainings)) == list('ABCDE')
+
+
+def test_retraining_respects_min_interval(tmp_path):
+    ml, trainings = make_counting_system(tmp_path, RetrainScheduler(delta=10, min_interval=3600))
+    base = make_hand(0)
+
+    for i in range(1000):
+        ml.collect_gesture_example('AB'[i % 2], make_hand(i, base=base))
+
+    assert sorted(trainings) == ['A', 'B']
+    assert ml.retrain_scheduler.pending('A') == 490
+
+
+def test_retrain_scheduler_seeds_from_training_history(tmp_path):
+    ml, trainings = make_counting_system(tmp_path, RetrainScheduler(delta=50, min_interval=0))
+    base = make_hand(0)
+    for i in range(7):
+        ml.collect_gesture_example('A', make_hand(i, base=base))
+
+    restarted = LibrasMLSystem(db_path=ml.db_path, models_path=ml.models_path, async_training=False,
+                               retrain_scheduler=RetrainScheduler(delta=50, min_interval=0))
+    assert restarted.retrain_scheduler.pending('A') == 7
+
+    ml._save_training_history('A', 7, 1.0, 0.0)
+    restarted = LibrasMLSystem(db_path=ml.db_path, models_path=ml.models_path, async_training=False,
+                               retrain_scheduler=RetrainScheduler(delta=50, min_interval=0))
+    assert restarted.retrain_scheduler.pending('A') == 0
+
+
+def test_retrain_scheduler_seed_counts_in_sql():
+    """Contagem agregada por letra, por letra ou com a chave única do modo multiclasse"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE gesture_examples (letter TEXT, created_at TEXT)")
+    conn.execute("CREATE TABLE model_training_history (letter TEXT, created_at TEXT)")
+    conn.executemany("INSERT INTO gesture_examples VALUES (?, ?)", [
+        ('A', '2024-01-01 10:00:00'), ('A', '2024-01-03 10:00:00'),
+        ('B', '2024-01-01 10:00:00'), ('B', '2024-01-04 10:00:00'), ('C', '2024-01-05 10:00:00'),
+    ])
+    conn.executemany("INSERT INTO model_training_history VALUES (?, ?)", [
+        ('A', '2024-01-02 10:00:00'), (MULTICLASS_KEY, '2024-01-03 12:00:00'),
+    ])
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    scheduler = RetrainScheduler(delta=50, min_interval=0)
+    scheduler.seed(conn)
+    assert [scheduler.pending(letter) for letter in 'ABC'] == [1, 2, 1]
+    assert not any('SELECT letter, created_at' in statement for statement in statements)
+
+    scheduler.seed(conn, MULTICLASS_KEY)
+    assert scheduler.pending(MULTICLASS_KEY) == 2  # B e C depois do último treinamento multiclasse
+
+
+def test_registry_promotes_versions_and_rolls_back(tmp_path):
+    ml, bases = make_trained_system(tmp_path, letters='AB')
+    first = ml.model_version
+    models_before = ml.models
+
+    for seed in range(12):
+        ml.collect_gesture_example('C', make_hand(seed * 31 + ord('C'), base=make_hand(2)))
+    assert ml.training_queue.wait_idle(timeout=60)
+    assert ml.train_letter_model('C')
+
+    # Snapshots antigos nunca são alterados - a troca é por referência
+    assert 'C' not in models_before
+    assert set(ml.models) == {'A', 'B', 'C'}
+    assert ml.model_version > first
+
+    versions = [v['version'] for v in ml.get_model_versions()]
+    assert first in versions and ml.model_version in versions
+
+    latest = ml.model_version
+    previous = ml.rollback_models()
+    assert previous < latest and ml.model_version == previous
+
+    # Outro processo enxerga a versão ativa pelo manifesto
+    other = LibrasMLSystem(db_path=ml.db_path, models_path=ml.models_path, async_training=False)
+    assert other.model_version == previous
+    assert ml.rollback_models(latest) == latest
+    other.registry_poll_interval = 0
+    other.predict_letter(make_hand(5000, base=bases['A']))
+    assert other.model_version == latest and 'C' in other.models
+
+
+def test_registry_concurrent_commits_keep_every_letter(tmp_path):
+    """Dois workers treinando letras diferentes: nenhum modelo nem versão se perde"""
+    models_path = str(tmp_path / "models")
+    registries = [ModelRegistry(models_path, keep_versions=50), ModelRegistry(models_path, keep_versions=50)]
+    barrier = threading.Barrier(2)
+    created = [[], []]
+
+    def train(worker, letters):
+        barrier.wait()
+        for letter in letters:
+            version = registries[worker].commit({f'model_{letter}.pkl': letter, f'scaler_{letter}.pkl': letter})
+            created[worker].append(version)
+
+    threads = [threading.Thread(target=train, args=(0, 'ABCDEFGH')),
+               threading.Thread(target=train, args=(1, 'IJKLMNOP'))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = registries[0].load()
+    assert set(snapshot.models) == set('ABCDEFGHIJKLMNOP')
+    manifest = registries[1].read_manifest()
+    assert set(manifest['versions']) == set(created[0] + created[1])
+    # Cada versão parte da anterior: a cadeia de pais é linear
+    parents = [manifest['versions'][v]['parent'] for v in sorted(manifest['versions'])]
+    assert parents == [None] + sorted(manifest['versions'])[:-1]
+
+    assert registries[0].rollback() == sorted(manifest['versions'])[-2]
+    assert len(registries[1].load().models) == 15
+
+
+def test_registry_imports_legacy_pickles(tmp_path):
+    ml, bases = make_trained_system(tmp_path, letters='AB')
+    legacy_path = tmp_path / "legacy_models"
+    legacy_path.mkdir()
+    for letter in 'AB':
+        for prefix, objects in (('model', ml.models), ('scaler', ml.scalers)):
+            with open(legacy_path / f"{prefix}_{letter}.pkl", 'wb') as f:
+                pickle.dump(objects[letter], f)
+
+    imported = LibrasMLSystem(db_path=ml.db_path, models_path=str(legacy_path), async_training=False)
+
+    assert set(imported.models) == {'A', 'B'}
+    assert imported.get_model_versions()[0]['source'] == 'legacy_import'
+    assert imported.predict_letter(make_hand(6000, base=bases['B']))[0] == 'B'
+
+
+def test_examples_by_letter_use_index(tmp_path):
+    ml = LibrasMLSystem(db_path=str(tmp_path / "ml.db"), models_path=str(tmp_path / "models"), async_training=False)
+    conn = sqlite3.connect(ml.db_path)
+
+    plan = [row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT landmarks FROM gesture_examples WHERE letter = 'A' AND created_at > '2024-01-01'"
+    )]
+
+    assert any('idx_examples_letter_created' in detail for detail in plan)
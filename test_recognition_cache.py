@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de resultados de reconhecimento
+"""
+
+import numpy as np
+
+from recognition_cache import RecognitionCache
+
+
+def test_nearby_poses_share_key():
+    cache = RecognitionCache(resolution=0.05)
+    pose = np.random.default_rng(1).uniform(-1, 1, (21, 3)).astype(np.float32)
+    pose = np.round(pose / 0.05) * 0.05  # Centro das células da grade
+
+    assert cache.key(pose) == cache.key(pose + 0.01)
+    assert cache.key(pose) != cache.key(pose + 0.04)
+
+
+def pose(seed):
+    return np.random.default_rng(seed).uniform(-1, 1, (21, 3)).astype(np.float32)
+
+
+def test_held_pose_hits_across_cell_borders():
+    """Frames de uma mão parada acertam mesmo quando alguma coordenada muda de célula"""
+    cache = RecognitionCache(resolution=0.05)
+    held = pose(2)
+    cache.put(held, 1, {'final': 'A'})
+
+    jitter = np.random.default_rng(3).uniform(-0.02, 0.02, (20, 21, 3)).astype(np.float32)
+    assert all(cache.get(held + j, 1)['final'] == 'A' for j in jitter)
+    assert cache.get(held + 0.2, 1) is None
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = RecognitionCache(max_size=2, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr('recognition_cache.time.monotonic', lambda: now[0])
+    a, b, c = pose(10), pose(11), pose(12)
+
+    cache.put(a, 1, {'final': 'A'})
+    cache.put(b, 1, {'final': 'B'})
+    assert cache.get(a, 1)['final'] == 'A'
+    cache.put(c, 1, {'final': 'C'})  # 'b' era o menos usado
+    assert cache.get(b, 1) is None
+    assert cache.get(c, 1)['final'] == 'C'
+
+    now[0] += 11
+    assert cache.get(a, 1) is None
+
+    status = cache.get_status()
+    assert status['hits'] == 2 and status['misses'] == 2
+    assert status['hit_rate'] == 0.5
+
+
+def test_version_change_discards_entries():
+    cache = RecognitionCache()
+    a = pose(20)
+    cache.put(a, (1, 'v1'), {'final': 'A'})
+    assert cache.get(a, (1, 'v1')) is not None
+
+    assert cache.get(a, (2, 'v1')) is None
+    assert cache.get(a, (1, 'v1')) is None  # Entradas antigas não voltam
+    assert cache.get_status()['invalidations'] == 1
+
+
+def test_variants_share_version_and_results_are_copies():
+    cache = RecognitionCache()
+    a = pose(30)
+    cache.put(a, 1, {'final': 'A', 'traditional': {'letter': 'A'}}, variant='full')
+    cache.put(a, 1, {'final': 'A'}, variant='none')
+
+    assert 'traditional' not in cache.get(a, 1, variant='none')
+    cached = cache.get(a, 1, variant='full')
+    cached['traditional']['letter'] = 'Z'
+    assert cache.get(a, 1, variant='full')['traditional']['letter'] == 'A'
+    assert cache.get(a, 1, variant='summary') is None
+    assert cache.get_status()['invalidations'] == 0
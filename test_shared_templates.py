@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Testes do arquivo de templates compartilhado entre processos
+"""
+
+import numpy as np
+
+from gesture_manager import GestureManager
+from shared_templates import SharedTemplateStore
+from synthetic_hands import make_hand
+
+
+def test_publish_and_map_read_only(tmp_path):
+    store = SharedTemplateStore(str(tmp_path / "templates.bin"), source='db')
+    assert store.load() is None
+
+    templates = np.random.default_rng(0).normal(size=(3, 21, 3)).astype(np.float32)
+    shared = store.publish(['A', 'B', 'C'], templates, data_version=4)
+    assert shared.letters == ['A', 'B', 'C']
+    assert shared.generation == 1 and shared.data_version == 4
+    assert np.array_equal(shared.templates, templates)
+    assert not shared.templates.flags.writeable
+
+    # Outro processo (outra instância) lê o mesmo arquivo
+    reader = SharedTemplateStore(store.path, source='db')
+    assert reader.load().letters == ['A', 'B', 'C']
+    assert reader.load() is reader.load()  # Sem remapear enquanto o arquivo não muda
+
+    store.publish(['A'], templates[:1], data_version=6)
+    assert reader.load().generation == 2
+    assert reader.load().letters == ['A']
+
+    # Versão mais antiga não sobrescreve a publicada
+    assert store.publish(['A', 'B'], templates[:2], data_version=5).data_version == 6
+
+    assert SharedTemplateStore(store.path, source='outro banco').load() is None
+
+
+def test_template_saved_in_one_worker_reaches_the_other(tmp_path, monkeypatch):
+    monkeypatch.setenv('GESTURE_SHARED_TEMPLATES', str(tmp_path / "templates.bin"))
+    monkeypatch.setenv('GESTURE_VERSION_POLL_INTERVAL', '3600')  # Só o arquivo propaga a mudança
+    db_path = str(tmp_path / "gestures.db")
+    worker_a = GestureManager(db_path=db_path)
+    worker_b = GestureManager(db_path=db_path)
+    assert worker_a.save_gesture('A', make_hand(1), 90)
+    assert worker_b.get_all_gestures() is not None
+
+    hand_b = make_hand(2)
+    assert worker_a.save_gesture('B', hand_b, 90)
+    result = worker_b.recognize_gesture(hand_b)
+    assert result['letter'] == 'B'
+
+    assert sorted(worker_b._templates.matcher.letters) == ['A', 'B']
+    assert not worker_b._templates.matcher.templates.flags.writeable  # Matriz vem do arquivo mapeado
@@ -0,0 +1,152 @@
+"""
+Fila de treinamento em segundo plano para o sistema de ML
+As requisições HTTP apenas enfileiram a letra; uma thread dedicada executa
+os treinamentos, um de cada vez, fora do caminho da requisição
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class TrainingQueue:
+    """
+    Fila de jobs de treinamento sem duplicatas, indexada por letra
+
+    Disparos repetidos para uma letra que já está na fila são aglutinados em
+    um único job. Se a letra estiver sendo treinada no momento, ela volta para
+    a fila uma única vez, para que os exemplos que chegaram durante o
+    treinamento também sejam considerados.
+
+    A thread é criada sob demanda no primeiro ``enqueue`` e recriada se o
+    processo tiver sido bifurcado (fork), já que threads não sobrevivem ao fork.
+
+    Args:
+        train_fn: Função chamada com a chave do job; retorna True em caso de sucesso
+        name: Nome da thread de treinamento
+    """
+
+    def __init__(self, train_fn: Callable[[str], bool], name: str = "ml-training"):
+        self.train_fn = train_fn
+        self.name = name
+
+        self._pid = None
+        self._thread = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self._condition = threading.Condition()
+        self._pending = OrderedDict()  # letra -> momento do primeiro disparo
+        self._running = None
+        self._rerun = set()
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_error = None
+        self.last_job = None
+
+    def _ensure_worker(self):
+        """Inicia a thread (ou reinicia após um fork); chamado com o lock adquirido"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+        self._thread.start()
+
+    def enqueue(self, key: str) -> bool:
+        """
+        Agenda o treinamento de ``key`` sem bloquear
+
+        Returns:
+            True se um novo job foi criado, False se foi aglutinado a um existente
+        """
+        if self._pid is not None and self._pid != os.getpid():
+            # Processo filho: a fila herdada do pai não tem thread nem lock válidos
+            self._reset_state()
+
+        with self._condition:
+            self._ensure_worker()
+
+            if key in self._pending:
+                self.coalesced += 1
+                return False
+
+            if key == self._running:
+                if key in self._rerun:
+                    self.coalesced += 1
+                    return False
+                self._rerun.add(key)
+                self.enqueued += 1
+                return True
+
+            self._pending[key] = time.time()
+            self.enqueued += 1
+            self._condition.notify()
+            return True
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                key, queued_at = self._pending.popitem(last=False)
+                self._running = key
+
+            started = time.time()
+            try:
+                success = bool(self.train_fn(key))
+                error = None if success else "treinamento não concluído"
+            except Exception as e:
+                success = False
+                error = str(e)
+                print(f"❌ Erro no treinamento em segundo plano ({key}): {e}")
+
+            with self._condition:
+                if success:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                    self.last_error = error
+                self.last_job = {
+                    'key': key,
+                    'success': success,
+                    'wait_time': started - queued_at,
+                    'training_time': time.time() - started,
+                    'finished_at': time.time()
+                }
+                self._running = None
+                if key in self._rerun:
+                    self._rerun.discard(key)
+                    self._pending[key] = time.time()
+                self._condition.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda até a fila esvaziar (usado em testes e no desligamento)"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._pending or self._running is not None:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """Estado da fila para /api/ml/stats"""
+        with self._condition:
+            return {
+                'pending': list(self._pending),
+                'running': self._running,
+                'worker_alive': self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+                'enqueued': self.enqueued,
+                'coalesced': self.coalesced,
+                'completed': self.completed,
+                'failed': self.failed,
+                'last_error': self.last_error,
+                'last_job': self.last_job
+            }
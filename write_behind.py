@@ -0,0 +1,255 @@
+"""
+Buffer write-behind para eventos de alta frequência (letras do Soletrando)
+As requisições apenas acumulam o evento em memória; uma thread grava os
+eventos em lote, em uma única transação, a cada N eventos ou M milissegundos
+
+Variáveis de ambiente (WriteBehindBuffer.from_env):
+    SOLETRANDO_WRITE_BEHIND - '1' para ativar (padrão: desativado, gravação direta)
+    SOLETRANDO_FLUSH_EVENTS - eventos que disparam uma gravação imediata (padrão 100)
+    SOLETRANDO_FLUSH_MS     - atraso máximo de um evento no buffer (padrão 250 ms)
+    SOLETRANDO_FLUSH_RETRIES - tentativas de um lote antes de gravar evento a evento
+                               e separar os que falham (padrão 5)
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+# Acima disso, os eventos mais antigos são descartados (banco indisponível por muito tempo)
+MAX_PENDING_EVENTS = 10000
+MAX_FLUSH_RETRIES = 5
+MAX_DEAD_LETTERS = 1000  # Eventos recusados guardados para inspeção (os mais antigos saem)
+
+
+class WriteBehindBuffer:
+    """
+    Fila em memória gravada em lotes por uma thread dedicada
+
+    Se a gravação falhar, o lote volta para o início da fila e é tentado de
+    novo no próximo ciclo. Depois de ``max_retries`` falhas seguidas, o lote é
+    gravado evento a evento: os que ainda falham (ex.: violação de constraint)
+    vão para ``dead_letters`` em vez de bloquear os eventos seguintes. A
+    thread é criada sob demanda e recriada após um fork; ``close``
+    (registrado no atexit) grava o que restou no buffer.
+
+    Args:
+        flush_fn: Função que grava uma lista de eventos em uma transação
+        max_events: Quantidade de eventos que dispara uma gravação imediata
+        max_delay_ms: Tempo máximo que um evento espera no buffer
+        name: Nome da thread
+        max_pending: Limite de eventos na fila (os mais antigos são descartados)
+        max_retries: Falhas seguidas de um lote antes de isolar os eventos com erro
+    """
+
+    def __init__(self, flush_fn: Callable[[List[Any]], Any], max_events: int = 100, max_delay_ms: float = 250,
+                 name: str = "write-behind", max_pending: int = MAX_PENDING_EVENTS,
+                 max_retries: int = MAX_FLUSH_RETRIES):
+        self.flush_fn = flush_fn
+        self.max_events = max(1, int(max_events))
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000.0
+        self.max_pending = max(self.max_events, int(max_pending))
+        self.max_retries = max(1, int(max_retries))
+        self.name = name
+
+        self._pid = None
+        self._thread = None
+        self._closed = False
+        self._reset_state()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, flush_fn: Callable[[List[Any]], Any], prefix: str = "SOLETRANDO") -> Optional['WriteBehindBuffer']:
+        """Cria o buffer se ``<prefix>_WRITE_BEHIND`` estiver ativo; None caso contrário"""
+        if os.environ.get(f'{prefix}_WRITE_BEHIND', '0').lower() not in ('1', 'true', 'yes'):
+            return None
+        return cls(
+            flush_fn,
+            max_events=int(os.environ.get(f'{prefix}_FLUSH_EVENTS', 100)),
+            max_delay_ms=float(os.environ.get(f'{prefix}_FLUSH_MS', 250)),
+            name=f"{prefix.lower()}-write-behind",
+            max_retries=int(os.environ.get(f'{prefix}_FLUSH_RETRIES', MAX_FLUSH_RETRIES))
+        )
+
+    def _reset_state(self):
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()  # Um lote por vez, preservando a ordem dos eventos
+        self._events = deque()
+        self._oldest_at = None  # Momento de chegada do evento mais antigo no buffer
+        self._failed_attempts = 0  # Falhas seguidas do lote no início da fila
+        self.dead_letters = deque(maxlen=MAX_DEAD_LETTERS)
+
+        self.submitted = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self.max_depth = 0
+        self.last_error = None
+        self.last_batch_size = 0
+        self.last_flush_ms = None
+        self._total_flush_ms = 0.0
+
+    def _ensure_worker(self):
+        """Inicia a thread (ou reinicia após um fork); chamado com o lock adquirido"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, event: Any):
+        """Acumula um evento sem bloquear na gravação"""
+        if self._pid is not None and self._pid != os.getpid():
+            # Processo filho: eventos herdados pertencem ao pai, que os grava
+            self._reset_state()
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Buffer write-behind encerrado")
+            self._ensure_worker()
+
+            if not self._events:
+                self._oldest_at = time.monotonic()
+            self._events.append(event)
+            self.submitted += 1
+            self._trim()
+
+            self.max_depth = max(self.max_depth, len(self._events))
+            if len(self._events) >= self.max_events:
+                self._condition.notify()
+
+    def _trim(self):
+        """Descarta os eventos mais antigos acima de max_pending; chamado com o lock adquirido"""
+        while len(self._events) > self.max_pending:
+            self._events.popleft()
+            self.dropped += 1
+
+    def _flush_individually(self, batch: List[Any]):
+        """Grava evento a evento; retorna os eventos que falharam e o último erro"""
+        failed = []
+        error = None
+        for event in batch:
+            try:
+                self.flush_fn([event])
+            except Exception as e:
+                failed.append(event)
+                error = e
+        return failed, error
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._events:
+                        remaining = self._oldest_at + self.max_delay - time.monotonic()
+                        if len(self._events) >= self.max_events or remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Grava agora todos os eventos acumulados
+
+        Returns:
+            Quantidade de eventos gravados
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch = list(self._events)
+                self._events.clear()
+                self._oldest_at = None
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            isolate = self._failed_attempts >= self.max_retries
+            if isolate:
+                # O lote falhou várias vezes seguidas: separar os eventos com erro
+                failed, error = self._flush_individually(batch)
+            else:
+                try:
+                    self.flush_fn(batch)
+                    failed, error = [], None
+                except Exception as e:
+                    failed, error = batch, e
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            written = len(batch) - len(failed)
+
+            with self._condition:
+                self.last_flush_ms = elapsed_ms
+                if written:
+                    self.flushes += 1
+                    self.flushed += written
+                    self.last_batch_size = written
+                    self._total_flush_ms += elapsed_ms
+                if error is not None:
+                    self.failed_flushes += 1
+                    self.last_error = str(error)
+
+                if isolate:
+                    self._failed_attempts = 0
+                    if failed:
+                        self.dead_letters.extend(failed)
+                        self.dead_lettered += len(failed)
+                        print(f"🗑️ {len(failed)} eventos write-behind recusados após {self.max_retries} "
+                              f"tentativas, movidos para dead_letters: {error}")
+                elif failed:
+                    # Devolver o lote ao início da fila para nova tentativa
+                    self._failed_attempts += 1
+                    self._events.extendleft(reversed(failed))
+                    self._trim()
+                    self._oldest_at = time.monotonic()
+                    print(f"❌ Erro ao gravar lote write-behind ({len(batch)} eventos, "
+                          f"tentativa {self._failed_attempts}/{self.max_retries}): {error}")
+                else:
+                    self._failed_attempts = 0
+                self._condition.notify_all()
+
+            return written
+
+    def close(self):
+        """Para a thread e grava o que restou no buffer (chamado também no atexit)"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        if self._pid in (None, os.getpid()):
+            self.flush()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Profundidade da fila e latência das gravações"""
+        with self._condition:
+            return {
+                'depth': len(self._events),
+                'max_depth': self.max_depth,
+                'submitted': self.submitted,
+                'flushed': self.flushed,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'dropped': self.dropped,
+                'dead_lettered': self.dead_lettered,
+                'retry_attempts': self._failed_attempts,
+                'last_batch_size': self.last_batch_size,
+                'last_flush_ms': round(self.last_flush_ms, 2) if self.last_flush_ms is not None else None,
+                'avg_flush_ms': round(self._total_flush_ms / self.flushes, 2) if self.flushes else None,
+                'avg_batch_size': round(self.flushed / self.flushes, 1) if self.flushes else None,
+                'max_events': self.max_events,
+                'max_delay_ms': self.max_delay * 1000,
+                'worker_alive': self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+            }
@@ -0,0 +1,38 @@
+"""
+Ponto de entrada WSGI para produção (gunicorn -c gunicorn.conf.py wsgi:app)
+Com preload_app, este módulo é importado uma vez no processo mestre: os
+templates de gestos e os modelos de ML são carregados antes do fork e
+compartilhados pelos workers (copy-on-write)
+
+Para desenvolvimento continue usando: python app.py
+"""
+
+import app as web
+
+app = web.app
+
+
+def preload_shared_state():
+    """Carrega templates de gestos e modelos de ML no processo atual"""
+    if web.gesture_manager:
+        count = web.gesture_manager.warm_up()
+        print(f"🔥 {count} templates de gestos pré-carregados")
+
+    if web.ml_system and web.ml_system.registry is not None:
+        web.ml_system.reload_models()
+
+
+def reload_shared_state():
+    """Relê templates e modelos do disco (reload gracioso do gunicorn: kill -HUP)"""
+    if web.gesture_manager:
+        web.gesture_manager.invalidate_cache()
+    preload_shared_state()
+
+
+def shutdown_worker():
+    """Grava o que estiver pendente antes de um worker encerrar"""
+    if web.soletrando_buffer:
+        web.soletrando_buffer.close()
+
+
+preload_shared_state()